@@ -1,10 +1,21 @@
 import argparse
-import py3dtiles.convert as convert
-import py3dtiles.info as info
-import py3dtiles.merger as merger
-import py3dtiles.export as export
+import importlib
+import sys
 import traceback
 
+# the subcommands modules, imported only when used: some of them (e.g.
+# convert) are slow to import, while info is called on many files
+COMMANDS = {
+    'convert': 'py3dtiles.convert',
+    'info': 'py3dtiles.info',
+    'merge': 'py3dtiles.merger',
+    'export': 'py3dtiles.export',
+    'worker': 'py3dtiles.worker',
+    'daemon': 'py3dtiles.daemon',
+    'warmup': 'py3dtiles.warmup',
+    'keygen': 'py3dtiles.keygen',
+}
+
 
 # https://stackoverflow.com/a/43357954
 def str2bool(v):
@@ -26,23 +37,19 @@ def main():
         default=0, type=int)
     sub_parsers = parser.add_subparsers(dest='command')
 
-    # init subparsers
-    convert.init_parser(sub_parsers, str2bool)
-    info.init_parser(sub_parsers, str2bool)
-    merger.init_parser(sub_parsers, str2bool)
-    export.init_parser(sub_parsers, str2bool)
+    # init the subparsers of the command (or all of them, to print the help)
+    command = next((arg for arg in sys.argv[1:] if arg in COMMANDS), None)
+    modules = {}
+    for name, module in COMMANDS.items():
+        if command is None or name == command:
+            modules[name] = importlib.import_module(module)
+            modules[name].init_parser(sub_parsers, str2bool)
 
     args = parser.parse_args()
 
     try:
-        if args.command == 'convert':
-            convert.main(args)
-        elif args.command == 'info':
-            info.main(args)
-        elif args.command == 'merge':
-            merger.main(args)
-        elif args.command == 'export':
-            export.main(args)
+        if args.command in modules:
+            modules[args.command].main(args)
         else:
             parser.print_help()
     except Exception as e:
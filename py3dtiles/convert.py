@@ -8,16 +8,18 @@ import json
 from collections import namedtuple
 import pickle
 import zmq
-import pyproj
 import psutil
 import struct
 import concurrent.futures
 import argparse
 from py3dtiles.points.transformations import rotation_matrix, angle_between_vectors, vector_product, inverse_matrix, scale_matrix, translation_matrix
 from py3dtiles.points.utils import compute_spacing, name_to_filename
-from py3dtiles.points.node import Node
+from py3dtiles.points.node import Node, PARTITION_MAX_DEPTH
 from py3dtiles import TileContentReader
 from py3dtiles.points.shared_node_store import SharedNodeStore
+from py3dtiles.points import auth, point_batch, checkpoint, kernels, profiling, trace
+from py3dtiles.points.projection import epsg, reproject
+from py3dtiles.points.scheduler import NodeNameTrie, NodeTaskQueue, JobSizer, MemoryBudget, PortionExtents
 import py3dtiles.points.task.las_reader as las_reader
 import py3dtiles.points.task.xyz_reader as xyz_reader
 import py3dtiles.points.task.node_process as node_process
@@ -56,15 +58,17 @@ def write_tileset(in_folder, out_folder, octree_metadata, offset, scale, project
                 else:
                     rgb = np.zeros(xyz.shape, dtype=np.uint8)
 
+                # writable copies: the kernels are compiled for writable arrays
                 root_node.grid.insert(
                     octree_metadata.aabb[0].astype(np.float32),
                     inv_aabb_size,
                     xyz.copy(),
-                    rgb)
+                    rgb.copy())
 
         pnts_writer.node_to_pnts(''.encode('ascii'), root_node, out_folder, include_rgb)
 
-    executor = concurrent.futures.ProcessPoolExecutor()
+    # the conversions of the daemon run in threads: no fork
+    executor = concurrent.futures.ProcessPoolExecutor(mp_context=multiprocessing.get_context('spawn'))
     root_tileset = Node.to_tileset(executor, ''.encode('ascii'), octree_metadata.aabb, octree_metadata.spacing, out_folder, scale)
     executor.shutdown()
 
@@ -96,76 +100,132 @@ def make_rotation_matrix(z1, z2):
 
 
 OctreeMetadata = namedtuple('OctreeMetadata', ['aabb', 'spacing', 'scale'])
+WorkerConfig = namedtuple('WorkerConfig', ['trace_folder', 'profile_folder', 'projection', 'octree_metadata', 'folder', 'write_rgb', 'shared_memory', 'verbosity'])
 
+Progress = namedtuple('Progress', [
+    'elapsed', 'point_count', 'points_read', 'points_processed', 'points_in_pnts',
+    'jobs_in_flight', 'workers', 'queued_points', 'pending_pnts',
+    'node_store_bytes', 'node_store_hits', 'node_store_misses', 'node_store_spilled_bytes',
+    'read_rate', 'process_rate', 'pnts_rate', 'done'])
+Progress.__doc__ = """Progress of a conversion, passed to the progress_callback of convert().
 
-def zmq_process(activity_graph, projection, node_store, octree_metadata, folder, write_rgb, verbosity):
+Point counts are cumulative since the start of the conversion, rates are in
+points per second since the previous event. node_store_spilled_bytes is
+the size of the nodes written on disk by the cache evictions."""
+
+DEFAULT_ENDPOINT = 'ipc:///tmp/py3dtiles1'
+
+# minimum delay between two progress events, in seconds
+PROGRESS_INTERVAL = 1.0
+
+# points sampled by the readers to fill each level above the partition depth
+PARTITION_SAMPLE_POINTS = 1000000
+
+
+def connect_endpoint(bound_endpoint):
+    """Returns the endpoint local workers should connect to"""
+    for any_host in ['tcp://*:', 'tcp://0.0.0.0:']:
+        if bound_endpoint.startswith(any_host):
+            return 'tcp://127.0.0.1:' + bound_endpoint[len(any_host):]
+    return bound_endpoint
+
+
+def zmq_process(endpoint, config, writer=False, key=None):
+    """Worker loop, processing the jobs of the convert master bound to endpoint.
+
+    Workers started by convert() get their config directly. Otherwise (config
+    is None), the config is requested from the master: input files and output
+    folder must then be reachable at the same paths as on the master host.
+
+    Writers only process the .pnts jobs, so that writing the tiles doesn't
+    take the place of the node processing jobs.
+
+    key is the keypair of a tcp endpoint (see auth).
+    """
+    auth.check_endpoint(endpoint, key)
     context = zmq.Context()
 
     # Socket to receive messages on
     skt = context.socket(zmq.DEALER)
-    skt.connect('ipc:///tmp/py3dtiles1')
+    auth.client(skt, key)
+    skt.connect(endpoint)
+
+    if config is None:
+        # the pid allows the master to account for our memory (ipc endpoints)
+        skt.send_multipart([b'init', str(os.getpid()).encode('ascii')])
+        config = pickle.loads(skt.recv_multipart()[1])
+    trace_folder, profile_folder, projection, octree_metadata, folder, write_rgb, shared_memory, verbosity = config
+
+    # workers of a pool serve several conversions
+    point_batch.enable_shared_memory(point_batch.SHARED_MEMORY_MIN_SIZE if shared_memory else None)
+    trace.enable(trace_folder, 'writer' if writer else 'worker')
+    profiling.enable(profile_folder, 'writer' if writer else 'worker')
 
     startup_time = time.time()
     idle_time = 0
 
-    if activity_graph:
-        activity = open('activity.{}.csv'.format(os.getpid()), 'w')
-
     # notify we're ready
-    skt.send_multipart([b''])
+    skt.send_multipart([b'writer' if writer else b''])
 
     while True:
-        before = time.time() - startup_time
+        before = time.time()
 
         skt.poll()
 
-        after = time.time() - startup_time
+        after = time.time()
 
         idle_time += after - before
-        command = skt.recv_multipart()
-        delta = time.time() - pickle.loads(command[0])
+        command = skt.recv_multipart(copy=False)
+        sent = pickle.loads(command[0].buffer)
+        delta = time.time() - sent
         if delta > 0.01 and verbosity >= 1:
-            print('{} / {} : Delta time: {}'.format(os.getpid(), round(after, 2), round(delta, 3)))
+            print('{} / {} : Delta time: {}'.format(os.getpid(), round(after - startup_time, 2), round(delta, 3)))
+        trace.complete('idle', before, after, 'idle')
+        trace.complete('queued', sent, time.time(), 'queue', trace.QUEUE)
         command = command[1:]
 
         if len(command) == 1:
-            command = pickle.loads(command[0])
-            command_type = 1
+            command = pickle.loads(command[0].buffer)
 
             if command == b'shutdown':
                 # ack
                 break
 
+            assert not writer, 'writers only process .pnts jobs'
             _, ext = os.path.splitext(command['filename'])
-            init_reader_fn = las_reader.run if ext == '.las' else xyz_reader.run
-            init_reader_fn(
-                command['id'],
-                command['filename'],
-                command['offset_scale'],
-                command['portion'],
-                skt,
-                projection,
-                verbosity)
-        elif command[0] == b'pnts':
-            command_type = 3
-            pnts_writer.run(skt, command[2], command[1], folder, write_rgb)
+            init_reader_fn = las_reader.run if ext in ['.las', '.laz'] else xyz_reader.run
+            point_count = command['portion'][1] - command['portion'][0]
+            with trace.span('read', node=command['id'].decode('ascii'), points=point_count,
+                            bytes=point_count * point_batch.POINT_BYTES), profiling.profile('read'):
+                init_reader_fn(
+                    command['id'],
+                    command['filename'],
+                    command['offset_scale'],
+                    command['portion'],
+                    skt,
+                    projection,
+                    verbosity,
+                    command['partition'])
+        elif command[0].bytes == b'pnts':
+            with trace.span('pnts', node=command[1].bytes.decode('ascii'), bytes=len(command[2])) as args, profiling.profile('pnts'):
+                args['points'] = pnts_writer.run(skt, command[2].buffer, command[1].bytes, folder, write_rgb)
             skt.send_multipart([b''])
+        elif command[0].bytes == b'partial':
+            with profiling.profile('process'):
+                node_process.run_partial(command[1:], octree_metadata, skt)
+        elif command[0].bytes == b'merge':
+            with profiling.profile('process'):
+                node_process.run_merge(command[1:], octree_metadata, skt)
         else:
-            command_type = 2
-            node_process.run(
-                command,
-                octree_metadata,
-                skt,
-                verbosity)
-
-        if activity_graph:
-            print('{before}, {command_type}'.format(**locals()), file=activity)
-            print('{before}, 0'.format(**locals()), file=activity)
-            print('{after}, 0'.format(**locals()), file=activity)
-            print('{after}, {command_type}'.format(**locals()), file=activity)
-
-    if activity_graph:
-        activity.close()
+            with profiling.profile('process'):
+                node_process.run(
+                    command,
+                    octree_metadata,
+                    skt,
+                    verbosity)
+
+    trace.enable(None, None)
+    profiling.enable(None, None)
 
     if verbosity >= 1:
         print('total: {} sec, idle: {}'.format(
@@ -173,11 +233,14 @@ def zmq_process(activity_graph, projection, node_store, octree_metadata, folder,
             round(idle_time, 1)))
 
     skt.send_multipart([b'halted'])
+    context.destroy(linger=5000)
 
 
 def zmq_send_to_process(idle_clients, socket, message):
     assert idle_clients
-    socket.send_multipart([idle_clients.pop(), pickle.dumps(time.time())] + message)
+    client_id = idle_clients.pop()
+    socket.send_multipart([client_id, pickle.dumps(time.time())] + message, copy=False)
+    return client_id
 
 
 def zmq_send_to_all_process(idle_clients, socket, message):
@@ -187,38 +250,95 @@ def zmq_send_to_all_process(idle_clients, socket, message):
     idle_clients.clear()
 
 
-def is_ancestor(ln, la, name, ancestor):
-    return la <= ln and name[0:la] == ancestor
+Reader = namedtuple('Reader', ['input', 'active'])
+NodeProcess = namedtuple('NodeProcess', ['input', 'active', 'inactive', 'splittable', 'splits', 'merges'])
+ToPnts = namedtuple('ToPnts', ['input', 'active', 'written'])
+
 
+class NodeSplit(object):
+    """Concurrent jobs processing the tasks of a single node.
 
-def is_ancestor_in_list(ln, node_name, d):
-    for ancestor in d:
-        k_len = len(ancestor)
-        if k_len == 0:
-            return True
-        if is_ancestor(ln, k_len, node_name, ancestor):
-            return True
-    return False
+    Stateless nodes (the root) are done once all their jobs are. The other
+    ones are processed by partial jobs, whose results are then merged in the
+    node by a last job.
+    """
 
+    def __init__(self, jobs):
+        self.jobs = jobs
+        self.partials = []
+        self.total = 0
+        # point batches of the jobs, committed once the node is done
+        self.uncommitted = []
 
-def can_pnts_be_written(name, finished_node, input_nodes, active_nodes):
-    ln = len(name)
-    return (
-        is_ancestor(ln, len(finished_node), name, finished_node)
-        and not is_ancestor_in_list(ln, name, active_nodes)
-        and not is_ancestor_in_list(ln, name, input_nodes))
+    def job_done(self, result):
+        """Returns True once the node is done"""
+        self.jobs -= 1
+        self.total += result['total']
+        if 'partial' in result:
+            self.partials.append(result['partial'])
+        return self.jobs == 0 and not self.partials
 
+    def ready_to_merge(self):
+        return self.jobs == 0 and self.partials
 
-Reader = namedtuple('Reader', ['input', 'active'])
-NodeProcess = namedtuple('NodeProcess', ['input', 'active', 'inactive'])
-ToPnts = namedtuple('ToPnts', ['input', 'active'])
+    def start_merge(self):
+        partials = self.partials
+        self.partials = []
+        self.jobs = 1
+        return partials
 
 
 class State():
     def __init__(self, pointcloud_file_portions):
-        self.reader = Reader(input=pointcloud_file_portions, active=[])
-        self.node_process = NodeProcess(input={}, active={}, inactive=[])
-        self.to_pnts = ToPnts(input=[], active=[])
+        self.reader = Reader(input=pointcloud_file_portions, active={})
+        # splittable: nodes reported as such by the workers, splits: the
+        # nodes being processed by several jobs, merges: the split nodes
+        # waiting for their merge job
+        self.node_process = NodeProcess(
+            input=NodeTaskQueue(), active={}, inactive=NodeNameTrie(), splittable=set(), splits={}, merges=[])
+        self.to_pnts = ToPnts(input=[], active=[], written=[])
+        self.shared_memory = point_batch.SharedMemoryTracker()
+        # point batches sent by the jobs in progress, by client id (only
+        # used with checkpoints)
+        self.uncommitted = {}
+
+    def checkpoint(self):
+        """Returns the scheduler state, as if the jobs in progress had not started"""
+        node_tasks = {}
+        for name, (tasks, _) in self.node_process.input.tasks.items():
+            node_tasks.setdefault(name, []).extend(tasks)
+        for name, job in self.node_process.active.items():
+            node_tasks.setdefault(name, []).extend(job[3])
+
+        return {
+            'reader': list(self.reader.input) + list(self.reader.active.values()),
+            'node_process': {
+                name: [point_batch.to_bytes(task) for task in tasks] for name, tasks in node_tasks.items()},
+            'inactive': list(self.node_process.inactive),
+            'to_pnts': self.to_pnts.input + self.to_pnts.active,
+            'written': list(self.to_pnts.written),
+            'splittable': list(self.node_process.splittable),
+        }
+
+    def restore(self, saved):
+        for name, tasks in saved['node_process'].items():
+            for task in tasks:
+                add_tasks_to_process(self, name, task)
+        for name in saved['inactive']:
+            self.node_process.inactive.add_inactive(name)
+        self.to_pnts.input.extend(saved['to_pnts'])
+        self.to_pnts.written.extend(saved['written'])
+        self.node_process.splittable.update(saved.get('splittable', []))
+
+        if not self.reader.input and not self.node_process.input:
+            self.to_pnts.input.extend(self.node_process.inactive.pop_all())
+
+    def split_count(self, name, target_count, idle_count):
+        """Returns the number of concurrent jobs to process the tasks queued for name"""
+        if name not in self.node_process.splittable:
+            return 1
+        tasks, point_count = self.node_process.input.tasks[name]
+        return int(min(idle_count, len(tasks), point_count // target_count))
 
     def print_debug(self):
         print('{:^16}|{:^8}|{:^8}|{:^8}'.format('Step', 'Input', 'Active', 'Inactive'))
@@ -239,6 +359,13 @@ class State():
             ''))
 
 
+def add_tasks_to_process(state, name, task):
+    point_count = point_batch.point_count(task[0])
+    if state.node_process.input.add(name, task, point_count):
+        state.node_process.inactive.add_pending(name)
+    state.shared_memory.add(name, task)
+
+
 def can_queue_more_jobs(idles):
     return idles
 
@@ -251,8 +378,8 @@ def init_parser(subparser, str2bool):
         formatter_class=argparse.ArgumentDefaultsHelpFormatter)
     parser.add_argument(
         'files',
-        nargs='+',
-        help='Filenames to process. The file must use the .las or .xyz format.')
+        nargs='*',
+        help='Filenames to process. The file must use the .las, .laz or .xyz format.')
     parser.add_argument(
         '--out',
         type=str,
@@ -265,14 +392,33 @@ def init_parser(subparser, str2bool):
         type=str2bool)
     parser.add_argument(
         '--jobs',
-        help='The number of parallel jobs to start. Default to the number of cpu.',
+        help='The number of parallel jobs to start on this host (can be 0 if remote workers are used). Default to the number of cpu.',
         default=multiprocessing.cpu_count(),
         type=int)
+    parser.add_argument(
+        '--bind',
+        help='The zmq endpoint workers connect to, e.g. tcp://192.168.1.10:5555 to accept workers started on other hosts with py3dtiles worker (with a --key_file). Bind the address of a trusted network only.',
+        default=DEFAULT_ENDPOINT,
+        type=str)
+    parser.add_argument(
+        '--key_file',
+        help='The key file shared with the remote workers (see py3dtiles keygen), required with a tcp --bind endpoint: workers without it are refused.',
+        type=str)
     parser.add_argument(
         '--cache_size',
         help='Cache size in MB. Default to available memory / 10.',
         default=int(total_memory_MB / 10),
         type=int)
+    parser.add_argument(
+        '--memory_budget',
+        help='Memory budget in MB for all the conversion processes, new input portions are read only if it allows it. Default to 3/4 of the total memory.',
+        default=int(total_memory_MB * 3 / 4),
+        type=int)
+    parser.add_argument(
+        '--job_duration',
+        help='Target duration of a node processing job in seconds. Jobs are sized from the measured throughput of the workers.',
+        default=0.5,
+        type=float)
     parser.add_argument(
         '--srs_out', help='SRS to convert the output with (numeric part of the EPSG code)', type=str)
     parser.add_argument(
@@ -281,6 +427,10 @@ def init_parser(subparser, str2bool):
         '--fraction',
         help='Percentage of the pointcloud to process.',
         default=100, type=int)
+    parser.add_argument(
+        '--estimate_bounds',
+        help='Start the conversion of xyz files without reading them first: their bounds and point count are estimated from a sample',
+        type=str2bool, default=False)
     parser.add_argument(
         '--benchmark',
         help='Print summary at the end of the process', type=str)
@@ -288,114 +438,123 @@ def init_parser(subparser, str2bool):
         '--rgb',
         help='Export rgb attributes', type=str2bool, default=True)
     parser.add_argument(
-        '--graph',
-        help='Produce debug graphes (requires pygal)', type=str2bool, default=False)
+        '--shared_memory',
+        help='Send large point batches between processes through shared memory instead of the master process',
+        type=str2bool, default=False)
+    parser.add_argument(
+        '--checkpoint_interval',
+        help='Write a checkpoint of the conversion in the output folder every N seconds (0 to disable), to be able to resume it',
+        default=0,
+        type=float)
+    parser.add_argument(
+        '--resume',
+        help='Resume the conversion from the last checkpoint written in this output folder. Files and conversion options are read from the checkpoint.',
+        type=str)
+    parser.add_argument(
+        '--split_nodes',
+        help='Process the tasks queued for a node in several concurrent jobs when the other workers are idle (for the top of the octree), and merge their results',
+        type=str2bool, default=False)
+    parser.add_argument(
+        '--partition_depth',
+        help='Send the points read straight to their node at this depth of the octree (1 to {}, 0 to disable) instead of the root. The levels above it are filled with a sample of the points.'.format(PARTITION_MAX_DEPTH),
+        default=0,
+        type=int)
+    parser.add_argument(
+        '--writers',
+        help='The number of processes dedicated to writing the .pnts files, in addition to the jobs (0 to let the jobs write them)',
+        default=0,
+        type=int)
+    parser.add_argument(
+        '--daemon',
+        help='Run the conversion in the daemon bound to this endpoint (see py3dtiles daemon), e.g. ipc:///tmp/py3dtiles-daemon',
+        type=str)
+    parser.add_argument(
+        '--trace_file',
+        help='Write a timeline of the conversion tasks to this file, in the Chrome trace format (open it in chrome://tracing or https://ui.perfetto.dev)',
+        type=str)
+    parser.add_argument(
+        '--profile',
+        help='Profile the conversion processes with cProfile, and write their pstats files in this folder, summed by task kind (master, read, process, pnts) in report.txt',
+        type=str)
     parser.add_argument(
         '--color_scale',
         help='Force color scale', type=float)
 
 
 def main(args):
+    if not args.files and args.resume is None:
+        raise ValueError('No files to process')
+    kwargs = dict(outfolder=args.out if args.resume is None else args.resume,
+                  overwrite=args.overwrite,
+                  jobs=args.jobs,
+                  writers=args.writers,
+                  bind=args.bind,
+                  key_file=args.key_file,
+                  cache_size=args.cache_size,
+                  memory_budget=args.memory_budget,
+                  job_duration=args.job_duration,
+                  srs_out=args.srs_out,
+                  srs_in=args.srs_in,
+                  fraction=args.fraction,
+                  estimate_bounds=args.estimate_bounds,
+                  benchmark=args.benchmark,
+                  rgb=args.rgb,
+                  trace_file=args.trace_file,
+                  profile=args.profile,
+                  shared_memory=args.shared_memory,
+                  checkpoint_interval=args.checkpoint_interval,
+                  resume=args.resume is not None,
+                  split_nodes=args.split_nodes,
+                  partition_depth=args.partition_depth,
+                  color_scale=args.color_scale,
+                  verbose=args.verbose)
     try:
-        return convert(args.files,
-                       outfolder=args.out,
-                       overwrite=args.overwrite,
-                       jobs=args.jobs,
-                       cache_size=args.cache_size,
-                       srs_out=args.srs_out,
-                       srs_in=args.srs_in,
-                       fraction=args.fraction,
-                       benchmark=args.benchmark,
-                       rgb=args.rgb,
-                       graph=args.graph,
-                       color_scale=args.color_scale,
-                       verbose=args.verbose)
+        if args.daemon is not None:
+            # imported here, as the daemon module depends on this one
+            from py3dtiles.daemon import submit
+            return submit(args.daemon, args.files, **kwargs)
+        return convert(args.files, **kwargs)
     except SrsInMissingException:
         print('No SRS information in input files, you should specify it with --srs_in')
         sys.exit(1)
 
 
-def convert(files,
-            outfolder='./3dtiles',
-            overwrite=False,
-            jobs=multiprocessing.cpu_count(),
-            cache_size=int(total_memory_MB / 10),
-            srs_out=None,
-            srs_in=None,
-            fraction=100,
-            benchmark=None,
-            rgb=True,
-            graph=False,
-            color_scale=None,
-            verbose=False):
-    """convert
-
-    Convert pointclouds (xyz or las) to 3dtiles tileset containing pnts node
-
-    :param files: Filenames to process. The file must use the .las or .xyz format.
-    :type files: list of str, or str
-    :param outfolder: The folder where the resulting tileset will be written.
-    :type outfolder: path-like object
-    :param overwrite: Overwrite the ouput folder if it already exists.
-    :type overwrite: bool
-    :param jobs: The number of parallel jobs to start. Default to the number of cpu.
-    :type jobs: int
-    :param cache_size: Cache size in MB. Default to available memory / 10.
-    :type cache_size: int
-    :param srs_out: SRS to convert the output with (numeric part of the EPSG code)
-    :type srs_out: int or str
-    :param srs_in: Override input SRS (numeric part of the EPSG code)
-    :type srs_in: int or str
-    :param fraction: Percentage of the pointcloud to process, between 0 and 100.
-    :type fraction: int
-    :param benchmark: Print summary at the end of the process
-    :type benchmark: str
-    :param rgb: Export rgb attributes.
-    :type rgb: bool
-    :param graph: Produce debug graphes (requires pygal).
-    :type graph: bool
-    :param color_scale: Force color scale
-    :type color_scale: float
-
-    :raises SrsInMissingException: if py3dtiles couldn't find srs informations in input files and srs_in is not specified
-
-
-    """
-
-    # allow str directly if only one input
-    files = [files] if isinstance(files, str) else files
-
+def init_conversion(files, color_scale, srs_in, srs_out, estimate_bounds=False):
+    """Read the input files headers and compute the octree parameters"""
     # read all input files headers and determine the aabb/spacing
     _, ext = os.path.splitext(files[0])
-    init_reader_fn = las_reader.init if ext == '.las' else xyz_reader.init
-    infos = init_reader_fn(files, color_scale=color_scale, srs_in=srs_in)
+    if ext in ['.las', '.laz']:
+        infos = las_reader.init(files, color_scale=color_scale, srs_in=srs_in)
+    else:
+        infos = xyz_reader.init(files, color_scale=color_scale, srs_in=srs_in, estimate_bounds=estimate_bounds)
 
     avg_min = infos['avg_min']
     rotation_matrix = None
     # srs stuff
     projection = None
     if srs_out is not None:
-        p2 = pyproj.Proj(init='epsg:{}'.format(srs_out))
+        p2 = epsg(srs_out)
         if srs_in is not None:
-            p1 = pyproj.Proj(init='epsg:{}'.format(srs_in))
+            p1 = epsg(srs_in)
         else:
             p1 = infos['srs_in']
         if srs_in is None:
             raise SrsInMissingException('No SRS informations in the provided files')
-        projection = [p1, p2]
+        # crs definitions, the workers build their transformer from them
+        projection = (p1, p2)
 
-        bl = np.array(list(pyproj.transform(
-            projection[0], projection[1],
+        bl = np.array(list(reproject(
+            projection,
             infos['aabb'][0][0], infos['aabb'][0][1], infos['aabb'][0][2])))
-        tr = np.array(list(pyproj.transform(
-            projection[0], projection[1],
+        tr = np.array(list(reproject(
+            projection,
             infos['aabb'][1][0], infos['aabb'][1][1], infos['aabb'][1][2])))
-        br = np.array(list(pyproj.transform(
-            projection[0], projection[1],
+        br = np.array(list(reproject(
+            projection,
             infos['aabb'][1][0], infos['aabb'][0][1], infos['aabb'][0][2])))
 
-        avg_min = np.array(list(pyproj.transform(
-            projection[0], projection[1],
+        avg_min = np.array(list(reproject(
+            projection,
             avg_min[0], avg_min[1], avg_min[2])))
 
         x_axis = br - bl
@@ -439,19 +598,156 @@ def convert(files,
 
     octree_metadata = OctreeMetadata(aabb=root_aabb, spacing=root_spacing, scale=root_scale[0])
 
-    # create folder
-    if os.path.isdir(outfolder):
-        if overwrite:
-            shutil.rmtree(outfolder)
-        else:
-            print('Error, folder \'{}\' already exists'.format(outfolder))
-            sys.exit(1)
+    return infos, avg_min, projection, rotation_matrix, root_scale, original_aabb, octree_metadata
+
+
+def convert(files,
+            outfolder='./3dtiles',
+            overwrite=False,
+            jobs=multiprocessing.cpu_count(),
+            writers=0,
+            bind=DEFAULT_ENDPOINT,
+            key_file=None,
+            cache_size=int(total_memory_MB / 10),
+            memory_budget=int(total_memory_MB * 3 / 4),
+            job_duration=0.5,
+            srs_out=None,
+            srs_in=None,
+            fraction=100,
+            estimate_bounds=False,
+            benchmark=None,
+            rgb=True,
+            trace_file=None,
+            profile=None,
+            shared_memory=False,
+            checkpoint_interval=0,
+            resume=False,
+            split_nodes=False,
+            partition_depth=0,
+            color_scale=None,
+            progress_callback=None,
+            verbose=False):
+    """convert
+
+    Convert pointclouds (xyz or las) to 3dtiles tileset containing pnts node
+
+    :param files: Filenames to process. The file must use the .las, .laz or .xyz format.
+    :type files: list of str, or str
+    :param outfolder: The folder where the resulting tileset will be written.
+    :type outfolder: path-like object
+    :param overwrite: Overwrite the ouput folder if it already exists.
+    :type overwrite: bool
+    :param jobs: The number of parallel jobs to start. Default to the number of cpu.
+    :type jobs: int
+    :param writers: The number of processes dedicated to writing the .pnts files, in addition to the jobs. With 0, the jobs write them. Writers overlap the tiles I/O with the node processing.
+    :type writers: int
+    :param bind: The zmq endpoint workers connect to. Bind a tcp endpoint to accept workers started on other hosts.
+    :type bind: str
+    :param key_file: The key file shared with the remote workers (see auth), required with a tcp bind endpoint. Workers without it are refused.
+    :type key_file: str
+    :param cache_size: Cache size in MB. Default to available memory / 10.
+    :type cache_size: int
+    :param memory_budget: Memory budget in MB for all the conversion processes. Default to 3/4 of the total memory.
+    :type memory_budget: int
+    :param job_duration: Target duration of a node processing job in seconds.
+    :type job_duration: float
+    :param srs_out: SRS to convert the output with (numeric part of the EPSG code)
+    :type srs_out: int or str
+    :param srs_in: Override input SRS (numeric part of the EPSG code)
+    :type srs_in: int or str
+    :param fraction: Percentage of the pointcloud to process, between 0 and 100.
+    :type fraction: int
+    :param estimate_bounds: Split the xyz files in portions by byte offset, and estimate their bounds and point count from a sample instead of reading them before the conversion. The readers report the exact count as they go.
+    :type estimate_bounds: bool
+    :param benchmark: Print summary at the end of the process
+    :type benchmark: str
+    :param rgb: Export rgb attributes.
+    :type rgb: bool
+    :param trace_file: Write a timeline of the conversion tasks to this file, in the Chrome trace format.
+    :type trace_file: path-like object
+    :param profile: Profile the conversion processes with cProfile, and write their pstats files in this folder, summed by task kind (master, read, process, pnts) in a report.
+    :type profile: path-like object
+    :param shared_memory: Send large point batches between processes through shared memory instead of the master process.
+    :type shared_memory: bool
+    :param checkpoint_interval: Write a checkpoint of the conversion in outfolder every checkpoint_interval seconds (0 to disable).
+    :type checkpoint_interval: float
+    :param resume: Resume the conversion from the last checkpoint written in outfolder. files and the options defining the tileset (srs, rgb...) are read from the checkpoint.
+    :type resume: bool
+    :param split_nodes: Process the tasks queued for a node in several concurrent jobs when the other workers are idle (for the root and the nodes of the first 2 levels), and merge their results.
+    :type split_nodes: bool
+    :param partition_depth: Readers send the points straight to their node at this depth of the octree (1 to PARTITION_MAX_DEPTH, 0 to disable) instead of the root. The levels above it are filled with a sample of the points.
+    :type partition_depth: int
+    :param color_scale: Force color scale
+    :type color_scale: float
+    :param progress_callback: Called with a Progress event every PROGRESS_INTERVAL seconds at most, and once the tileset is written. It's called by the conversion loop, so it must return quickly.
+    :type progress_callback: callable
+
+    :raises SrsInMissingException: if py3dtiles couldn't find srs informations in input files and srs_in is not specified
+    :raises ValueError: if shared_memory is used with a non-ipc endpoint or with checkpoints, if partition_depth is out of range, or if bind is a tcp endpoint without key_file
+
+
+    """
+
+    # allow str directly if only one input
+    files = [files] if isinstance(files, str) else files
+    # remote workers read the input files and write the tiles on a shared filesystem
+    files = [os.path.abspath(f) for f in files]
+    outfolder = os.path.abspath(outfolder)
+
+    if shared_memory and not bind.startswith('ipc://'):
+        raise ValueError('The shared memory transport requires all the workers to run on this host (ipc endpoint)')
+    if shared_memory and (checkpoint_interval or resume):
+        raise ValueError('Checkpoints can\'t be used with the shared memory transport')
+    if not 0 <= partition_depth <= PARTITION_MAX_DEPTH:
+        raise ValueError('partition_depth must be between 0 and {}'.format(PARTITION_MAX_DEPTH))
+    key = auth.read_key(key_file) if key_file is not None else None
+    auth.check_endpoint(bind, key)
+
+    if resume:
+        saved_state, saved_nodes = checkpoint.load(outfolder)
+        files, rgb = saved_state['files'], saved_state['rgb']
+        conversion = saved_state['conversion']
+    else:
+        conversion = init_conversion(files, color_scale, srs_in, srs_out, estimate_bounds)
+    infos, avg_min, projection, rotation_matrix, root_scale, original_aabb, octree_metadata = conversion
+    root_aabb, root_spacing = octree_metadata.aabb, octree_metadata.spacing
+
+    partition = None
+    # without points, there's nothing to partition
+    if partition_depth > 0 and infos['point_count'] > 0:
+        # the root keeps no points, so the nodes of the first level need no sample
+        sample = min(1, PARTITION_SAMPLE_POINTS * (partition_depth - 1) / infos['point_count'])
+        partition = (root_aabb, partition_depth, sample)
 
-    os.makedirs(outfolder)
     working_dir = os.path.join(outfolder, 'tmp')
-    os.makedirs(working_dir)
+    if resume:
+        node_store = SharedNodeStore(working_dir)
+        node_store.restore(saved_nodes)
+        checkpoint.remove_unlisted_pnts(outfolder, saved_state['state']['written'], [os.path.basename(working_dir)])
+    else:
+        # create folder
+        if os.path.isdir(outfolder):
+            if overwrite:
+                shutil.rmtree(outfolder)
+            else:
+                print('Error, folder \'{}\' already exists'.format(outfolder))
+                sys.exit(1)
+
+        os.makedirs(outfolder)
+        os.makedirs(working_dir)
+
+        node_store = SharedNodeStore(working_dir)
 
-    node_store = SharedNodeStore(working_dir)
+    # each process writes its events in the output folder (reachable by the
+    # remote workers too), they're merged in trace_file at the end
+    trace_folder = None
+    if trace_file is not None:
+        trace_file = os.path.abspath(trace_file)
+        trace_folder = os.path.join(outfolder, 'trace')
+    master_trace = trace.Trace(trace_folder, 'convert')
+    if profile is not None:
+        profile = os.path.abspath(profile)
+    master_profiler = profiling.Profiler(profile, 'convert')
 
     if verbose >= 1:
         print('Summary:')
@@ -466,202 +762,406 @@ def convert(files,
 
     initial_portion_count = len(infos['portions'])
 
-    if graph:
-        progression_log = open('progression.csv', 'w')
-
-    def add_tasks_to_process(state, name, task, point_count):
-        assert point_count > 0
-        tasks_to_process = state.node_process.input
-        if name not in tasks_to_process:
-            tasks_to_process[name] = ([task], point_count)
-        else:
-            tasks, count = tasks_to_process[name]
-            tasks.append(task)
-            tasks_to_process[name] = (tasks, count + point_count)
-
     processed_points = 0
     points_in_progress = 0
+    points_read = 0
+    outside_bounds = False
     previous_percent = 0
     points_in_pnts = 0
-
-    max_splitting_jobs_count = max(1, jobs // 2)
+    spilled_bytes = 0
+
+    if resume:
+        processed_points = saved_state['processed_points']
+        points_read = saved_state.get('points_read', processed_points)
+        points_in_pnts = saved_state['points_in_pnts']
+        state = State(saved_state['state']['reader'])
+        state.restore(saved_state['state'])
+        del saved_state
+    else:
+        state = State(infos['portions'])
+    last_checkpoint = time.time()
+
+    # the extents of the portions (in the octree frame) allow to write the
+    # .pnts of the nodes they can't reach before the end of the reading
+    extents = {}
+    if projection is None:
+        for portion, extent in infos.get('portion_extents', {}).items():
+            # the readers may round the coordinates to float32
+            extent = extent + np.array([[-1], [1]]) * np.abs(extent).max() * 1e-6
+            extents[portion] = (extent - avg_min) * root_scale
+    portion_extents = PortionExtents(root_aabb, extents)
+    portion_extents.update(list(state.reader.input) + list(state.reader.active.values()))
+    last_progress = None
+
+    def progress_event(done):
+        elapsed = time.time() - startup
+        event = Progress(
+            elapsed=elapsed,
+            point_count=infos['point_count'],
+            points_read=points_read,
+            points_processed=processed_points,
+            points_in_pnts=points_in_pnts,
+            # idle workers are forgotten once they're asked to shut down
+            jobs_in_flight=worker_count - len(zmq_idle_clients) if zmq_processes_killed < 0 else 0,
+            workers=worker_count,
+            queued_points=state.node_process.input.point_count,
+            pending_pnts=len(state.to_pnts.input) + len(state.to_pnts.active),
+            node_store_bytes=node_store.memory_size['content'] + node_store.memory_size['container'],
+            node_store_hits=node_store.stats['hit'],
+            node_store_misses=node_store.stats['miss'],
+            node_store_spilled_bytes=spilled_bytes,
+            read_rate=0,
+            process_rate=0,
+            pnts_rate=0,
+            done=done)
+        if last_progress is not None and elapsed > last_progress.elapsed:
+            duration = elapsed - last_progress.elapsed
+            event = event._replace(
+                read_rate=(points_read - last_progress.points_read) / duration,
+                process_rate=(processed_points - last_progress.points_processed) / duration,
+                pnts_rate=(points_in_pnts - last_progress.points_in_pnts) / duration)
+        return event
+
+    job_sizer = JobSizer(job_duration)
 
     # zmq setup
     context = zmq.Context()
 
     zmq_skt = context.socket(zmq.ROUTER)
-    zmq_skt.bind('ipc:///tmp/py3dtiles1')
+    authenticator = auth.server(context, zmq_skt, key)
+    zmq_skt.bind(bind)
+    endpoint = zmq_skt.getsockopt(zmq.LAST_ENDPOINT).decode('ascii')
+    if verbose >= 1:
+        print('Listening for workers on {}'.format(endpoint))
 
     zmq_idle_clients = []
-
-    state = State(infos['portions'])
+    zmq_idle_writers = []
+    # local workers + the remote ones that joined the conversion
+    worker_count = jobs
+    writer_count = writers
+    writer_ids = set()
+    remote_ids = set()
+    # the workers to give back to the daemon, and those given back
+    workers_to_release = 0
+    released_ids = set()
+    local_pids = {}
 
     zmq_processes_killed = -1
 
+    worker_config = WorkerConfig(trace_folder, profile, projection, octree_metadata, outfolder, rgb, shared_memory, verbose)
+    remote_worker_config = pickle.dumps(worker_config)
+
+    if jobs + writers > 0:
+        # the forked workers inherit them instead of compiling them each
+        with master_trace.span('compile kernels'):
+            kernels.compile_all()
+
     zmq_processes = [multiprocessing.Process(
         target=zmq_process,
-        args=(
-            graph, projection, node_store, octree_metadata, outfolder, rgb, verbose)) for i in range(jobs)]
+        args=(connect_endpoint(endpoint), worker_config, i >= jobs, key)) for i in range(jobs + writers)]
 
     for p in zmq_processes:
         p.start()
     activities = [p.pid for p in zmq_processes]
 
+    reader_memory = MemoryBudget(memory_budget, activities)
+
     time_waiting_an_idle_process = 0
 
+    master_profiler.start('master')
     while True:
         # state.print_debug()
         now = time.time() - startup
         at_least_one_job_ended = False
 
-        all_processes_busy = not can_queue_more_jobs(zmq_idle_clients)
+        all_processes_busy = not can_queue_more_jobs(zmq_idle_clients) and not (zmq_idle_writers and state.to_pnts.input)
         while all_processes_busy or zmq_skt.poll(timeout=0, flags=zmq.POLLIN):
             # Blocking read but it's fine because either all our child processes are busy
             # or we know that there's something to read (zmq.POLLIN)
             start = time.time()
-            result = zmq_skt.recv_multipart()
+            # point batches are kept as zmq frames, to forward them without copy
+            result = zmq_skt.recv_multipart(copy=False)
 
-            client_id = result[0]
+            client_id = result[0].bytes
             result = result[1:]
 
             if len(result) == 1:
-                if len(result[0]) == 0:
+                if len(result[0]) == 0 and client_id in writer_ids:
+                    assert client_id not in zmq_idle_writers
+                    zmq_idle_writers += [client_id]
+                    all_processes_busy = False
+                elif len(result[0]) == 0:
                     assert client_id not in zmq_idle_clients
-                    zmq_idle_clients += [client_id]
+                    job_sizer.job_ended(client_id, time.time())
+                    if workers_to_release and worker_count > 1 and zmq_processes_killed < 0:
+                        # the daemon gives it to another conversion
+                        zmq_send_to_process([client_id], zmq_skt, [pickle.dumps(b'shutdown')])
+                        released_ids.add(client_id)
+                        remote_ids.discard(client_id)
+                        worker_count -= 1
+                        workers_to_release -= 1
+                    else:
+                        zmq_idle_clients += [client_id]
 
                     if all_processes_busy:
                         time_waiting_an_idle_process += time.time() - start
+                        master_trace.complete('wait for a worker', start, time.time(), 'idle')
                     all_processes_busy = False
-                elif result[0] == b'halted':
-                    zmq_processes_killed += 1
+                elif result[0].bytes == b'writer':
+                    if client_id not in writer_ids:
+                        # a remote writer (the local ones are already counted)
+                        if client_id in remote_ids:
+                            worker_count -= 1
+                            writer_count += 1
+                        writer_ids.add(client_id)
+                    zmq_idle_writers += [client_id]
+                    all_processes_busy = False
+                elif result[0].bytes == b'halted':
+                    if client_id in released_ids:
+                        released_ids.remove(client_id)
+                        reader_memory.remove_process(local_pids.pop(client_id, None))
+                    else:
+                        zmq_processes_killed += 1
                     all_processes_busy = False
                 else:
-                    result = pickle.loads(result[0])
-                    processed_points += result['total']
-                    points_in_progress -= result['total']
+                    result = pickle.loads(result[0].buffer)
+                    uncommitted = state.uncommitted.pop(client_id, [])
+                    total = result['total']
+                    node_done = True
+
+                    split = state.node_process.splits.get(result['name'])
+                    if split is not None:
+                        # the node is done (and its jobs committed) once its
+                        # last job ends
+                        split.uncommitted += uncommitted
+                        node_done = split.job_done(result)
+                        if node_done:
+                            del state.node_process.splits[result['name']]
+                            uncommitted, total = split.uncommitted, split.total
+                        else:
+                            uncommitted, total = [], 0
+                            if split.ready_to_merge():
+                                state.node_process.merges.append(result['name'])
+
+                    # the job is done: its point batches can be processed
+                    for name, task in uncommitted:
+                        add_tasks_to_process(state, name, task)
+
+                    processed_points += total
+                    points_in_progress -= total
 
                     if 'save' in result and len(result['save']) > 0:
                         node_store.put(result['name'], result['save'])
+                    if result.get('splittable'):
+                        state.node_process.splittable.add(result['name'])
 
                     if result['name'][0:4] == b'root':
-                        state.reader.active.remove(result['name'])
-                    else:
+                        _, portion = state.reader.active.pop(result['name'])
+                        if 'points' in result:
+                            # the point count and bounds were estimated (estimate_bounds)
+                            estimate_error = result['points'] - (portion[1] - portion[0])
+                            infos['point_count'] += estimate_error
+                            points_in_progress += estimate_error
+                            if not outside_bounds and result['points'] and (
+                                    np.any(result['aabb'][0] < infos['aabb'][0]) or np.any(result['aabb'][1] > infos['aabb'][1])):
+                                outside_bounds = True
+                                print('Warning: points outside of the estimated bounds, the tiles on the border will extend beyond their bounding volume (convert without --estimate_bounds to avoid it)')
+                        points_read += result.get('points', portion[1] - portion[0])
+                        portion_extents.update(list(state.reader.input) + list(state.reader.active.values()))
+                        if state.reader.input or state.reader.active:
+                            state.to_pnts.input.extend(
+                                state.node_process.inactive.pop_outside(b'', portion_extents))
+                    elif node_done:
                         del state.node_process.active[result['name']]
+                        state.shared_memory.done(result['name'])
+                        state.node_process.inactive.remove_pending(result['name'])
+                        state.node_process.input.reschedule(result['name'])
 
                         if len(result['name']) > 0:
-                            state.node_process.inactive.append(result['name'])
+                            state.node_process.inactive.add_inactive(result['name'])
 
                             if not state.reader.input and not state.reader.active:
                                 if state.node_process.active or state.node_process.input:
-                                    finished_node = result['name']
-                                    if not can_pnts_be_written(
-                                            finished_node,
-                                            finished_node,
-                                            state.node_process.input,
-                                            state.node_process.active):
-                                        pass
-                                    else:
-                                        state.node_process.inactive.pop(-1)
-                                        state.to_pnts.input.append(finished_node)
-
-                                        for i in range(len(state.node_process.inactive) - 1, -1, -1):
-                                            candidate = state.node_process.inactive[i]
-
-                                            if can_pnts_be_written(
-                                                    candidate, finished_node,
-                                                    state.node_process.input,
-                                                    state.node_process.active):
-                                                state.node_process.inactive.pop(i)
-                                                state.to_pnts.input.append(candidate)
-
+                                    state.to_pnts.input.extend(
+                                        state.node_process.inactive.pop_writable(result['name']))
                                 else:
-                                    for c in state.node_process.inactive:
-                                        state.to_pnts.input.append(c)
-                                    state.node_process.inactive.clear()
+                                    state.to_pnts.input.extend(
+                                        state.node_process.inactive.pop_all())
+                            else:
+                                state.to_pnts.input.extend(
+                                    state.node_process.inactive.pop_outside(result['name'], portion_extents))
 
                     at_least_one_job_ended = True
-            elif result[0] == b'pnts':
-                points_in_pnts += struct.unpack('>I', result[1])[0]
-                state.to_pnts.active.remove(result[2])
+            elif result[0].bytes == b'init':
+                if verbose >= 1:
+                    print('Remote worker joined the conversion')
+                worker_count += 1
+                remote_ids.add(client_id)
+                if endpoint.startswith('ipc://'):
+                    # a worker of this host (e.g. of the daemon pool)
+                    local_pids[client_id] = int(result[1].bytes)
+                    reader_memory.add_process(local_pids[client_id])
+                zmq_skt.send_multipart([client_id, pickle.dumps(time.time()), remote_worker_config])
+            elif result[0].bytes == b'release':
+                # the daemon shares its workers with another conversion
+                workers_to_release += int(result[1].bytes)
+            elif result[0].bytes == b'pnts':
+                points_in_pnts += struct.unpack('>I', result[1].buffer)[0]
+                state.to_pnts.active.remove(result[2].bytes)
+                node_store.remove(result[2].bytes)
+                if checkpoint_interval:
+                    state.to_pnts.written.extend(
+                        [os.path.relpath(f, outfolder) for f in pickle.loads(result[3].buffer)])
+            elif checkpoint_interval:
+                # a checkpoint must not contain the batches of a job that
+                # will be run again on resume
+                state.uncommitted.setdefault(client_id, []).append((result[0].bytes, result[1:]))
             else:
-                count = struct.unpack('>I', result[2])[0]
-                add_tasks_to_process(state, result[0], result[1], count)
+                add_tasks_to_process(state, result[0].bytes, result[1:])
 
-        while state.to_pnts.input and can_queue_more_jobs(zmq_idle_clients):
+        # the jobs write the .pnts if there's no writer
+        pnts_clients = zmq_idle_writers if writer_count else zmq_idle_clients
+        while state.to_pnts.input and can_queue_more_jobs(pnts_clients):
             node_name = state.to_pnts.input.pop()
             datas = node_store.get(node_name)
             assert len(datas) > 0, '{} has no data??'.format(node_name)
-            zmq_send_to_process(zmq_idle_clients, zmq_skt, [b'pnts', node_name, datas])
-            node_store.remove(node_name)
+            zmq_send_to_process(pnts_clients, zmq_skt, [b'pnts', node_name, datas])
             state.to_pnts.active.append(node_name)
 
-        if can_queue_more_jobs(zmq_idle_clients):
-            potential = sorted(
-                [(k, v) for k, v in state.node_process.input.items() if k not in state.node_process.active],
-                key=lambda f: -len(f[0]))
-
-            while can_queue_more_jobs(zmq_idle_clients) and potential:
-                target_count = 100000
-                job_list = []
-                count = 0
-                idx = len(potential) - 1
-                while count < target_count and potential and idx >= 0:
-                    name, (tasks, point_count) = potential[idx]
-                    if name not in state.node_process.active:
-                        count += point_count
-                        job_list += [name]
-                        job_list += [node_store.get(name)]
-                        job_list += [struct.pack('>I', len(tasks))]
-                        job_list += tasks
-                        del potential[idx]
-                        del state.node_process.input[name]
-                        state.node_process.active[name] = (len(tasks), point_count, now)
-
-                        if name in state.node_process.inactive:
-                            state.node_process.inactive.pop(state.node_process.inactive.index(name))
-                    idx -= 1
-
-                if job_list:
-                    zmq_send_to_process(zmq_idle_clients, zmq_skt, job_list)
+        while state.node_process.merges and can_queue_more_jobs(zmq_idle_clients):
+            name = state.node_process.merges.pop()
+            partials = state.node_process.splits[name].start_merge()
+            zmq_send_to_process(zmq_idle_clients, zmq_skt, [b'merge', name, node_store.get(name)] + partials)
+
+        while can_queue_more_jobs(zmq_idle_clients) and state.node_process.input:
+            target_count = job_sizer.target_count(state.node_process.input.point_count, worker_count)
+            job_list = []
+            count = 0
+            split_jobs = 1
+            while count < target_count:
+                name = state.node_process.input.pop_next(state.node_process.active)
+                if name is None:
+                    break
+                if split_nodes:
+                    split_jobs = state.split_count(name, target_count, len(zmq_idle_clients))
+                    if split_jobs > 1:
+                        if job_list:
+                            # split it in the next job
+                            state.node_process.input.reschedule(name)
+                            split_jobs = 1
+                        break
+                tasks, point_count = state.node_process.input.pop(name)
+                count += point_count
+                job_list += [name]
+                job_list += [node_store.get(name)]
+                job_list += [struct.pack('>I', len(tasks))]
+                for task in tasks:
+                    job_list += task
+                state.node_process.active[name] = (len(tasks), point_count, now, tasks)
+                state.shared_memory.dispatched(name)
+
+                state.node_process.inactive.remove_inactive(name)
+
+            if split_jobs > 1:
+                tasks, point_count = state.node_process.input.pop(name)
+                data = node_store.get(name)
+                for i in range(split_jobs):
+                    part = tasks[i::split_jobs]
+                    if len(name) == 0:
+                        # the root has no state: its tasks can be processed by regular jobs
+                        job_list = [name, data, struct.pack('>I', len(part))]
+                    else:
+                        job_list = [b'partial', name, data]
+                    for task in part:
+                        job_list += task
+                    client_id = zmq_send_to_process(zmq_idle_clients, zmq_skt, job_list)
+                    job_sizer.job_started(client_id, sum([point_batch.point_count(task[0]) for task in part]), time.time())
+                state.node_process.splits[name] = NodeSplit(split_jobs)
+                state.node_process.active[name] = (len(tasks), point_count, now, tasks)
+                state.shared_memory.dispatched(name)
+                state.node_process.inactive.remove_inactive(name)
+                continue
+
+            if not job_list:
+                break
+            client_id = zmq_send_to_process(zmq_idle_clients, zmq_skt, job_list)
+            job_sizer.job_started(client_id, count, time.time())
 
         while (state.reader.input
-               and (points_in_progress < 60000000 or not state.reader.active)
-               and len(state.reader.active) < max_splitting_jobs_count
+               and len(state.reader.active) < max(1, worker_count // 2)
                and can_queue_more_jobs(zmq_idle_clients)):
+            file, portion = state.reader.input[-1]
+            # the reader's copy of the points + their queued payload
+            portion_size = 2 * (portion[1] - portion[0]) * point_batch.POINT_BYTES
+            if state.reader.active and not reader_memory.allows(portion_size, state.node_process.input.byte_size, time.time()):
+                break
+
             if verbose >= 1:
                 print('Submit next portion {}'.format(state.reader.input[-1]))
             _id = 'root_{}'.format(len(state.reader.input)).encode('ascii')
-            file, portion = state.reader.input.pop()
+            state.reader.input.pop()
             points_in_progress += portion[1] - portion[0]
+            reader_memory.reserve(portion_size)
 
             zmq_send_to_process(zmq_idle_clients, zmq_skt, [pickle.dumps({
                 'filename': file,
                 'offset_scale': (-avg_min, root_scale, rotation_matrix[:3, :3].T if rotation_matrix is not None else None, infos['color_scale']),
                 'portion': portion,
+                'partition': partition,
                 'id': _id
             })])
 
-            state.reader.active.append(_id)
+            state.reader.active[_id] = (file, portion)
+
+        if (checkpoint_interval
+                and zmq_processes_killed < 0
+                and time.time() - last_checkpoint >= checkpoint_interval):
+            if verbose >= 1:
+                print('Writing checkpoint')
+            with master_trace.span('checkpoint'):
+                checkpoint.write(outfolder, {
+                    'files': files,
+                    'rgb': rgb,
+                    'conversion': conversion,
+                    'processed_points': processed_points,
+                    'points_read': points_read,
+                    'points_in_pnts': points_in_pnts,
+                    'state': state.checkpoint(),
+                }, node_store)
+            last_checkpoint = time.time()
+
+        if zmq_processes_killed >= 0:
+            # remote workers that joined during the shutdown
+            for idle_clients in [zmq_idle_clients, zmq_idle_writers]:
+                if idle_clients:
+                    zmq_send_to_all_process(idle_clients, zmq_skt, [pickle.dumps(b'shutdown')])
 
         # if at this point we have no work in progress => we're done
-        if len(zmq_idle_clients) == jobs or zmq_processes_killed == jobs:
+        all_idle = len(zmq_idle_clients) == worker_count and len(zmq_idle_writers) == writer_count
+        if worker_count and (all_idle or zmq_processes_killed == worker_count + writer_count):
             if zmq_processes_killed < 0:
-                zmq_send_to_all_process(zmq_idle_clients, zmq_skt, [pickle.dumps(b'shutdown')])
+                for idle_clients in [zmq_idle_clients, zmq_idle_writers]:
+                    if idle_clients:
+                        zmq_send_to_all_process(idle_clients, zmq_skt, [pickle.dumps(b'shutdown')])
                 zmq_processes_killed = 0
             else:
                 assert points_in_pnts == infos['point_count'], '!!! Invalid point count in the written .pnts (expected: {}, was: {})'.format(
                     infos['point_count'], points_in_pnts)
                 if verbose >= 1:
                     print('Writing 3dtiles {}'.format(infos['avg_min']))
-                write_tileset(working_dir,
-                              outfolder,
-                              octree_metadata,
-                              avg_min,
-                              root_scale,
-                              projection,
-                              rotation_matrix,
-                              rgb)
+                with master_trace.span('tileset'):
+                    write_tileset(working_dir,
+                                  outfolder,
+                                  octree_metadata,
+                                  avg_min,
+                                  root_scale,
+                                  projection,
+                                  rotation_matrix,
+                                  rgb)
                 shutil.rmtree(working_dir)
+                checkpoint.remove(outfolder)
+                if progress_callback is not None:
+                    progress_callback(progress_event(True))
                 if verbose >= 1:
                     print('Done')
 
@@ -699,7 +1199,7 @@ def convert(files,
                 print('{} % points in {} sec [{} tasks, {} nodes, {} wip]'.format(
                     round(100 * processed_points / infos['point_count'], 2),
                     round(now, 1),
-                    jobs - len(zmq_idle_clients),
+                    worker_count - len(zmq_idle_clients),
                     len(state.node_process.active),
                     points_in_progress))
             elif verbose >= 0:
@@ -710,54 +1210,40 @@ def convert(files,
                     print('')
                     previous_percent = int(percent)
 
-            if graph:
-                percent = round(100 * processed_points / infos['point_count'], 3)
-                print('{}, {}'.format(time.time() - startup, percent), file=progression_log)
+            master_trace.counter('progress', percent=round(100 * processed_points / infos['point_count'], 3))
+            master_trace.counter(
+                'queues',
+                portions=len(state.reader.input),
+                node_points=state.node_process.input.point_count,
+                pnts=len(state.to_pnts.input),
+                idle_workers=len(zmq_idle_clients))
 
-        node_store.control_memory_usage(cache_size, verbose)
+        if progress_callback is not None and (last_progress is None or time.time() - startup - last_progress.elapsed >= PROGRESS_INTERVAL):
+            last_progress = progress_event(False)
+            progress_callback(last_progress)
+
+        start = time.time()
+        evicted = node_store.control_memory_usage(cache_size, verbose)
+        if evicted is not None:
+            spilled_bytes += evicted[1]
+            master_trace.complete('evict', start, time.time(), 'cache', nodes=evicted[0], bytes=evicted[1])
 
     if verbose >= 1:
         print('destroy', round(time_waiting_an_idle_process, 2))
 
-    if graph:
-        progression_log.close()
-
-    # pygal chart
-    if graph:
-        import pygal
-
-        dateline = pygal.XY(x_label_rotation=25, secondary_range=(0, 100))  # , show_y_guides=False)
-        for pid in activities:
-            activity = []
-            filename = 'activity.{}.csv'.format(pid)
-            i = len(activities) - activities.index(pid) - 1
-            # activities.index(pid) =
-            with open(filename, 'r') as f:
-                content = f.read().split('\n')
-                for line in content[1:]:
-                    line = line.split(',')
-                    if line[0]:
-                        ts = float(line[0])
-                        value = int(line[1]) / 3.0
-                        activity.append((ts, i + value * 0.9))
-
-            os.remove(filename)
-            if activity:
-                activity.append((activity[-1][0], activity[0][1]))
-                activity.append(activity[0])
-                dateline.add(str(pid), activity, show_dots=False, fill=True)
-
-        with open('progression.csv', 'r') as f:
-            values = []
-            for line in f.read().split('\n'):
-                if line:
-                    line = line.split(',')
-                    values += [(float(line[0]), float(line[1]))]
-        os.remove('progression.csv')
-        dateline.add('progression', values, show_dots=False, secondary=True, stroke_style={'width': 2, 'color': 'black'})
-
-        dateline.render_to_file('activity.svg')
-
+    master_trace.close()
+    if trace_file is not None:
+        trace.merge(trace_folder, trace_file)
+    master_profiler.close()
+    if profile is not None:
+        report = profiling.merge(profile)
+        if verbose >= 0:
+            print('Profile report written in {}'.format(report))
+
+    state.shared_memory.unlink_all()
+    zmq_skt.close()
+    if authenticator is not None:
+        authenticator.stop()
     context.destroy()
 
 
@@ -0,0 +1,315 @@
+import argparse
+import multiprocessing
+import os
+import pickle
+import signal
+import sys
+import threading
+import traceback
+from collections import Counter
+import zmq
+from py3dtiles.convert import convert, zmq_process
+from py3dtiles.points import auth
+
+
+DEFAULT_ENDPOINT = 'ipc:///tmp/py3dtiles-daemon'
+
+
+def pool_worker(pool_endpoint):
+    """Worker process of the daemon pool: it serves the conversions the
+    daemon assigns it to, keeping its imports and compiled kernels warm"""
+    context = zmq.Context()
+    skt = context.socket(zmq.DEALER)
+    skt.setsockopt(zmq.IDENTITY, str(os.getpid()).encode('ascii'))
+    skt.connect(pool_endpoint)
+    daemon_pid = os.getppid()
+
+    while True:
+        skt.send_multipart([b'ready'])
+        while not skt.poll(1000):
+            if os.getppid() != daemon_pid:
+                # the daemon was killed
+                return
+        endpoint = skt.recv_multipart()[0]
+        zmq_process(endpoint.decode('ascii'), None)
+
+
+class WorkerPool(object):
+    """Assigns the idle workers of the daemon to the conversions in progress.
+
+    The conversions share the pool: each one gets at most its share of the
+    workers, and an idle worker joins the conversion with the fewest workers.
+    When a conversion is submitted, the ones with more than their share
+    release their extra workers (see rebalance). Otherwise, workers come back
+    once their conversion shut them down: from then on, this conversion
+    doesn't get new workers.
+    """
+
+    def __init__(self):
+        self.workers = set()
+        self.idle = []
+        self.conversions = {}
+        self.closing = set()
+        self.assigned = {}
+        # by conversion, the workers asked back and not returned yet
+        self.releasing = Counter()
+
+    def add_conversion(self, conversion_id, endpoint):
+        self.conversions[conversion_id] = endpoint
+
+    def remove_conversion(self, conversion_id):
+        """Returns the workers that didn't come back from the conversion yet"""
+        del self.conversions[conversion_id]
+        self.closing.discard(conversion_id)
+        del self.releasing[conversion_id]
+        workers = [w for w, c in self.assigned.items() if c == conversion_id]
+        for worker_id in workers:
+            del self.assigned[worker_id]
+        return workers
+
+    def worker_ready(self, worker_id):
+        conversion_id = self.assigned.pop(worker_id, None)
+        if self.releasing[conversion_id] > 0:
+            self.releasing[conversion_id] -= 1
+        elif conversion_id in self.conversions:
+            self.closing.add(conversion_id)
+        self.workers.add(worker_id)
+        self.idle.append(worker_id)
+
+    def forget(self, worker_id):
+        self.workers.discard(worker_id)
+        if worker_id in self.idle:
+            self.idle.remove(worker_id)
+        self.assigned.pop(worker_id, None)
+
+    def _share(self):
+        """Returns the workers count of each conversion, and its share of the
+        pool"""
+        counts = Counter(self.assigned.values())
+        counts.subtract(self.releasing)
+        active = [c for c in self.conversions if c not in self.closing]
+        return counts, max(1, len(self.workers) // max(1, len(active)))
+
+    def rebalance(self):
+        """Returns the number of workers each conversion must release, to
+        keep its share of the pool"""
+        counts, share = self._share()
+        releases = {}
+        for conversion_id in self.conversions:
+            if conversion_id not in self.closing and counts[conversion_id] > share:
+                releases[conversion_id] = counts[conversion_id] - share
+                self.releasing[conversion_id] += releases[conversion_id]
+        return releases
+
+    def assign(self):
+        """Returns the new (worker id, conversion endpoint) assignments"""
+        assignments = []
+        counts, share = self._share()
+        candidates = [c for c in self.conversions if c not in self.closing]
+        while self.idle:
+            candidates = [c for c in candidates if counts[c] < share]
+            if not candidates:
+                break
+            conversion_id = min(candidates, key=lambda c: counts[c])
+            worker_id = self.idle.pop()
+            self.assigned[worker_id] = conversion_id
+            counts[conversion_id] += 1
+            assignments.append((worker_id, self.conversions[conversion_id]))
+        return assignments
+
+
+def _run_conversion(context, conversion_id, endpoint, files, kwargs):
+    skt = context.socket(zmq.PUSH)
+    skt.connect('inproc://conversions')
+    conversion_id = str(conversion_id).encode('ascii')
+
+    if kwargs.pop('progress', False):
+        kwargs['progress_callback'] = lambda progress: skt.send_multipart(
+            [conversion_id, b'progress', pickle.dumps(progress)])
+
+    # the conversion has no local workers: the pool ones join it
+    kwargs.update(jobs=0, writers=0, bind=endpoint, verbose=-1)
+    error = None
+    try:
+        convert(files, **kwargs)
+    except BaseException as e:
+        traceback.print_exc()
+        error = e
+
+    try:
+        result = pickle.dumps(error)
+    except Exception:
+        result = pickle.dumps(RuntimeError(repr(error)))
+
+    skt.send_multipart([conversion_id, b'done', result])
+    skt.close()
+
+
+def run(bind, jobs, verbose=0, key_file=None):
+    """Start a pool of jobs workers, and run the conversions submitted to bind
+    (by the clients with key_file, for a tcp endpoint)"""
+    key = auth.read_key(key_file) if key_file is not None else None
+    auth.check_endpoint(bind, key)
+    # stop the workers on SIGTERM too
+    signal.signal(signal.SIGTERM, lambda signum, frame: sys.exit(0))
+
+    context = zmq.Context()
+
+    clients = context.socket(zmq.ROUTER)
+    authenticator = auth.server(context, clients, key)
+    clients.bind(bind)
+    pool_endpoint = 'ipc:///tmp/py3dtiles-pool-{}'.format(os.getpid())
+    workers = context.socket(zmq.ROUTER)
+    workers.bind(pool_endpoint)
+    done = context.socket(zmq.PULL)
+    done.bind('inproc://conversions')
+
+    processes = {}
+
+    # workers are started from a clean interpreter, as they're also respawned
+    # while conversions threads are running
+    spawn = multiprocessing.get_context('spawn')
+
+    def start_worker():
+        p = spawn.Process(target=pool_worker, args=(pool_endpoint,))
+        p.start()
+        processes[str(p.pid).encode('ascii')] = p
+
+    for i in range(jobs):
+        start_worker()
+
+    pool = WorkerPool()
+    conversion_clients = {}
+    controls = {}
+    conversion_count = 0
+
+    poller = zmq.Poller()
+    for skt in [clients, workers, done]:
+        poller.register(skt, zmq.POLLIN)
+
+    if verbose >= 0:
+        print('Listening for conversions on {}'.format(bind))
+
+    try:
+        while True:
+            # SIGTERM may be received by a zmq thread: the timeout lets the
+            # main thread run the handler
+            for skt, _ in poller.poll(1000):
+                if skt is clients:
+                    client_id, request = clients.recv_multipart()
+                    files, kwargs = pickle.loads(request)
+                    conversion_count += 1
+                    endpoint = 'ipc:///tmp/py3dtiles-{}-{}'.format(os.getpid(), conversion_count)
+                    if verbose >= 0:
+                        print('Conversion {} started: {}'.format(conversion_count, ', '.join(files)))
+
+                    pool.add_conversion(conversion_count, endpoint)
+                    conversion_clients[conversion_count] = client_id
+                    # to ask the conversion to release workers
+                    controls[conversion_count] = context.socket(zmq.DEALER)
+                    controls[conversion_count].connect(endpoint)
+                    threading.Thread(
+                        target=_run_conversion,
+                        args=(context, conversion_count, endpoint, files, kwargs),
+                        daemon=True).start()
+                elif skt is workers:
+                    worker_id, _ = workers.recv_multipart()
+                    # ignore the workers killed after a failed conversion
+                    if worker_id in processes:
+                        pool.worker_ready(worker_id)
+                else:
+                    conversion_id, kind, result = done.recv_multipart()
+                    conversion_id = int(conversion_id)
+                    if kind == b'progress':
+                        clients.send_multipart([conversion_clients[conversion_id], kind, result])
+                        continue
+
+                    failed = pickle.loads(result) is not None
+                    if verbose >= 0:
+                        print('Conversion {} {}'.format(conversion_id, 'failed' if failed else 'done'))
+
+                    missing_workers = pool.remove_conversion(conversion_id)
+                    controls.pop(conversion_id).close(linger=0)
+                    if failed:
+                        # these workers might wait for this conversion forever
+                        for worker_id in missing_workers:
+                            pool.forget(worker_id)
+                            processes.pop(worker_id).terminate()
+                            start_worker()
+                    clients.send_multipart([conversion_clients.pop(conversion_id), kind, result])
+
+            for conversion_id, count in pool.rebalance().items():
+                controls[conversion_id].send_multipart([b'release', str(count).encode('ascii')])
+            for worker_id, endpoint in pool.assign():
+                workers.send_multipart([worker_id, endpoint.encode('ascii')])
+    finally:
+        for p in processes.values():
+            p.terminate()
+        if authenticator is not None:
+            clients.close(linger=0)
+            authenticator.stop()
+        context.destroy(linger=0)
+
+
+def submit(endpoint, files, **kwargs):
+    """Run a conversion in the daemon bound to endpoint and wait for its end.
+
+    Takes the same arguments as convert() (jobs, writers and bind are ignored), and
+    raises the exceptions of the conversion. The progress_callback is called
+    by this process, with the events forwarded by the daemon. key_file is the
+    one of the daemon, for a tcp endpoint.
+    """
+    key_file = kwargs.pop('key_file', None)
+    key = auth.read_key(key_file) if key_file is not None else None
+    auth.check_endpoint(endpoint, key)
+    files = [files] if isinstance(files, str) else files
+    # the daemon doesn't share our working directory
+    files = [os.path.abspath(f) for f in files]
+    kwargs['outfolder'] = os.path.abspath(kwargs.get('outfolder', './3dtiles'))
+    if kwargs.get('trace_file') is not None:
+        kwargs['trace_file'] = os.path.abspath(kwargs['trace_file'])
+    if kwargs.get('profile') is not None:
+        kwargs['profile'] = os.path.abspath(kwargs['profile'])
+    progress_callback = kwargs.pop('progress_callback', None)
+    kwargs['progress'] = progress_callback is not None
+
+    context = zmq.Context()
+    skt = context.socket(zmq.DEALER)
+    auth.client(skt, key)
+    skt.connect(endpoint)
+    skt.send_multipart([pickle.dumps((files, kwargs))])
+    while True:
+        kind, result = skt.recv_multipart()
+        if kind != b'progress':
+            break
+        progress_callback(pickle.loads(result))
+    error = pickle.loads(result)
+    context.destroy(linger=0)
+
+    if error is not None:
+        raise error
+
+
+def init_parser(subparser, str2bool):
+    parser = subparser.add_parser(
+        'daemon',
+        help='Start a pool of workers running the conversions submitted with convert --daemon.',
+        formatter_class=argparse.ArgumentDefaultsHelpFormatter)
+    parser.add_argument(
+        '--bind',
+        help='The zmq endpoint conversions are submitted to.',
+        default=DEFAULT_ENDPOINT,
+        type=str)
+    parser.add_argument(
+        '--jobs',
+        help='The number of worker processes to start. Default to the number of cpu.',
+        default=multiprocessing.cpu_count(),
+        type=int)
+    parser.add_argument(
+        '--key_file',
+        help='The key file shared with the clients (see py3dtiles keygen), required with a tcp endpoint',
+        type=str)
+
+
+def main(args):
+    run(args.bind, args.jobs, args.verbose, args.key_file)
@@ -10,6 +10,7 @@ import errno
 import numpy as np
 from py3dtiles import TriangleSoup, GlTF, B3dm, BatchTable
 from .feature_table import FeatureTable
+from .points import profiling
 
 
 class BoundingBox():
@@ -334,8 +335,16 @@ def init_parser(subparser, str2bool):
     lid_help = 'layer Id'
     parser.add_argument('-lid', metavar='LAYERID', type=str, help=lid_help)
 
+    profile_help = 'profile the export with cProfile, and write its pstats file and report.txt in this folder'
+    parser.add_argument('--profile', metavar='FOLDER', type=str, help=profile_help)
+
 
 def main(args):
+    with profiling.profile_command(args.profile, 'export'):
+        _export(args)
+
+
+def _export(args):
     if args.D is not None:
         if args.t is None or args.c is None:
             print('Error: please define a table (-t) and column (-c)')
@@ -18,22 +18,332 @@ class SemanticPoint(Enum):
     BATCH_ID = 8
 
 
-class FeatureTable(object):
+# dtypes of the semantics of a point cloud feature table
+POSITION_DTYPES = {
+    SemanticPoint.POSITION: np.dtype([('X', '<f4'), ('Y', '<f4'), ('Z', '<f4')]),
+    SemanticPoint.POSITION_QUANTIZED: np.dtype([('X', '<u2'), ('Y', '<u2'), ('Z', '<u2')]),
+}
+COLOR_DTYPES = {
+    SemanticPoint.RGB: np.dtype([('Red', 'u1'), ('Green', 'u1'), ('Blue', 'u1')]),
+    SemanticPoint.RGBA: np.dtype([('Red', 'u1'), ('Green', 'u1'), ('Blue', 'u1'), ('Alpha', 'u1')]),
+}
+
+
+def _semantic(dtypes, dtype):
+    for semantic, semantic_dtype in dtypes.items():
+        if semantic_dtype == dtype:
+            return semantic
+    raise ValueError('Unsupported feature dtype {}'.format(dtype))
+
+
+class Feature(object):
+    """A point of a point cloud: its position and color values, by name"""
+
+    def __init__(self):
+        self.positions = {}
+        self.colors = {}
+
+    def to_array(self):
+        pos_arr = np.array([tuple(self.positions.values())], dtype=_dtype_of(self.positions)).view(np.uint8)
+        if not self.colors:
+            return pos_arr
+        col_arr = np.array([tuple(self.colors.values())], dtype=_dtype_of(self.colors)).view(np.uint8)
+        return np.concatenate((pos_arr, col_arr))
+
+    @staticmethod
+    def from_values(x, y, z, red=None, green=None, blue=None, alpha=None):
+        f = Feature()
+        f.positions = {'X': x, 'Y': y, 'Z': z}
+        if red is not None or green is not None or blue is not None:
+            f.colors = {'Red': red, 'Green': green, 'Blue': blue}
+            if alpha is not None:
+                f.colors['Alpha'] = alpha
+        return f
+
+    @staticmethod
+    def from_array(positions_dtype, positions, colors_dtype=None, colors=None):
+        """
+        Parameters
+        ----------
+        positions_dtype : numpy.dtype
+
+        positions : numpy.array
+            Array of uint8 of a single point position.
+
+        colors_dtype : numpy.dtype
+
+        colors : numpy.array
+            Array of uint8 of a single point color.
+
+        Returns
+        -------
+        f : Feature
+        """
+        f = Feature()
+        position = positions.view(positions_dtype)[0]
+        f.positions = {name: position[name] for name in positions_dtype.names}
+        if colors_dtype is not None:
+            color = colors.view(colors_dtype)[0]
+            f.colors = {name: color[name] for name in colors_dtype.names}
+        return f
+
+
+def _dtype_of(values):
+    for dtypes in [POSITION_DTYPES, COLOR_DTYPES]:
+        for dtype in dtypes.values():
+            if list(dtype.names) == list(values):
+                return dtype
+    raise ValueError('Unsupported feature values {}'.format(list(values)))
+
+
+class FeatureTableHeader(object):
     """
-    Only the JSON header has been implemented for now.
+    The JSON header of a feature table: the semantics of the points of a
+    point cloud (if positions_dtype is set), and global properties.
     """
 
     def __init__(self):
-        self.header = {}
+        # point semantics
+        self.positions = SemanticPoint.POSITION
+        self.positions_offset = 0
+        self.positions_dtype = None
+
+        # color semantics
+        self.colors = SemanticPoint.NONE
+        self.colors_offset = 0
+        self.colors_dtype = None
+
+        # global semantics
+        self.points_length = 0
+        self.rtc = None
+        self.properties = {}
 
     def add_property_from_value(self, propertyName, val):
-        self.header[propertyName] = val
+        self.properties[propertyName] = val
+
+    def to_json(self):
+        jsond = {}
+
+        if self.positions_dtype is not None:
+            jsond['POINTS_LENGTH'] = self.points_length
+
+        if self.rtc is not None:
+            jsond['RTC_CENTER'] = self.rtc
+
+        if self.positions_dtype is not None:
+            jsond[self.positions.name] = {'byteOffset': self.positions_offset}
+            if self.colors != SemanticPoint.NONE:
+                jsond[self.colors.name] = {'byteOffset': self.colors_offset}
+
+        jsond.update(self.properties)
+        return jsond
 
-    # returns feature table as binary
     def to_array(self):
         # convert dict to json string
-        ft_json = json.dumps(self.header, separators=(',', ':'))
+        ft_json = json.dumps(self.to_json(), separators=(',', ':'))
         # header must be 8-byte aligned
         ft_json += ' ' * (8 - (len(ft_json) - 4) % 8)
-        # returns an array of binaries representing the batch table
-        return np.fromstring(ft_json, dtype=np.uint8)
+        return np.frombuffer(ft_json.encode('utf-8'), dtype=np.uint8)
+
+    @staticmethod
+    def from_dtype(positions_dtype, colors_dtype, nfeatures):
+        """
+        Parameters
+        ----------
+        positions_dtype : numpy.dtype
+            Numpy description of a position (X, Y, Z as float32 or uint16).
+
+        colors_dtype : numpy.dtype
+            Numpy description of a color (Red, Green, Blue and Alpha as
+            uint8), or None.
+
+        nfeatures : int
+            The number of points.
+
+        Returns
+        -------
+        fth : FeatureTableHeader
+        """
+        fth = FeatureTableHeader()
+        fth.points_length = nfeatures
+
+        fth.positions = _semantic(POSITION_DTYPES, positions_dtype)
+        fth.positions_dtype = positions_dtype
+        fth.positions_offset = 0
+
+        if colors_dtype is not None:
+            fth.colors = _semantic(COLOR_DTYPES, colors_dtype)
+            fth.colors_dtype = colors_dtype
+            fth.colors_offset = nfeatures * positions_dtype.itemsize
+
+        return fth
+
+    @staticmethod
+    def from_array(array):
+        """
+        Parameters
+        ----------
+        array : numpy.array
+            Array of uint8 of the JSON header.
+
+        Returns
+        -------
+        fth : FeatureTableHeader
+        """
+        jsond = json.loads(array.tobytes().decode('utf-8'))
+        fth = FeatureTableHeader()
+        fth.points_length = jsond.pop('POINTS_LENGTH', 0)
+        fth.rtc = jsond.pop('RTC_CENTER', None)
+
+        for semantic in POSITION_DTYPES:
+            if semantic.name in jsond:
+                fth.positions = semantic
+                fth.positions_dtype = POSITION_DTYPES[semantic]
+                fth.positions_offset = jsond.pop(semantic.name)['byteOffset']
+
+        for semantic in COLOR_DTYPES:
+            if semantic.name in jsond:
+                fth.colors = semantic
+                fth.colors_dtype = COLOR_DTYPES[semantic]
+                fth.colors_offset = jsond.pop(semantic.name)['byteOffset']
+
+        fth.properties = jsond
+        return fth
+
+
+class FeatureTableBody(object):
+    """The binary body of a point cloud feature table: the positions, then
+    the colors of the points"""
+
+    def __init__(self):
+        self.positions_arr = np.array([], dtype=np.uint8)
+        self.positions_itemsize = 0
+
+        self.colors_arr = np.array([], dtype=np.uint8)
+        self.colors_itemsize = 0
+
+    def to_array(self):
+        if len(self.colors_arr):
+            return np.concatenate((self.positions_arr, self.colors_arr))
+        return self.positions_arr
+
+    @staticmethod
+    def from_features(fth, features):
+        b = FeatureTableBody()
+
+        b.positions_itemsize = fth.positions_dtype.itemsize
+        b.positions_arr = np.array(
+            [tuple(f.positions.values()) for f in features], dtype=fth.positions_dtype).view(np.uint8)
+
+        if fth.colors_dtype is not None:
+            b.colors_itemsize = fth.colors_dtype.itemsize
+            b.colors_arr = np.array(
+                [tuple(f.colors.values()) for f in features], dtype=fth.colors_dtype).view(np.uint8)
+
+        return b
+
+    @staticmethod
+    def from_array(fth, array):
+        """
+        Parameters
+        ----------
+        fth : FeatureTableHeader
+
+        array : numpy.array
+            Array of uint8 of the binary body.
+
+        Returns
+        -------
+        b : FeatureTableBody
+        """
+        b = FeatureTableBody()
+        array = np.frombuffer(array, dtype=np.uint8) if not isinstance(array, np.ndarray) else array
+
+        b.positions_itemsize = fth.positions_dtype.itemsize
+        size = fth.points_length * b.positions_itemsize
+        b.positions_arr = array[fth.positions_offset:fth.positions_offset + size]
+
+        if fth.colors_dtype is not None:
+            b.colors_itemsize = fth.colors_dtype.itemsize
+            size = fth.points_length * b.colors_itemsize
+            b.colors_arr = array[fth.colors_offset:fth.colors_offset + size]
+
+        return b
+
+    def positions(self, n):
+        itemsize = self.positions_itemsize
+        return self.positions_arr[n * itemsize:(n + 1) * itemsize]
+
+    def colors(self, n):
+        itemsize = self.colors_itemsize
+        return self.colors_arr[n * itemsize:(n + 1) * itemsize]
+
+
+class FeatureTable(object):
+    """
+    The feature table of a tile: the points of a point cloud (.pnts), or
+    only global properties in its JSON header (e.g. BATCH_LENGTH for .b3dm).
+    """
+
+    def __init__(self):
+        self.header = FeatureTableHeader()
+        self.body = FeatureTableBody()
+
+    def npoints(self):
+        return self.header.points_length
+
+    def add_property_from_value(self, propertyName, val):
+        self.header.add_property_from_value(propertyName, val)
+
+    # returns feature table as binary
+    def to_array(self):
+        return np.concatenate((self.header.to_array(), self.body.to_array()))
+
+    @staticmethod
+    def from_array(th, array):
+        """
+        Parameters
+        ----------
+        th : TileHeader
+
+        array : numpy.array
+            Array of uint8 of the feature table (JSON header and body).
+
+        Returns
+        -------
+        ft : FeatureTable
+        """
+        ft = FeatureTable()
+        ft.header = FeatureTableHeader.from_array(array[0:th.ft_json_byte_length])
+        if ft.header.positions_dtype is not None:
+            ft.body = FeatureTableBody.from_array(
+                ft.header, array[th.ft_json_byte_length:th.ft_json_byte_length + th.ft_bin_byte_length])
+        return ft
+
+    @staticmethod
+    def from_features(pd_type, cd_type, features):
+        """
+        Parameters
+        ----------
+        pd_type : numpy.dtype
+            Numpy description of a position.
+
+        cd_type : numpy.dtype
+            Numpy description of a color, or None.
+
+        features : Feature[]
+
+        Returns
+        -------
+        ft : FeatureTable
+        """
+        ft = FeatureTable()
+        ft.header = FeatureTableHeader.from_dtype(pd_type, cd_type, len(features))
+        ft.body = FeatureTableBody.from_features(ft.header, features)
+        return ft
+
+    def feature(self, n):
+        """Returns the n-th point of the point cloud, as a Feature"""
+        positions = self.body.positions(n)
+        colors = self.body.colors(n) if self.header.colors_dtype is not None else None
+        return Feature.from_array(self.header.positions_dtype, positions, self.header.colors_dtype, colors)
@@ -0,0 +1,14 @@
+import argparse
+from py3dtiles.points import auth
+
+
+def init_parser(subparser, str2bool):
+    parser = subparser.add_parser(
+        'keygen',
+        help='Create the key file authenticating the hosts of a conversion on a tcp endpoint (see the --key_file option of convert, worker and daemon). Copy it on these hosts only.',
+        formatter_class=argparse.ArgumentDefaultsHelpFormatter)
+    parser.add_argument('filename', help='The key file to create, readable by its owner only')
+
+
+def main(args):
+    auth.generate_key(args.filename)
@@ -3,6 +3,7 @@ import os
 import numpy as np
 import json
 from py3dtiles import TileContentReader
+from py3dtiles.points import profiling
 from py3dtiles.points.utils import split_aabb
 from py3dtiles.points.transformations import inverse_matrix
 from py3dtiles.points.task.pnts_writer import points_to_pnts
@@ -273,9 +274,18 @@ def init_parser(subparser, str2bool):
         help='Overwrite the ouput folder if it already exists.',
         default=False,
         type=str2bool)
+    parser.add_argument(
+        '--profile',
+        help='Profile the merge with cProfile, and write its pstats file and report.txt in this folder',
+        type=str)
 
 
 def main(args):
+    with profiling.profile_command(args.profile, 'merge'):
+        _merge(args)
+
+
+def _merge(args):
     dest = '{}/tileset.json'.format(args.folder)
     if os.path.exists(dest):
         if args.overwrite:
@@ -0,0 +1,75 @@
+import os
+import zmq
+from zmq.auth.thread import ThreadAuthenticator
+
+# Authentication of the tcp connections between the conversion processes
+# (master and remote workers, daemon and its clients), with zmq CURVE.
+#
+# The processes exchange pickled messages, so a peer able to connect could
+# run any code on the other side. The hosts share a key file holding a CURVE
+# secret key, and use its keypair on both sides: the server only accepts the
+# clients with this public key, and the clients only talk to a server with
+# it. A peer without the key file can neither connect nor be connected to, and
+# the messages are encrypted.
+#
+# The ipc endpoints are protected by the filesystem permissions instead.
+
+
+def needs_key(endpoint):
+    return endpoint.startswith('tcp://')
+
+
+def generate_key(filename):
+    """Writes a new secret key in filename, readable by its owner only"""
+    _, secret = zmq.curve_keypair()
+    fd = os.open(filename, os.O_WRONLY | os.O_CREAT | os.O_EXCL, 0o600)
+    with os.fdopen(fd, 'wb') as f:
+        f.write(secret + b'\n')
+
+
+def read_key(filename):
+    """Returns the (public, secret) keypair of the key file"""
+    with open(filename, 'rb') as f:
+        secret = f.read().strip()
+    if len(secret) != 40:
+        raise ValueError('{} is not a key file (see py3dtiles keygen)'.format(filename))
+    return zmq.curve_public(secret), secret
+
+
+def check_endpoint(endpoint, key):
+    """Raises ValueError if connections to endpoint need a key, and
+    there's none"""
+    if key is None and needs_key(endpoint):
+        raise ValueError(
+            'The tcp endpoint {} needs a key file shared with the other hosts, to refuse the unauthenticated peers '
+            '(create one with py3dtiles keygen)'.format(endpoint))
+
+
+class _SameKey(object):
+    def __init__(self, public):
+        self.public = public
+
+    def callback(self, domain, key):
+        return key == self.public
+
+
+def server(context, socket, key):
+    """Only accepts the clients with the keypair key on socket (before it's
+    bound). Returns the authenticator thread of the context, to stop once the
+    socket is closed (None without key)"""
+    if key is None:
+        return None
+    authenticator = ThreadAuthenticator(context)
+    authenticator.start()
+    authenticator.configure_curve_callback('*', _SameKey(key[0]))
+    socket.curve_publickey, socket.curve_secretkey = key
+    socket.curve_server = True
+    return authenticator
+
+
+def client(socket, key):
+    """Authenticates socket (before it connects) with the keypair key, and
+    only connects it to a server with the same key"""
+    if key is not None:
+        socket.curve_publickey, socket.curve_secretkey = key
+        socket.curve_serverkey = key[0]
@@ -0,0 +1,79 @@
+import os
+import pickle
+import shutil
+
+# A checkpoint is a folder in the output folder, with the scheduler state
+# (state.pickle) and a snapshot of the node store (nodes/). A new checkpoint
+# is written next to the previous one, which is only removed once the new one
+# is complete.
+FOLDER = 'checkpoint'
+VERSION = 1
+
+
+def _folders(outfolder):
+    base = os.path.join(outfolder, FOLDER)
+    return base, base + '.new', base + '.old'
+
+
+def link_or_copy(src, dst):
+    """Hard link src to dst (files are never modified in place by the node
+    store, so the link is a snapshot), or copy it if links aren't supported"""
+    try:
+        os.link(src, dst)
+    except OSError:
+        shutil.copyfile(src, dst)
+
+
+def write(outfolder, state, node_store):
+    current, new, old = _folders(outfolder)
+
+    for folder in [new, old]:
+        if os.path.isdir(folder):
+            shutil.rmtree(folder)
+    os.makedirs(new)
+
+    node_store.checkpoint(os.path.join(new, 'nodes'))
+    state['version'] = VERSION
+    with open(os.path.join(new, 'state.pickle'), 'wb') as f:
+        pickle.dump(state, f, protocol=pickle.HIGHEST_PROTOCOL)
+
+    if os.path.isdir(current):
+        os.rename(current, old)
+    os.rename(new, current)
+    if os.path.isdir(old):
+        shutil.rmtree(old)
+
+
+def load(outfolder):
+    """Returns the state and the node store folder of the last complete
+    checkpoint of outfolder"""
+    current, _, old = _folders(outfolder)
+    for folder in [current, old]:
+        filename = os.path.join(folder, 'state.pickle')
+        if os.path.exists(filename):
+            with open(filename, 'rb') as f:
+                state = pickle.load(f)
+            if state.get('version') != VERSION:
+                raise ValueError('Unsupported checkpoint version in {}'.format(folder))
+            return state, os.path.join(folder, 'nodes')
+    raise FileNotFoundError('No checkpoint found in {}'.format(outfolder))
+
+
+def remove(outfolder):
+    for folder in _folders(outfolder):
+        if os.path.isdir(folder):
+            shutil.rmtree(folder)
+
+
+def remove_unlisted_pnts(outfolder, written, ignored_folders):
+    """Remove the .pnts written after the checkpoint (their nodes will be
+    written again)"""
+    written = set(written)
+    ignored_folders = set(ignored_folders) | set([os.path.basename(f) for f in _folders(outfolder)])
+    for root, dirs, files in os.walk(outfolder):
+        if root == outfolder:
+            dirs[:] = [d for d in dirs if d not in ignored_folders]
+        for f in files:
+            filename = os.path.relpath(os.path.join(root, f), outfolder)
+            if f.endswith('.pnts') and filename not in written:
+                os.remove(os.path.join(outfolder, filename))
@@ -1,6 +1,9 @@
 from numba import jit, njit
 import numpy as np
 
+# sets the numba cache folder before the kernels are decorated
+import py3dtiles.points.kernels  # noqa: F401
+
 
 @njit("boolean(float32[:,:], float32[:], float32)", fastmath=True, nogil=True, cache=True)
 def is_point_far_enough(points, tested_point, squared_min_distance):
@@ -0,0 +1,70 @@
+"""Compilation of the numba kernels.
+
+The kernels are cached by numba (cache=True): next to the sources, or in the
+user cache folder if the install is read-only. The PY3DTILES_NUMBA_CACHE_DIR
+environment variable sets another folder, e.g. one filled by `py3dtiles warmup`
+when building a container image. It must be set before py3dtiles is imported.
+
+The kernels with an explicit signature are compiled when their module is
+imported, the other ones on first use: compile_all() compiles them for the
+signatures used by the conversion, so that the workers forked by convert (or
+loading them from the cache) don't compile them again.
+"""
+import os
+import time
+from collections import namedtuple
+
+CACHE_DIR_VARIABLE = 'PY3DTILES_NUMBA_CACHE_DIR'
+
+if os.environ.get(CACHE_DIR_VARIABLE):
+    from numba.core import config
+    # for the kernels decorated from now on, and the processes started later
+    config.CACHE_DIR = os.environ['NUMBA_CACHE_DIR'] = os.environ[CACHE_DIR_VARIABLE]
+
+KernelReport = namedtuple('KernelReport', ['name', 'signature', 'seconds', 'compiled'])
+KernelReport.__doc__ = """Compilation of a kernel signature: compiled is False if it was loaded
+from the cache (or already loaded). seconds is None for the kernels compiled
+when their module is imported."""
+
+
+def _lazy_kernels():
+    from numba import types
+    from py3dtiles.points import distance, points_grid
+
+    xyz = types.float32[:, ::1]
+    rgb = types.uint8[:, ::1]
+    vec3 = types.float32[::1]
+    return [
+        (distance.xyz_to_child_index, [(xyz, vec3)]),
+        (points_grid._insert, [(
+            types.List(xyz, reflected=True), types.List(rgb, reflected=True),
+            vec3, vec3, types.int32[::1], xyz, rgb, types.float64, types.int64, types.boolean)]),
+    ]
+
+
+def _name(kernel):
+    return '{}.{}'.format(kernel.py_func.__module__.split('.')[-1], kernel.__name__)
+
+
+def compile_all():
+    """Compile the kernels, or load them from the cache. Returns the import
+    time of their modules, and a KernelReport by signature."""
+    begin = time.time()
+    from py3dtiles.points import distance
+    from py3dtiles.points.task import xyz_reader
+    import_time = time.time() - begin
+
+    report = []
+    for kernel in [distance.is_point_far_enough, distance.xyz_to_key, xyz_reader._parse]:
+        for signature in kernel.signatures:
+            report.append(KernelReport(_name(kernel), signature, None, bool(kernel.stats.cache_misses)))
+
+    for kernel, signatures in _lazy_kernels():
+        for signature in signatures:
+            misses = sum(kernel.stats.cache_misses.values())
+            begin = time.time()
+            kernel.compile(signature)
+            report.append(KernelReport(
+                _name(kernel), signature, time.time() - begin, sum(kernel.stats.cache_misses.values()) > misses))
+
+    return import_time, report
@@ -11,6 +11,30 @@ from py3dtiles.points.distance import xyz_to_child_index
 from py3dtiles.points.task.pnts_writer import points_to_pnts
 
 
+# readers can send their points straight to the nodes down to this depth
+# (see partition.py), so the nodes above it may have no points of their own
+PARTITION_MAX_DEPTH = 3
+
+
+def child_indices(xyz, aabb_size, aabb_center, aabb_top):
+    """Returns the index of the child node of each point, for a node of the given
+    aabb (see split_aabb)"""
+    if aabb_size_to_subdivision_type(aabb_size) == SubdivisionType.QUADTREE:
+        return xyz_to_child_index(
+            xyz,
+            np.array([aabb_center[0], aabb_center[1], aabb_top], dtype=np.float32))
+    return xyz_to_child_index(xyz, aabb_center)
+
+
+def _has_tiles_below(folder, name):
+    names = [name]
+    for _ in range(len(name), PARTITION_MAX_DEPTH):
+        names = [n + str(child).encode('ascii') for n in names for child in range(8)]
+        if any([os.path.exists(name_to_filename(folder, n, '.pnts')) for n in names]):
+            return True
+    return False
+
+
 def node_to_tileset(args):
     return Node.to_tileset(None, args[0], args[1], args[2], args[3], args[4])
 
@@ -101,10 +125,7 @@ class Node(object):
         self.pending_rgb = []
 
     def dump_pending_points(self):
-        result = [
-            (name, pdumps({'xyz': xyz, 'rgb': rgb}), len(xyz))
-            for name, xyz, rgb in self._get_pending_points()
-        ]
+        result = list(self._get_pending_points())
 
         self.pending_xyz = []
         self.pending_rgb = []
@@ -119,16 +140,7 @@ class Node(object):
 
         pending_xyz_arr = np.concatenate(self.pending_xyz)
         pending_rgb_arr = np.concatenate(self.pending_rgb)
-        t = aabb_size_to_subdivision_type(self.aabb_size)
-        if t == SubdivisionType.QUADTREE:
-            indices = xyz_to_child_index(
-                pending_xyz_arr,
-                np.array(
-                    [self.aabb_center[0], self.aabb_center[1], self.aabb[1][2]],
-                    dtype=np.float32)
-            )
-        else:
-            indices = xyz_to_child_index(pending_xyz_arr, self.aabb_center)
+        indices = child_indices(pending_xyz_arr, self.aabb_size, self.aabb_center, self.aabb[1][2])
 
         # unique children list
         childs = np.unique(indices)
@@ -218,9 +230,11 @@ class Node(object):
                 child).encode('ascii')
             child_ondisk_tile = name_to_filename(folder, child_name, '.pnts')
 
-            if os.path.exists(child_ondisk_tile):
+            child_exists = os.path.exists(child_ondisk_tile)
+            # nodes above the partition depth of the readers may be empty
+            if child_exists or _has_tiles_below(folder, child_name):
                 # See if we should merge this child in tile
-                if xyz is not None:
+                if child_exists and xyz is not None:
                     # Read pnts content
                     tile = TileContentReader.read_file(child_ondisk_tile)
                     fth = tile.body.feature_table.header
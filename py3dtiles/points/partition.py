@@ -0,0 +1,82 @@
+import numpy as np
+
+from py3dtiles.points import point_batch, trace
+from py3dtiles.points.node import child_indices, PARTITION_MAX_DEPTH
+from py3dtiles.points.utils import split_aabb
+
+# points sent to a node are buffered until there are this many
+BATCH_SIZE = 10000
+
+
+def partition(xyz, rgb, aabb, depth, name=b''):
+    """Yields (name, xyz, rgb) for each node at depth levels below the node
+    of the given name and aabb, routing the points like Node does"""
+    if depth == 0:
+        yield name, xyz, rgb
+        return
+
+    # same float32 values as Node(name, aabb, ...)
+    aabb_size = (aabb[1] - aabb[0]).astype(np.float32)
+    aabb_center = ((aabb[0] + aabb[1]) * 0.5).astype(np.float32)
+    indices = child_indices(xyz, aabb_size, aabb_center, np.float32(aabb[1][2]))
+    for child in np.unique(indices):
+        mask = np.where(indices == child)
+        yield from partition(
+            xyz[mask], rgb[mask], split_aabb(aabb, int(child)), depth - 1,
+            name + str(child).encode('ascii'))
+
+
+class Partitioner(object):
+    """Sends the points of a reader straight to their node at depth, instead of
+    the root.
+
+    A sample of the points still goes through the root, to fill the nodes
+    above depth. The nodes at depth 1 are the children of the root, which keeps
+    no points, so no sample is needed there.
+    """
+
+    def __init__(self, queue, seed, root_aabb=None, depth=0, sample=0):
+        if depth > PARTITION_MAX_DEPTH:
+            raise ValueError('partition depth must be at most {}'.format(PARTITION_MAX_DEPTH))
+        self.queue = queue
+        self.root_aabb = root_aabb
+        self.depth = depth
+        self.sample = sample
+        self.random = np.random.RandomState(seed)
+        self.buffers = {}
+
+    def send(self, xyz, rgb):
+        if self.depth == 0:
+            self._send(b'', xyz, rgb)
+            return
+
+        if self.sample > 0:
+            sampled = self.random.random_sample(len(xyz)) < self.sample
+            self._send(b'', xyz[sampled], rgb[sampled])
+            xyz, rgb = xyz[~sampled], rgb[~sampled]
+
+        with trace.span('partition', points=len(xyz)):
+            parts = list(partition(xyz, rgb, self.root_aabb, self.depth))
+
+        for name, xyz, rgb in parts:
+            buffer = self.buffers.setdefault(name, [])
+            buffer.append((xyz, rgb))
+            if sum([len(b[0]) for b in buffer]) >= BATCH_SIZE:
+                self._flush(name)
+
+    def flush(self):
+        for name in list(self.buffers):
+            self._flush(name)
+
+    def _flush(self, name):
+        buffer = self.buffers.pop(name)
+        self._send(
+            name,
+            np.concatenate([b[0] for b in buffer]),
+            np.concatenate([b[1] for b in buffer]))
+
+    def _send(self, name, xyz, rgb):
+        if len(xyz) == 0:
+            return
+        with trace.span('send', 'serialization', node=name.decode('ascii'), points=len(xyz)):
+            self.queue.send_multipart([name] + point_batch.encode(xyz, rgb), copy=False)
@@ -0,0 +1,183 @@
+import struct
+import numpy as np
+
+# A point batch is sent as FRAME_COUNT zmq frames: a small fixed header
+# (kind, point count) followed by the raw xyz (float32) and rgb (uint8)
+# buffers, so they can be sent with copy=False and decoded without pickling.
+#
+# With the shared memory transport, large batches are written in a shared
+# memory segment instead (xyz then rgb), and the frames only carry its name.
+HEADER = struct.Struct('>BI')
+FRAME_COUNT = 3
+
+INLINE = 0
+SHARED_MEMORY = 1
+
+# xyz as float32 + rgb as uint8
+POINT_BYTES = 3 * 4 + 3
+
+# batches smaller than this (in bytes) are always sent inline
+SHARED_MEMORY_MIN_SIZE = 1 << 20
+
+# this process' transport setting, see enable_shared_memory()
+_shared_memory_min_size = None
+# segments attached by decode(), until release_attached() is called
+_attached = []
+
+
+def _buffer(frame):
+    # zmq.Frame received with copy=False, or any bytes-like object
+    return getattr(frame, 'buffer', frame)
+
+
+def _create_shared_memory(size):
+    from multiprocessing import shared_memory, resource_tracker
+
+    # segments lifetime is managed by the convert master: the resource tracker
+    # must not unlink them when this process exits. Processes attaching a
+    # segment stay tracked until they unlink it.
+    try:
+        # python >= 3.13
+        return shared_memory.SharedMemory(create=True, size=size, track=False)
+    except TypeError:
+        shm = shared_memory.SharedMemory(create=True, size=size)
+        resource_tracker.unregister(shm._name, 'shared_memory')
+        return shm
+
+
+def _attach_shared_memory(name):
+    from multiprocessing import shared_memory
+    return shared_memory.SharedMemory(name=name)
+
+
+def enable_shared_memory(min_size=SHARED_MEMORY_MIN_SIZE):
+    """Send the batches of at least min_size bytes encoded by this process
+    through shared memory (min_size=None disables it)"""
+    global _shared_memory_min_size
+    _shared_memory_min_size = min_size
+
+
+def encode(xyz, rgb):
+    """Returns the frames of a point batch"""
+    xyz = np.ascontiguousarray(xyz, dtype=np.float32)
+    rgb = np.ascontiguousarray(rgb, dtype=np.uint8)
+    assert len(xyz) == len(rgb)
+    count = len(xyz)
+
+    if _shared_memory_min_size is not None and count * POINT_BYTES >= max(_shared_memory_min_size, 1):
+        shm = _create_shared_memory(count * POINT_BYTES)
+        np.ndarray(xyz.shape, dtype=np.float32, buffer=shm.buf)[:] = xyz
+        np.ndarray(rgb.shape, dtype=np.uint8, buffer=shm.buf, offset=xyz.nbytes)[:] = rgb
+        shm.close()
+        return [HEADER.pack(SHARED_MEMORY, count), shm.name.encode('ascii'), b'']
+
+    return [HEADER.pack(INLINE, count), xyz, rgb]
+
+
+def point_count(header):
+    return HEADER.unpack(_buffer(header))[1]
+
+
+def shared_memory_segment(frames):
+    """Returns the name of the segment holding the batch, or None if it's inline"""
+    kind, _ = HEADER.unpack(_buffer(frames[0]))
+    if kind == SHARED_MEMORY:
+        return bytes(_buffer(frames[1])).decode('ascii')
+    return None
+
+
+def byte_size(frames):
+    """Returns the size of the batch payload, wherever it's stored"""
+    kind, count = HEADER.unpack(_buffer(frames[0]))
+    if kind == SHARED_MEMORY:
+        return count * POINT_BYTES
+    return sum([memoryview(_buffer(f)).nbytes for f in frames])
+
+
+def to_bytes(frames):
+    """Returns a copy of the frames of a batch, as bytes"""
+    return [bytes(_buffer(f)) for f in frames]
+
+
+def _from_buffer(frame, dtype, count):
+    arr = np.frombuffer(_buffer(frame), dtype=dtype).reshape((count, 3))
+    # numba kernels need aligned, writable arrays (tiny zmq messages are
+    # stored inline and might not be aligned)
+    if not arr.flags.aligned or not arr.flags.writeable:
+        arr = arr.copy()
+    return arr
+
+
+def decode(frames):
+    """Returns the xyz and rgb arrays of a point batch, without copy if possible.
+
+    Shared memory segments stay attached until release_attached() is called.
+    """
+    kind, count = HEADER.unpack(_buffer(frames[0]))
+    if kind == SHARED_MEMORY:
+        shm = _attach_shared_memory(shared_memory_segment(frames))
+        _attached.append(shm)
+        return (
+            np.ndarray((count, 3), dtype=np.float32, buffer=shm.buf),
+            np.ndarray((count, 3), dtype=np.uint8, buffer=shm.buf, offset=count * 3 * 4))
+
+    assert kind == INLINE, 'Unknown point batch kind {}'.format(kind)
+    return (
+        _from_buffer(frames[1], np.float32, count),
+        _from_buffer(frames[2], np.uint8, count))
+
+
+def release_attached():
+    """Detach and unlink the segments decoded by this process"""
+    while _attached:
+        shm = _attached.pop()
+        try:
+            shm.close()
+        except BufferError:
+            # some arrays still use it, the mapping is released with them
+            pass
+        shm.unlink()
+
+
+def unlink(segment):
+    try:
+        shm = _attach_shared_memory(segment)
+    except FileNotFoundError:
+        return
+    shm.close()
+    shm.unlink()
+
+
+class SharedMemoryTracker(object):
+    """Tracks the shared memory segments of the point batches known by the
+    convert master, so none of them outlives the conversion.
+
+    Segments are released by the worker processing them: they're forgotten
+    once the job of their node is done.
+    """
+
+    def __init__(self):
+        self.queued = {}
+        self.in_flight = {}
+
+    def __len__(self):
+        return sum([len(s) for s in self.queued.values()]) + sum([len(s) for s in self.in_flight.values()])
+
+    def add(self, name, frames):
+        segment = shared_memory_segment(frames)
+        if segment is not None:
+            self.queued.setdefault(name, []).append(segment)
+
+    def dispatched(self, name):
+        if name in self.queued:
+            self.in_flight[name] = self.queued.pop(name)
+
+    def done(self, name):
+        self.in_flight.pop(name, None)
+
+    def unlink_all(self):
+        for segments in list(self.queued.values()) + list(self.in_flight.values()):
+            for segment in segments:
+                unlink(segment)
+        self.queued.clear()
+        self.in_flight.clear()
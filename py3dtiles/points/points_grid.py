@@ -1,6 +1,7 @@
 import numpy as np
 from numba import njit
 
+import py3dtiles.points.kernels  # noqa: F401 (numba cache folder)
 from py3dtiles.points.utils import SubdivisionType, aabb_size_to_subdivision_type
 from py3dtiles.points.distance import is_point_far_enough, xyz_to_key
 
@@ -0,0 +1,107 @@
+import cProfile
+import glob
+import io
+import os
+import pstats
+import socket
+from contextlib import contextmanager
+
+# Profiles of the conversion processes, with cProfile.
+#
+# Each process profiles its tasks by kind (master loop, read, process, pnts...)
+# and writes one pstats file per kind in the profile folder when it ends. The
+# files are then summed by kind, in <kind>.pstats and in a text report.
+
+REPORT = 'report.txt'
+# functions listed by kind in the report
+REPORT_LINES = 30
+
+
+class Profiler(object):
+    """cProfile profiles of the tasks of this process, by kind, written in
+    folder (a profiler without folder profiles nothing)"""
+
+    def __init__(self, folder=None, process_name=None):
+        self.folder = folder
+        self.process_name = process_name
+        self.profiles = {}
+        self.current = None
+
+    def start(self, kind):
+        if self.folder is not None:
+            self.current = self.profiles.setdefault(kind, cProfile.Profile())
+            self.current.enable()
+
+    def stop(self):
+        if self.current is not None:
+            self.current.disable()
+            self.current = None
+
+    @contextmanager
+    def profile(self, kind):
+        """Profile the with block (blocks can't be nested)"""
+        self.start(kind)
+        try:
+            yield
+        finally:
+            self.stop()
+
+    def close(self):
+        self.stop()
+        if self.folder is None:
+            return
+        os.makedirs(self.folder, exist_ok=True)
+        for kind, profile in self.profiles.items():
+            profile.dump_stats(os.path.join(self.folder, '{}-{}-{}-{}.pstats'.format(
+                kind, self.process_name, socket.gethostname(), os.getpid())))
+        self.profiles = {}
+
+
+# profiler of the tasks of this process
+_current = Profiler()
+
+
+def enable(folder, process_name):
+    """Write the profiles of this process in folder (None to stop profiling)"""
+    global _current
+    _current.close()
+    _current = Profiler(folder, process_name)
+
+
+def profile(kind):
+    return _current.profile(kind)
+
+
+@contextmanager
+def profile_command(folder, kind):
+    """Profile the with block of a single process command in folder, and write
+    its report"""
+    profiler = Profiler(folder, kind)
+    with profiler.profile(kind):
+        yield
+    if folder is not None:
+        profiler.close()
+        merge(folder)
+
+
+def merge(folder):
+    """Sum the pstats files of the processes by kind in folder, and write the
+    report. Returns its filename"""
+    files = {}
+    for filename in glob.glob(os.path.join(folder, '*-*.pstats')):
+        files.setdefault(os.path.basename(filename).split('-')[0], []).append(filename)
+
+    report = io.StringIO()
+    for kind in sorted(files):
+        stats = pstats.Stats(*files[kind], stream=report)
+        stats.dump_stats(os.path.join(folder, '{}.pstats'.format(kind)))
+
+        report.write('{}\n{}\n'.format(kind, '=' * len(kind)))
+        report.write('{} processes, {:.2f} sec\n'.format(len(files[kind]), stats.total_tt))
+        stats.sort_stats('cumulative').print_stats(REPORT_LINES)
+        stats.sort_stats('tottime').print_stats(REPORT_LINES)
+
+    filename = os.path.join(folder, REPORT)
+    with open(filename, 'w') as f:
+        f.write(report.getvalue())
+    return filename
@@ -0,0 +1,54 @@
+import concurrent.futures
+import threading
+
+import numpy as np
+import pyproj
+
+# Reprojection of the points read.
+#
+# A projection is a (srs_in, srs_out) pair of crs definitions (e.g.
+# 'epsg:2154'), cheap to send to the workers. Each thread builds its
+# transformers once, on first use. PROJ releases the GIL while transforming,
+# so the large chunks are split between a few threads.
+
+THREADS = 4
+# chunks with less points are transformed by the calling thread
+THREADED_MIN_POINTS = 50000
+
+_local = threading.local()
+_executor = None
+
+
+def epsg(code):
+    """Returns the crs definition of an EPSG code (e.g. '4978')"""
+    return 'epsg:{}'.format(code)
+
+
+def transformer(projection):
+    """Returns the transformer of projection, for this thread"""
+    transformers = _local.__dict__.setdefault('transformers', {})
+    if projection not in transformers:
+        # x, y as easting, northing (or longitude, latitude) whatever the crs
+        transformers[projection] = pyproj.Transformer.from_crs(*projection, always_xy=True)
+    return transformers[projection]
+
+
+def _reproject(projection, x, y, z):
+    return transformer(projection).transform(x, y, z)
+
+
+def reproject(projection, x, y, z):
+    """Reprojects the coordinates x, y, z (floats or arrays)"""
+    global _executor
+
+    projection = tuple(projection)
+    if np.size(x) < THREADED_MIN_POINTS:
+        return _reproject(projection, x, y, z)
+
+    if _executor is None:
+        _executor = concurrent.futures.ThreadPoolExecutor(THREADS, thread_name_prefix='projection')
+    bounds = np.linspace(0, len(x), THREADS + 1).astype(int)
+    parts = _executor.map(
+        lambda part: _reproject(projection, x[part], y[part], z[part]),
+        [slice(start, end) for start, end in zip(bounds[:-1], bounds[1:])])
+    return [np.concatenate(axis) for axis in zip(*parts)]
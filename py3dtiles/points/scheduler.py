@@ -0,0 +1,405 @@
+import heapq
+import os
+import numpy as np
+import psutil
+from py3dtiles.points import point_batch
+from py3dtiles.points.utils import split_aabb
+
+
+class _TrieNode(object):
+    __slots__ = ('children', 'pending', 'inactive', 'inactive_count')
+
+    def __init__(self):
+        self.children = {}
+        # number of queues (input / active) this exact name is part of
+        self.pending = 0
+        # True if this exact name is done and waiting for its .pnts
+        self.inactive = False
+        # number of inactive names in this subtree (including this node)
+        self.inactive_count = 0
+
+
+class NodeNameTrie(object):
+    """Prefix-trie of the node names known by the convert scheduler.
+
+    Each name is tracked as 'pending' (it has queued or running tasks) and/or
+    'inactive' (its tasks are done but its .pnts hasn't been written yet).
+
+    A .pnts can be written once none of the ancestors of a node (itself
+    included) are pending anymore. Keeping per-subtree counters allows to
+    answer this in O(depth) and to only visit the subtrees that actually
+    contain inactive nodes when looking for writable ones.
+    """
+
+    def __init__(self):
+        self.root = _TrieNode()
+
+    def __len__(self):
+        return self.root.inactive_count
+
+    def __contains__(self, name):
+        node = self._find(name)
+        return node is not None and node.inactive
+
+    def __iter__(self):
+        return self._iter_inactive(self.root, b'', False)
+
+    def add_pending(self, name):
+        self._get_or_create(name).pending += 1
+
+    def remove_pending(self, name):
+        node = self._find(name)
+        assert node is not None and node.pending > 0, '{} is not pending'.format(name)
+        node.pending -= 1
+        self._prune(name)
+
+    def add_inactive(self, name):
+        path = self._path(name, create=True)
+        if path[-1].inactive:
+            return
+        path[-1].inactive = True
+        for node in path:
+            node.inactive_count += 1
+
+    def remove_inactive(self, name):
+        path = self._path(name)
+        if path is None or not path[-1].inactive:
+            return False
+        path[-1].inactive = False
+        for node in path:
+            node.inactive_count -= 1
+        self._prune(name)
+        return True
+
+    def is_blocked(self, name):
+        """Returns True if name or one of its ancestors is pending"""
+        node = self.root
+        if node.pending:
+            return True
+        for c in name:
+            node = node.children.get(c)
+            if node is None:
+                return False
+            if node.pending:
+                return True
+        return False
+
+    def pop_writable(self, finished_node, can_write=None):
+        """Remove and return the inactive nodes below finished_node (itself
+        included) whose .pnts can be written, and for which can_write(name) is
+        True if given"""
+        if self.is_blocked(finished_node):
+            return []
+        node = self._find(finished_node)
+        if node is None or node.inactive_count == 0:
+            return []
+
+        writable = list(self._iter_inactive(node, finished_node, True))
+        if can_write is not None:
+            writable = [name for name in writable if can_write(name)]
+        for name in writable:
+            self.remove_inactive(name)
+        return writable
+
+    def pop_outside(self, finished_node, portion_extents):
+        """Same as pop_writable(finished_node, portion_extents.is_outside),
+        without testing every inactive node.
+
+        The aabbs are split from the parent ones, a node is only tested against
+        the extents intersecting its parent, and the inactive nodes of a
+        subtree outside of all the extents are taken without tests.
+        """
+        if not portion_extents.separates() or self.is_blocked(finished_node):
+            return []
+        node = self._find(finished_node)
+        if node is None or node.inactive_count == 0:
+            return []
+
+        writable = []
+        stack = [(node, finished_node, portion_extents.aabb(finished_node), portion_extents.pending)]
+        while stack:
+            node, name, aabb, extents = stack.pop()
+            if node.inactive_count == 0 or node.pending:
+                continue
+            extents = portion_extents.intersecting(extents, aabb)
+            if len(extents) == 0:
+                writable += self._iter_inactive(node, name, True)
+                continue
+            for c, child in node.children.items():
+                stack.append((child, name + bytes((c,)), split_aabb(aabb, c), extents))
+
+        for name in writable:
+            self.remove_inactive(name)
+        return writable
+
+    def pop_all(self):
+        """Remove and return all the inactive nodes"""
+        names = list(self)
+        for name in names:
+            self.remove_inactive(name)
+        return names
+
+    def _iter_inactive(self, node, name, skip_pending):
+        # iterative DFS, as names can be deeper than the recursion limit allows
+        stack = [(node, name)]
+        while stack:
+            node, name = stack.pop()
+            if node.inactive_count == 0 or (skip_pending and node.pending):
+                continue
+            if node.inactive:
+                yield name
+            for c, child in node.children.items():
+                stack.append((child, name + bytes((c,))))
+
+    def _find(self, name):
+        node = self.root
+        for c in name:
+            node = node.children.get(c)
+            if node is None:
+                return None
+        return node
+
+    def _get_or_create(self, name):
+        return self._path(name, create=True)[-1]
+
+    def _path(self, name, create=False):
+        node = self.root
+        path = [node]
+        for c in name:
+            child = node.children.get(c)
+            if child is None:
+                if not create:
+                    return None
+                child = _TrieNode()
+                node.children[c] = child
+            node = child
+            path.append(node)
+        return path
+
+    def _prune(self, name):
+        # drop the trailing nodes that don't carry any information anymore
+        path = self._path(name)
+        for i in range(len(name), 0, -1):
+            node = path[i]
+            if node.pending or node.inactive_count or node.children:
+                break
+            del path[i - 1].children[name[i - 1]]
+
+
+class PortionExtents(object):
+    """Extents of the input portions, in the octree frame.
+
+    Once the ancestors of a node are done, it only receives new points from the
+    portions not read yet: if none of them intersects the node, its .pnts can
+    be written before the end of the reading.
+    """
+
+    def __init__(self, root_aabb, extents):
+        self.root_aabb = root_aabb
+        # {(filename, portion): aabb}, portions without one can contain any point
+        self.extents = extents
+        # node aabbs are rounded to float32 by the workers
+        self.margin = np.max(root_aabb[1] - root_aabb[0]) * 1e-5
+        self.pending = None
+
+    def update(self, portions):
+        """Set the (filename, portion) not read yet"""
+        extents = [self.extents.get(portion) for portion in portions]
+        if any([extent is None for extent in extents]):
+            self.pending = None
+        else:
+            self.pending = np.array(extents).reshape((len(extents), 2, 3))
+
+    def separates(self):
+        """Returns False if no node can be outside of the portions not read
+        yet, e.g. if one of them spans the whole octree"""
+        if self.pending is None:
+            return False
+        return len(self.intersecting(self.pending, self.root_aabb, contains=True)) == 0
+
+    def aabb(self, name):
+        aabb = self.root_aabb
+        for c in name:
+            aabb = split_aabb(aabb, int(c))
+        return aabb
+
+    def intersecting(self, extents, aabb, contains=False):
+        """Returns the extents intersecting aabb (or containing it)"""
+        if contains:
+            mask = (np.all(extents[:, 0] <= aabb[0] + self.margin, axis=1)
+                    & np.all(extents[:, 1] >= aabb[1] - self.margin, axis=1))
+        else:
+            mask = (np.all(extents[:, 0] <= aabb[1] + self.margin, axis=1)
+                    & np.all(extents[:, 1] >= aabb[0] - self.margin, axis=1))
+        return extents[mask]
+
+    def is_outside(self, name):
+        """Returns True if the node can't receive points from the portions not read yet"""
+        if self.pending is None:
+            return False
+        return len(self.intersecting(self.pending, self.aabb(name))) == 0
+
+
+class NodeTaskQueue(object):
+    """Tasks waiting to be processed, grouped by node name.
+
+    Node names are served from a heap, shallowest nodes first and then the
+    ones with the most pending points. The heap is lazily cleaned: an entry is
+    only valid if it matches the current point count of its node, so adding
+    tasks to a node simply pushes a new entry.
+    """
+
+    def __init__(self):
+        self.tasks = {}
+        self.heap = []
+        self.point_count = 0
+        self.byte_size = 0
+
+    def __len__(self):
+        return len(self.tasks)
+
+    def __contains__(self, name):
+        return name in self.tasks
+
+    def values(self):
+        return self.tasks.values()
+
+    def add(self, name, task, point_count):
+        """Queue a task for name, returns True if name wasn't queued yet"""
+        assert point_count > 0
+        is_new = name not in self.tasks
+        if is_new:
+            tasks, count = [task], point_count
+        else:
+            tasks, count = self.tasks[name]
+            tasks.append(task)
+            count += point_count
+        self.tasks[name] = (tasks, count)
+        self.point_count += point_count
+        self.byte_size += point_batch.byte_size(task)
+        self._push(name, count)
+        return is_new
+
+    def pop(self, name):
+        tasks, count = self.tasks.pop(name)
+        self.point_count -= count
+        self.byte_size -= sum([point_batch.byte_size(t) for t in tasks])
+        return tasks, count
+
+    def pop_next(self, active):
+        """Returns the name of the next node to process, skipping active ones.
+
+        Entries of active nodes are dropped: reschedule() must be called when
+        they become inactive.
+        """
+        while self.heap:
+            _, neg_count, name = heapq.heappop(self.heap)
+            if name in self.tasks and self.tasks[name][1] == -neg_count and name not in active:
+                return name
+        return None
+
+    def reschedule(self, name):
+        if name in self.tasks:
+            self._push(name, self.tasks[name][1])
+
+    def _push(self, name, count):
+        if len(self.heap) > 4 * len(self.tasks) + 64:
+            # too many stale entries, rebuild the heap
+            self.heap = [(len(n), -c, n) for n, (_, c) in self.tasks.items()]
+            heapq.heapify(self.heap)
+        else:
+            heapq.heappush(self.heap, (len(name), -count, name))
+
+
+class JobSizer(object):
+    """Sizes the node jobs from the measured worker throughput.
+
+    The throughput (in points per second) is an exponential moving average
+    of the completed jobs, and jobs are sized to last target_duration
+    seconds. The size is also capped to spread the remaining points over all
+    the workers, so the end of the conversion doesn't starve them.
+    """
+
+    def __init__(self, target_duration, initial_count=100000, min_count=10000, max_count=10000000):
+        self.target_duration = target_duration
+        self.initial_count = initial_count
+        self.min_count = min_count
+        self.max_count = max_count
+        self.rate = None
+        self.started = {}
+
+    def job_started(self, client_id, point_count, now):
+        self.started[client_id] = (point_count, now)
+
+    def job_ended(self, client_id, now):
+        job = self.started.pop(client_id, None)
+        if job is None:
+            return
+        point_count, start = job
+        rate = point_count / max(now - start, 0.001)
+        if self.rate is None:
+            self.rate = rate
+        else:
+            self.rate = 0.8 * self.rate + 0.2 * rate
+
+    def target_count(self, pending_point_count, jobs):
+        if self.rate is None:
+            count = self.initial_count
+        else:
+            count = self.rate * self.target_duration
+        count = min(count, pending_point_count / jobs)
+        return int(min(max(count, self.min_count), self.max_count))
+
+
+class MemoryBudget(object):
+    """Throttles the readers to keep the conversion within a memory budget.
+
+    The memory usage is the RSS of the master and worker processes, sampled
+    every sample_interval seconds. Between 2 samples, the growth of the queued
+    tasks payloads and the portions submitted to the readers are added to the
+    last sample.
+    """
+
+    def __init__(self, max_size_MB, pids, sample_interval=0.5):
+        self.max_size = max_size_MB * 1024 * 1024
+        self.processes = [psutil.Process(pid) for pid in [os.getpid()] + list(pids)]
+        self.sample_interval = sample_interval
+        self.sampled_at = None
+        self.rss = 0
+        self.queued_bytes = 0
+        self.reserved_bytes = 0
+
+    def add_process(self, pid):
+        """Account for the memory of a worker that joined the conversion"""
+        try:
+            self.processes.append(psutil.Process(pid))
+        except psutil.NoSuchProcess:
+            pass
+
+    def remove_process(self, pid):
+        self.processes = [p for p in self.processes if p.pid != pid]
+
+    def sample(self, now, queued_bytes):
+        if self.sampled_at is not None and now - self.sampled_at < self.sample_interval:
+            return
+        rss = 0
+        for p in self.processes:
+            try:
+                rss += p.memory_info().rss
+            except psutil.NoSuchProcess:
+                pass
+        self.rss = rss
+        self.queued_bytes = queued_bytes
+        self.reserved_bytes = 0
+        self.sampled_at = now
+
+    def estimate(self, queued_bytes):
+        return self.rss + max(0, queued_bytes - self.queued_bytes) + self.reserved_bytes
+
+    def reserve(self, size):
+        """Account for a newly submitted reader portion until the next sample"""
+        self.reserved_bytes += size
+
+    def allows(self, size, queued_bytes, now):
+        self.sample(now, queued_bytes)
+        return self.estimate(queued_bytes) + size <= self.max_size
@@ -1,9 +1,11 @@
 import os
+import shutil
 import time
 import gc
 import lz4.frame as gzip
 from sys import getsizeof
 from py3dtiles.points.utils import name_to_filename
+from py3dtiles.points.checkpoint import link_or_copy
 
 
 class SharedNodeStore:
@@ -22,6 +24,8 @@ class SharedNodeStore:
         }
 
     def control_memory_usage(self, max_size_MB, verbose):
+        """Write the cached nodes on disk if the cache is too large. Returns the
+        (node count, bytes written) of the eviction, or None"""
         bytes_to_mb = 1.0 / (1024 * 1024)
         max_size_MB = max(max_size_MB, 200)
 
@@ -33,16 +37,18 @@ class SharedNodeStore:
 
         before = cache_size
         if before < max_size_MB:
-            return
+            return None
 
         if verbose >= 2:
             print('>>>>>>>>>>>>>>>>>>>>>>>>>>>>>>>>>>> CACHE CLEANING [{}]'.format(before))
-        self.remove_oldest_nodes(1 - max_size_MB / before)
+        evicted = self.remove_oldest_nodes(1 - max_size_MB / before)
         gc.collect()
 
         if verbose >= 2:
             print('<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<< CACHE CLEANING')
 
+        return evicted
+
     def get(self, name, stat_inc=1):
         metadata = self.metadata.get(name, None)
         data = b''
@@ -91,6 +97,35 @@ class SharedNodeStore:
         self.memory_size['content'] += len(compressed_data) + getsizeof((name, metadata))
         self.memory_size['container'] = getsizeof(self.data) + getsizeof(self.metadata)
 
+    def checkpoint(self, folder):
+        """Write a snapshot of the store in folder"""
+        os.makedirs(folder)
+        for name, meta in self.metadata.items():
+            with open(name_to_filename(folder, name), 'wb') as f:
+                f.write(self.data[meta[1]])
+
+        # then the nodes only stored on disk (a cached node is more recent
+        # than its file)
+        for root, dirs, files in os.walk(self.folder):
+            for f in files:
+                src = os.path.join(root, f)
+                dst = os.path.join(folder, os.path.relpath(src, self.folder))
+                if not os.path.exists(dst):
+                    os.makedirs(os.path.dirname(dst), exist_ok=True)
+                    link_or_copy(src, dst)
+
+    def restore(self, folder):
+        """Replace the stored nodes with the snapshot written in folder"""
+        assert len(self.metadata) == 0
+        shutil.rmtree(self.folder)
+        os.makedirs(self.folder)
+        for root, dirs, files in os.walk(folder):
+            for f in files:
+                src = os.path.join(root, f)
+                dst = os.path.join(self.folder, os.path.relpath(src, folder))
+                os.makedirs(os.path.dirname(dst), exist_ok=True)
+                link_or_copy(src, dst)
+
     def remove_oldest_nodes(self, percent):
         count = _remove_all(self)
 
@@ -115,8 +150,10 @@ def _remove_all(store):
     for name, meta in store.metadata.items():
         data = store.data[meta[1]]
         filename = name_to_filename(store.folder, name)
-        with open(filename, 'wb') as f:
+        # never modify a file in place, it might be linked in a checkpoint
+        with open(filename + '.tmp', 'wb') as f:
             bytes_written += f.write(data)
+        os.replace(filename + '.tmp', filename)
 
     store.metadata = {}
     store.data = []
@@ -1,60 +1,185 @@
 import numpy as np
 import math
-import traceback
-import laspy
-import pyproj
 import struct
-from laspy.file import File
-import liblas
+import traceback
+from collections import namedtuple
 from pickle import dumps as pdumps
+from py3dtiles.points.partition import Partitioner
+from py3dtiles.points.projection import reproject
+
+# The las files are read without a las library: the header is parsed once, and
+# the points of a portion are memory mapped with a structured dtype of the
+# fields used by the conversion, so only these fields of the portion are read
+# from the disk.
+#
+# The laz files are decompressed with laspy (>= 2, with the lazrs or laszip
+# backend). Their points are compressed by chunks (of 50000 points by
+# default): the portions are aligned on the chunks, so that each worker only
+# decompresses the chunks of its portion.
+
+# points by portion
+PORTION_SIZE = 1000000
+
+# public header block (las 1.0 - 1.4), from the version to the bounds
+_HEADER = struct.Struct('<24xBB68xHIIBHI20x3d3d6d')
+# las 1.4: 64 bits point count
+_HEADER_1_4 = struct.Struct('<247xQ')
+# variable length record header: user id, record id, record length
+_VLR = struct.Struct('<2x16sHH32x')
+_LASZIP_VLR = (b'laszip encoder', 22204)
+# chunk size in the laszip vlr
+_LASZIP_CHUNK_SIZE = struct.Struct('<12xI')
+_VARIABLE_CHUNK_SIZE = 0xffffffff
+
+LasHeader = namedtuple('LasHeader', [
+    'version', 'point_offset', 'point_format', 'record_length', 'point_count',
+    'scale', 'offset', 'min', 'max', 'compressed', 'chunk_size'])
+LasHeader.__doc__ = """chunk_size is the point count of the laz chunks (None for a las file, or
+a laz file with variable chunk sizes)"""
+
+# offset of the red, green, blue fields in the point records, by point format
+_RGB_OFFSETS = {2: 20, 3: 28, 5: 28, 7: 30, 8: 30, 10: 30}
+
+
+def _laz_chunk_size(f, header_size, vlr_count):
+    f.seek(header_size)
+    for _ in range(vlr_count):
+        user_id, record_id, length = _VLR.unpack(f.read(_VLR.size))
+        data = f.read(length)
+        if (user_id.rstrip(b'\0'), record_id) == _LASZIP_VLR:
+            chunk_size = _LASZIP_CHUNK_SIZE.unpack_from(data)[0]
+            return None if chunk_size == _VARIABLE_CHUNK_SIZE else chunk_size
+    raise ValueError('laszip vlr not found')
+
+
+def read_header(filename):
+    with open(filename, 'rb') as f:
+        data = f.read(_HEADER_1_4.size)
+        if data[:4] != b'LASF':
+            raise ValueError('{} is not a las file'.format(filename))
+
+        (major, minor, header_size, point_offset, vlr_count, point_format, record_length, point_count,
+         sx, sy, sz, ox, oy, oz, max_x, min_x, max_y, min_y, max_z, min_z) = _HEADER.unpack_from(data)
+        if (major, minor) >= (1, 4) and point_count == 0:
+            point_count = _HEADER_1_4.unpack_from(data)[0]
+
+        compressed = bool(point_format & 0x80)
+        chunk_size = _laz_chunk_size(f, header_size, vlr_count) if compressed else None
+
+    return LasHeader(
+        version=(major, minor),
+        point_offset=point_offset,
+        # the 2 high bits flag compressed (laz) points
+        point_format=point_format & 0x3f,
+        record_length=record_length,
+        point_count=point_count,
+        scale=np.array([sx, sy, sz]),
+        offset=np.array([ox, oy, oz]),
+        min=np.array([min_x, min_y, min_z]),
+        max=np.array([max_x, max_y, max_z]),
+        compressed=compressed,
+        chunk_size=chunk_size)
+
+
+def portion_size(header):
+    """The point count of the portions of the file: a multiple of the laz
+    chunk size, so that no chunk is decompressed by 2 workers"""
+    if header.chunk_size is None:
+        return PORTION_SIZE
+    return header.chunk_size * max(1, round(PORTION_SIZE / header.chunk_size))
+
+
+def point_dtype(point_format, record_length):
+    """The dtype of the point records, with the fields read by the conversion"""
+    fields = [('X', '<i4', 0), ('Y', '<i4', 4), ('Z', '<i4', 8), ('intensity', '<u2', 12)]
+    if point_format in _RGB_OFFSETS:
+        fields += [(name, '<u2', _RGB_OFFSETS[point_format] + 2 * i) for i, name in enumerate(['red', 'green', 'blue'])]
+    names, formats, offsets = zip(*fields)
+    return np.dtype({'names': names, 'formats': formats, 'offsets': offsets, 'itemsize': record_length})
+
+
+def read_points(filename, header, start, end):
+    """Memory maps the points [start, end[ of the (las) file"""
+    dtype = point_dtype(header.point_format, header.record_length)
+    return np.memmap(
+        filename, dtype=dtype, mode='r', offset=header.point_offset + start * dtype.itemsize, shape=(end - start,))
+
+
+def _laz_backend():
+    import laspy
+    # the conversion runs a reader by core: no multithreaded backend
+    for backend in [laspy.LazBackend.Lazrs, laspy.LazBackend.Laszip]:
+        if backend.is_available():
+            return backend
+    raise Exception('Reading laz files needs the lazrs or laszip python package')
+
+
+def read_chunks(filename, header, start, end, step):
+    """Yields the points [start, end[ of the file by arrays of step points,
+    with the fields of point_dtype()"""
+    if header.compressed:
+        import laspy
+        with laspy.open(filename, laz_backend=_laz_backend()) as f:
+            # decompresses from the chunk of start
+            f.seek(start)
+            for offset in range(start, end, step):
+                yield f.read_points(min(step, end - offset)).array
+    else:
+        points = read_points(filename, header, start, end)
+        for offset in range(0, end - start, step):
+            yield points[offset:offset + step]
 
 
 def init(files, color_scale=None, srs_in=None, srs_out=None, fraction=100):
     aabb = None
     total_point_count = 0
     pointcloud_file_portions = []
+    # the extent of each portion, by portion
+    portion_extents = {}
     avg_min = np.array([0., 0., 0.])
 
     for filename in files:
         try:
-            f = File(filename, mode='r')
+            header = read_header(filename)
         except Exception as e:
             print('Error opening {filename}. Skipping.'.format(**locals()))
             print(e)
             continue
-        avg_min += (np.array(f.header.min) / len(files))
+        avg_min += (header.min / len(files))
 
         if aabb is None:
-            aabb = np.array([f.header.get_min(), f.header.get_max()])
+            aabb = np.array([header.min, header.max])
         else:
-            bb = np.array([f.header.get_min(), f.header.get_max()])
-            aabb[0] = np.minimum(aabb[0], bb[0])
-            aabb[1] = np.maximum(aabb[1], bb[1])
+            aabb[0] = np.minimum(aabb[0], header.min)
+            aabb[1] = np.maximum(aabb[1], header.max)
 
-        count = int(f.header.count * fraction / 100)
+        count = int(header.point_count * fraction / 100)
         total_point_count += count
 
         # read the first points red channel
         if color_scale is None:
-            if 'red' in f.point_format.lookup:
-                color_test_field = 'red'
-                if np.max(f.get_points()['point'][color_test_field][0:min(10000, f.header.count)]) > 255:
-                        color_scale = 1.0 / 255
+            if header.point_format in _RGB_OFFSETS and header.point_count > 0:
+                first_points = min(10000, header.point_count)
+                red = next(read_chunks(filename, header, 0, first_points, first_points))['red']
+                if np.max(red) > 255:
+                    color_scale = 1.0 / 255
             else:
-                color_test_field = 'intensity'
                 color_scale = 1.0 / 255
 
-        _1M = min(count, 1000000)
-        steps = math.ceil(count / _1M)
-        portions = [(i * _1M, min(count, (i + 1) * _1M)) for i in range(steps)]
+        size = max(1, min(count, portion_size(header)))
+        steps = math.ceil(count / size)
+        portions = [(i * size, min(count, (i + 1) * size)) for i in range(steps)]
         for p in portions:
             pointcloud_file_portions += [(filename, p)]
+            # the file header has no finer extent than the file's one
+            portion_extents[(filename, p)] = np.array([header.min, header.max])
 
         if (srs_out is not None and srs_in is None):
+            import liblas
             f = liblas.file.File(filename)
             if (f.header.srs.proj4 is not None
                     and f.header.srs.proj4 != ''):
-                srs_in = pyproj.Proj(f.header.srs.proj4)
+                srs_in = f.header.srs.proj4
             else:
                 raise Exception('\'{}\' file doesn\'t contain srs information. Please use the --srs_in option to declare it.'.format(filename))
 
@@ -64,50 +189,38 @@ def init(files, color_scale=None, srs_in=None, srs_out=None, fraction=100):
         'color_scale': color_scale,
         'srs_in': srs_in,
         'point_count': total_point_count,
+        'portion_extents': portion_extents,
         'avg_min': avg_min
     }
 
 
-def run(_id, filename, offset_scale, portion, queue, projection, verbose):
+def run(_id, filename, offset_scale, portion, queue, projection, verbose, partition=None):
     '''
-    Reads points from a las file
+    Reads points from a las file, and sends them to the root node (or to the
+    nodes at the partition depth, see Partitioner)
     '''
     try:
-        f = laspy.file.File(filename, mode='r')
+        sender = Partitioner(queue, portion[0], *(partition or ()))
+        header = read_header(filename)
 
         point_count = portion[1] - portion[0]
 
         step = min(point_count, max((point_count) // 10, 100000))
 
-        indices = [i for i in range(math.ceil((point_count) / step))]
-
         color_scale = offset_scale[3]
 
-        file_points = f.get_points()['point']
-        X = file_points['X']
-        Y = file_points['Y']
-        Z = file_points['Z']
         # todo: attributes
-        if 'red' in f.point_format.lookup:
-            RED = file_points['red']
-            GREEN = file_points['green']
-            BLUE = file_points['blue']
-        else:
-            RED = file_points['intensity']
-            GREEN = file_points['intensity']
-            BLUE = file_points['intensity']
-
-        for index in indices:
-            start_offset = portion[0] + index * step
-            num = min(step, portion[1] - start_offset)
+        color_fields = ['red', 'green', 'blue'] if header.point_format in _RGB_OFFSETS else ['intensity'] * 3
 
+        # only the portion's points
+        for points in read_chunks(filename, header, portion[0], portion[1], step):
             # read scaled values and apply offset
-            x = X[start_offset:start_offset + num] * f.header.scale[0] + f.header.offset[0]
-            y = Y[start_offset:start_offset + num] * f.header.scale[1] + f.header.offset[1]
-            z = Z[start_offset:start_offset + num] * f.header.scale[2] + f.header.offset[2]
+            x = points['X'] * header.scale[0] + header.offset[0]
+            y = points['Y'] * header.scale[1] + header.offset[1]
+            z = points['Z'] * header.scale[2] + header.offset[2]
 
             if projection:
-                x, y, z = pyproj.transform(projection[0], projection[1], x, y, z)
+                x, y, z = reproject(projection, x, y, z)
 
             x = (x + offset_scale[0][0]) * offset_scale[1][0]
             y = (y + offset_scale[0][1]) * offset_scale[1][1]
@@ -123,9 +236,7 @@ def run(_id, filename, offset_scale, portion, queue, projection, verbose):
             coords = np.ascontiguousarray(coords.astype(np.float32))
 
             # Read colors
-            red = RED[start_offset:start_offset + num]
-            green = GREEN[start_offset:start_offset + num]
-            blue = BLUE[start_offset:start_offset + num]
+            red, green, blue = [points[field] for field in color_fields]
 
             if color_scale is None:
                 red = red.astype(np.uint8)
@@ -138,16 +249,12 @@ def run(_id, filename, offset_scale, portion, queue, projection, verbose):
 
             colors = np.vstack((red, green, blue)).transpose()
 
-            queue.send_multipart([
-                ''.encode('ascii'),
-                pdumps({'xyz': coords, 'rgb': colors}),
-                struct.pack('>I', len(coords))], copy=False)
+            sender.send(coords, colors)
 
+        sender.flush()
         queue.send_multipart([pdumps({'name': _id, 'total': 0})])
         # notify we're idle
         queue.send_multipart([b''])
-
-        f.close()
     except Exception as e:
         print('Exception while reading points from las file')
         print(e)
@@ -3,8 +3,10 @@ import time
 import traceback
 import pickle
 import struct
+import numpy as np
 
 from py3dtiles.points.node_catalog import NodeCatalog
+from py3dtiles.points import point_batch, trace
 
 
 def _forward_unassigned_points(node, queue, log_file):
@@ -12,15 +14,14 @@ def _forward_unassigned_points(node, queue, log_file):
 
     result = node.dump_pending_points()
 
-    for r in result:
-        if len(r) > 0:
-            if log_file is not None:
-                print('    -> put on queue ({},{})'.format(r[0], r[2]), file=log_file)
-            total += r[2]
-            queue.send_multipart([
-                r[0],
-                r[1],
-                struct.pack('>I', r[2])], copy=False, block=False)
+    for name, xyz, rgb in result:
+        if log_file is not None:
+            print('    -> put on queue ({},{})'.format(name, len(xyz)), file=log_file)
+        total += len(xyz)
+        with trace.span('send', 'serialization', node=name.decode('ascii'), points=len(xyz)):
+            queue.send_multipart(
+                [name] + point_batch.encode(xyz, rgb),
+                copy=False, block=False)
 
     return total
 
@@ -68,6 +69,25 @@ def _balance(node_catalog, node, max_depth=1, depth=0):
                 depth + 1)
 
 
+def _halt_at_depth(name):
+    # depth of the subtree stored with the node (and processed by its jobs)
+    if len(name) >= 7:
+        return 5
+    elif len(name) >= 5:
+        return 3
+    elif len(name) > 2:
+        return 2
+    elif len(name) >= 1:
+        return 1
+    return 0
+
+
+def _is_splittable(node, halt_at_depth):
+    """The tasks of a node can be processed by concurrent jobs if it has no
+    state (the root), or only its own grid (see process_partial)"""
+    return halt_at_depth == 0 or (halt_at_depth == 1 and node.children is not None)
+
+
 def _process(nodes, octree_metadata, name, raw_datas, queue, begin, log_file):
     node_catalog = NodeCatalog(nodes, name, octree_metadata)
 
@@ -79,15 +99,7 @@ def _process(nodes, octree_metadata, name, raw_datas, queue, begin, log_file):
 
     node = node_catalog.get_node(name)
 
-    halt_at_depth = 0
-    if len(name) >= 7:
-        halt_at_depth = 5
-    elif len(name) >= 5:
-        halt_at_depth = 3
-    elif len(name) > 2:
-        halt_at_depth = 2
-    elif len(name) >= 1:
-        halt_at_depth = 1
+    halt_at_depth = _halt_at_depth(name)
 
     total = 0
     index = 0
@@ -96,9 +108,10 @@ def _process(nodes, octree_metadata, name, raw_datas, queue, begin, log_file):
         if log_enabled:
             print('  -> read source [{}]'.format(time.time() - begin), file=log_file, flush=True)
 
-        data = pickle.loads(raw_data)
+        with trace.span('decode', 'serialization'):
+            xyz, rgb = point_batch.decode(raw_data)
 
-        point_count = len(data['xyz'])
+        point_count = len(xyz)
 
         if log_enabled:
             print('  -> insert {} [{} points]/ {} files [{}]'.format(
@@ -106,7 +119,8 @@ def _process(nodes, octree_metadata, name, raw_datas, queue, begin, log_file):
                 len(raw_datas), time.time() - begin), file=log_file, flush=True)
 
         # insert points in node (no children handling here)
-        node.insert(node_catalog, octree_metadata.scale, data['xyz'], data['rgb'], halt_at_depth == 0)
+        with trace.span('insert', points=point_count):
+            node.insert(node_catalog, octree_metadata.scale, xyz, rgb, halt_at_depth == 0)
 
         total += point_count
 
@@ -114,12 +128,14 @@ def _process(nodes, octree_metadata, name, raw_datas, queue, begin, log_file):
             print('  -> _flush [{}]'.format(time.time() - begin), file=log_file, flush=True)
         # _flush push pending points (= call insert) from level N to level N + 1
         # (_flush is recursive)
-        written = _flush(node_catalog, octree_metadata.scale, node, queue, halt_at_depth - 1, index == len(raw_datas) - 1, log_file)
+        with trace.span('flush'):
+            written = _flush(node_catalog, octree_metadata.scale, node, queue, halt_at_depth - 1, index == len(raw_datas) - 1, log_file)
         total -= written
 
         index += 1
 
-    _balance(node_catalog, node, halt_at_depth - 1)
+    with trace.span('balance'):
+        _balance(node_catalog, node, halt_at_depth - 1)
 
     if log_enabled:
         print('save on disk {} [{}]'.format(name, time.time() - begin), file=log_file)
@@ -127,12 +143,74 @@ def _process(nodes, octree_metadata, name, raw_datas, queue, begin, log_file):
     # save node state on disk
     data = b''
     if halt_at_depth > 0:
-        data = node_catalog.dump(name, halt_at_depth - 1)
+        with trace.span('dump', 'serialization') as args:
+            data = node_catalog.dump(name, halt_at_depth - 1)
+            args['bytes'] = len(data)
 
     if log_enabled:
         print('saved on disk [{}]'.format(time.time() - begin), file=log_file)
 
-    return (total, data)
+    return (total, data, _is_splittable(node, halt_at_depth))
+
+
+def _process_partial(nodes, octree_metadata, name, raw_datas, queue):
+    """Insert the points in a copy of the node grid, without balancing it.
+
+    The rejected points are forwarded as usual, and the accepted ones (the
+    points appended to the grid cells) are returned to be merged in the node
+    once all the partial jobs are done.
+    """
+    node_catalog = NodeCatalog(nodes, name, octree_metadata)
+    node = node_catalog.get_node(name)
+    assert _is_splittable(node, _halt_at_depth(name)) and node.children is not None
+    grid = node.grid
+    base_counts = [cell.shape[0] for cell in grid.cells_xyz]
+
+    total = 0
+    for index, raw_data in enumerate(raw_datas):
+        with trace.span('decode', 'serialization'):
+            xyz, rgb = point_batch.decode(raw_data)
+
+        with trace.span('insert', points=len(xyz)):
+            rejected_xyz, rejected_rgb, _ = grid.insert(node.aabb[0], node.inv_aabb_size, xyz, rgb)
+        if len(rejected_xyz) > 0:
+            node.pending_xyz += [rejected_xyz]
+            node.pending_rgb += [rejected_rgb]
+        total += len(xyz)
+
+        with trace.span('flush'):
+            total -= _flush(node_catalog, octree_metadata.scale, node, queue, 0, index == len(raw_datas) - 1)
+
+    xyz = np.concatenate([cell[count:] for cell, count in zip(grid.cells_xyz, base_counts)])
+    rgb = np.concatenate([cell[count:] for cell, count in zip(grid.cells_rgb, base_counts)])
+    return total, pickle.dumps((xyz, rgb, node.children))
+
+
+def _merge(nodes, octree_metadata, name, partials, queue):
+    """Insert the points accepted by the partial jobs of the node in its grid.
+
+    Points accepted by different jobs weren't checked against each other: the
+    ones rejected now are forwarded, and removed from the job total.
+    """
+    node_catalog = NodeCatalog(nodes, name, octree_metadata)
+    node = node_catalog.get_node(name)
+
+    for partial in partials:
+        xyz, rgb, children = pickle.loads(partial)
+        node.children += [child for child in children if child not in node.children]
+        if len(xyz) > 0:
+            with trace.span('insert', points=len(xyz)):
+                node.insert(node_catalog, octree_metadata.scale, xyz, rgb)
+    node.dirty = True
+
+    with trace.span('flush'):
+        forwarded = _flush(node_catalog, octree_metadata.scale, node, queue, 0, True)
+
+    with trace.span('dump', 'serialization') as args:
+        data = node_catalog.dump(name, 0)
+        args['bytes'] = len(data)
+
+    return -forwarded, data
 
 
 def run(work, octree_metadata, queue, verbose):
@@ -149,18 +227,26 @@ def run(work, octree_metadata, queue, verbose):
 
         i = 0
         while i < len(work):
-            name = work[i]
-            node = work[i + 1]
-            count = struct.unpack('>I', work[i + 2])[0]
-            filenames = work[i + 3:i + 3 + count]
-            i += 3 + count
-            result, data = _process(node, octree_metadata, name, filenames, queue, begin, log_file)
+            name = work[i].bytes
+            node = work[i + 1].buffer
+            count = struct.unpack('>I', work[i + 2].buffer)[0]
+            i += 3
+            batches = []
+            for _ in range(count):
+                batches.append(work[i:i + point_batch.FRAME_COUNT])
+                i += point_batch.FRAME_COUNT
+            with trace.span('process', node=name.decode('ascii'), tasks=count,
+                            points=sum([point_batch.point_count(b[0]) for b in batches]),
+                            bytes=len(node) + sum([point_batch.byte_size(b) for b in batches])):
+                result, data, splittable = _process(node, octree_metadata, name, batches, queue, begin, log_file)
+                point_batch.release_attached()
             total += result
 
             queue.send_multipart([pickle.dumps({
                 'name': name,
                 'total': result,
                 'save': data,
+                'splittable': splittable,
             })], copy=False)
 
         if log_enabled:
@@ -184,3 +270,48 @@ def run(work, octree_metadata, queue, verbose):
             traceback.print_exc()
 
     return 0
+
+
+def run_partial(work, octree_metadata, queue):
+    """Process a part of the tasks of a node, see _process_partial()"""
+    name = work[0].bytes
+    node = work[1].buffer
+    batches = [work[i:i + point_batch.FRAME_COUNT] for i in range(2, len(work), point_batch.FRAME_COUNT)]
+    try:
+        with trace.span('partial', node=name.decode('ascii'), tasks=len(batches),
+                        points=sum([point_batch.point_count(b[0]) for b in batches])):
+            total, partial = _process_partial(node, octree_metadata, name, batches, queue)
+            point_batch.release_attached()
+
+        queue.send_multipart([pickle.dumps({
+            'name': name,
+            'total': total,
+            'partial': partial,
+        })], copy=False)
+    except Exception:
+        print('OH NO. {}'.format(name))
+        traceback.print_exc()
+
+    # notify we're idle
+    queue.send_multipart([b''])
+
+
+def run_merge(work, octree_metadata, queue):
+    """Merge the results of the partial jobs of a node, see _merge()"""
+    name = work[0].bytes
+    try:
+        with trace.span('merge', node=name.decode('ascii'), partials=len(work) - 2):
+            total, data = _merge(work[1].buffer, octree_metadata, name, [w.buffer for w in work[2:]], queue)
+
+        queue.send_multipart([pickle.dumps({
+            'name': name,
+            'total': total,
+            'save': data,
+            'splittable': True,
+        })], copy=False)
+    except Exception:
+        print('OH NO. {}'.format(name))
+        traceback.print_exc()
+
+    # notify we're idle
+    queue.send_multipart([b''])
@@ -5,6 +5,7 @@ import os
 import py3dtiles
 import lz4.frame as gzip
 from py3dtiles.points.utils import name_to_filename
+from py3dtiles.points import trace
 
 
 class _DummyNode():
@@ -54,13 +55,21 @@ def node_to_pnts(name, node, out_folder, include_rgb):
 
 
 def run(sender, data, node_name, folder, write_rgb):
+    """Write the .pnts of the nodes in data, and returns their point count"""
+    total = 0
     # we can safely write the .pnts file
     if len(data):
-        root = pickle.loads(gzip.decompress(data))
+        with trace.span('decode', 'serialization'):
+            root = pickle.loads(gzip.decompress(data))
         # print('write ', node_name.decode('ascii'))
-        total = 0
+        filenames = []
         for name in root:
             node = _DummyNode(pickle.loads(root[name]))
-            total += node_to_pnts(name, node, folder, write_rgb)[0]
+            count, filename = node_to_pnts(name, node, folder, write_rgb)
+            total += count
+            if filename is not None:
+                filenames.append(filename)
 
-        sender.send_multipart([b'pnts', struct.pack('>I', total), node_name])
+        sender.send_multipart([b'pnts', struct.pack('>I', total), node_name, pickle.dumps(filenames)])
+
+    return total
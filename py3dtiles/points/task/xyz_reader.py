@@ -1,68 +1,354 @@
 import numpy as np
 import math
+import os
 import traceback
-import pyproj
-import struct
+from numba import njit
 from pickle import dumps as pdumps
 
+import py3dtiles.points.kernels  # noqa: F401 (numba cache folder)
+from py3dtiles.points.partition import Partitioner
+from py3dtiles.points.projection import reproject
+
+# The text files are read by blocks of whole lines, parsed at once by a numba
+# tokenizer. The values are separated by spaces, tabs or commas.
+#
+# By default, init() reads the files to count their points, and computes the
+# extent of their portions of PORTION_SIZE points. With estimate_bounds, the
+# files are split in byte ranges starting at a line, and their bounds and
+# point count are estimated from a sample of SAMPLE_BLOCKS blocks: the readers
+# return the exact point count and bounds of their range.
+
+# bytes read at once
+BLOCK_SIZE = 1 << 22
+# points by portion
+PORTION_SIZE = 1000000
+# values by line, at most (XYZIRGB)
+COLUMNS = 7
+SAMPLE_BLOCKS = 64
+SAMPLE_BLOCK_SIZE = 1 << 16
+# of the sample extent, added on each side of the estimated bounds
+ESTIMATE_MARGIN = 0.05
+
+_NEWLINE = 10
+_SEPARATORS = (32, 9, 44, 13)  # space, tab, comma, carriage return
+_MINUS, _PLUS, _DOT, _ZERO, _NINE = 45, 43, 46, 48, 57
+# significant digits of the values computed in float64 by _parse: with an
+# exact mantissa and power of 10 (up to 1e22), the product or division is
+# correctly rounded. The other values are read by float()
+_MAX_DIGITS = 15
+_MAX_EXPONENT = 22
+# the special values float() accepts too, in lower case
+_NAN = (110, 97, 110)
+_INF = (105, 110, 102)
+_INFINITY = (105, 110, 102, 105, 110, 105, 116, 121)
+# error code of _parse
+_INVALID = -1
+
+
+@njit(cache=True, nogil=True)
+def _is_word(data, start, end, word):
+    # case insensitive comparison of data[start:end] and word
+    if end - start != len(word):
+        return False
+    for k in range(len(word)):
+        if data[start + k] | 32 != word[k]:
+            return False
+    return True
+
+
+@njit("UniTuple(int64, 3)(Array(uint8, 1, 'C', readonly=True), float64[:, ::1], int64[::1], int64[:, ::1])",
+      cache=True, nogil=True)
+def _parse(data, values, line_starts, slow):
+    # fills a row of values by non empty line, and the offset of the line.
+    # The (row, column, start, end) of the values left to float() are in
+    # slow. Returns the row, column and slow value counts, or (row, error
+    # code, 0) if the line of this row is invalid
+    slow_count = 0
+    rows = 0
+    columns = 0
+    column = 0
+    line_start = 0
+    i = 0
+    n = len(data)
+    while i <= n:
+        c = data[i] if i < n else _NEWLINE
+        if c == _NEWLINE:
+            if column > 0:
+                if rows == 0:
+                    columns = column
+                elif column != columns:
+                    line_starts[rows] = line_start
+                    return rows, _INVALID, 0
+                line_starts[rows] = line_start
+                rows += 1
+            column = 0
+            line_start = i + 1
+            i += 1
+            continue
+        if c in _SEPARATORS:
+            i += 1
+            continue
 
-def init(files, color_scale=None, srs_in=None, srs_out=None, fraction=100):
+        # a number
+        line_starts[rows] = line_start
+        if column == values.shape[1]:
+            return rows, _INVALID, 0
+        start = i
+        negative = c == _MINUS
+        if c == _MINUS or c == _PLUS:
+            i += 1
+        if i < n and (data[i] | 32 == _NAN[0] or data[i] | 32 == _INF[0]):
+            word_start = i
+            while i < n and data[i] != _NEWLINE and data[i] not in _SEPARATORS:
+                i += 1
+            if _is_word(data, word_start, i, _NAN):
+                value = np.nan
+            elif _is_word(data, word_start, i, _INF) or _is_word(data, word_start, i, _INFINITY):
+                value = np.inf
+            else:
+                return rows, _INVALID, 0
+            values[rows, column] = -value if negative else value
+            column += 1
+            continue
+        mantissa = 0
+        exponent = 0
+        digits = 0
+        # the digits from the first non zero one
+        significant = 0
+        while i < n and _ZERO <= data[i] <= _NINE:
+            if significant < _MAX_DIGITS:
+                mantissa = mantissa * 10 + (data[i] - _ZERO)
+            else:
+                exponent += 1
+            if mantissa > 0:
+                significant += 1
+            digits += 1
+            i += 1
+        if i < n and data[i] == _DOT:
+            i += 1
+            while i < n and _ZERO <= data[i] <= _NINE:
+                if significant < _MAX_DIGITS:
+                    mantissa = mantissa * 10 + (data[i] - _ZERO)
+                    exponent -= 1
+                if mantissa > 0:
+                    significant += 1
+                digits += 1
+                i += 1
+        if digits == 0:
+            return rows, _INVALID, 0
+        if i < n and (data[i] == 101 or data[i] == 69):  # e, E
+            i += 1
+            negative_exponent = i < n and data[i] == _MINUS
+            if i < n and (data[i] == _MINUS or data[i] == _PLUS):
+                i += 1
+            e = 0
+            exponent_digits = 0
+            while i < n and _ZERO <= data[i] <= _NINE:
+                # far out of the float64 range already
+                if e < 100000:
+                    e = e * 10 + (data[i] - _ZERO)
+                exponent_digits += 1
+                i += 1
+            if exponent_digits == 0:
+                return rows, _INVALID, 0
+            exponent += -e if negative_exponent else e
+        if i < n and data[i] != _NEWLINE and data[i] not in _SEPARATORS:
+            return rows, _INVALID, 0
+
+        if mantissa == 0:
+            values[rows, column] = -0.0 if negative else 0.0
+        elif significant <= _MAX_DIGITS and -_MAX_EXPONENT <= exponent <= _MAX_EXPONENT:
+            value = float(mantissa)
+            if exponent < 0:
+                value /= 10.0 ** -exponent
+            else:
+                value *= 10.0 ** exponent
+            values[rows, column] = -value if negative else value
+        else:
+            slow[slow_count, 0] = rows
+            slow[slow_count, 1] = column
+            slow[slow_count, 2] = start
+            slow[slow_count, 3] = i
+            slow_count += 1
+        column += 1
+
+    return rows, columns, slow_count
+
+
+def _line(data, start):
+    return bytes(data[start:start + 200]).split(b'\n')[0]
+
+
+def parse(data):
+    """Parses the lines of data (an uint8 array). Returns their values (float64,
+    a row by line) and the offset of each line in data"""
+    lines = np.count_nonzero(data == _NEWLINE) + 1
+    values = np.empty((lines, COLUMNS))
+    line_starts = np.empty(lines, dtype=np.int64)
+    # a value left to float() has 4 characters at least ('1e23'), and a separator
+    slow = np.empty((len(data) // 5 + 1, 4), dtype=np.int64)
+    rows, columns, slow_count = _parse(data, values, line_starts, slow)
+    if columns < 0:
+        raise ValueError('Invalid xyz line: {}'.format(_line(data, line_starts[rows])))
+    if slow_count:
+        text = data.tobytes()
+        for row, column, start, end in slow[:slow_count].tolist():
+            value = float(text[start:end])
+            # unlike float(), the finite values out of range aren't read as inf
+            if math.isinf(value):
+                raise ValueError('Value out of the float64 range in xyz line: {}'.format(_line(data, line_starts[row])))
+            values[row, column] = value
+    return values[:rows, :columns], line_starts[:rows]
+
+
+def blocks(f, size=BLOCK_SIZE, stop=None):
+    """Yields the offset and the data (an uint8 array) of blocks of whole lines
+    of the binary file f, from its current position (to the stop offset)"""
+    offset = f.tell()
+    remainder = b''
+    while True:
+        data = f.read(size if stop is None else min(size, stop - offset - len(remainder)))
+        if not data:
+            if remainder:
+                yield offset, np.frombuffer(remainder, dtype=np.uint8)
+            return
+        data = remainder + data
+        end = data.rfind(b'\n') + 1
+        if end:
+            yield offset, np.frombuffer(data, dtype=np.uint8, count=end)
+            offset += end
+        remainder = data[end:]
+
+
+def split_columns(values):
+    """Returns the xyz and rgb columns of the values of a XYZ, XYZI, XYZRGB or
+    XYZIRGB file"""
+    columns = values.shape[1]
+    if columns in (3, 4):
+        rgb = np.zeros((len(values), 3))
+    elif columns in (6, 7):
+        rgb = values[:, -3:]
+    else:
+        raise ValueError('Unsupported xyz file with {} columns'.format(columns))
+    return values[:, :3], rgb
+
+
+def _next_line(f, offset):
+    """Returns the offset of the first line starting at or after offset"""
+    if offset == 0:
+        return 0
+    f.seek(offset - 1)
+    while True:
+        data = f.read(SAMPLE_BLOCK_SIZE)
+        end = data.find(b'\n')
+        if end >= 0 or not data:
+            return f.tell() - len(data) + end + 1 if end >= 0 else f.tell()
+
+
+def _estimate(f, size):
+    """Returns the bytes per line and the extent of a sample of the file"""
+    lines = 0
+    sampled = 0
+    extent = np.array([[np.inf] * 3, [-np.inf] * 3])
+    for i in range(SAMPLE_BLOCKS):
+        start = _next_line(f, size * i // SAMPLE_BLOCKS)
+        f.seek(start)
+        data = f.read(SAMPLE_BLOCK_SIZE)
+        # whole lines only, unless it's the end of the file
+        end = data.rfind(b'\n') + 1 if start + len(data) < size else len(data)
+        values, _ = parse(np.frombuffer(data, dtype=np.uint8, count=end))
+        if len(values):
+            lines += len(values)
+            sampled += end
+            extent[0] = np.minimum(extent[0], values[:, :3].min(axis=0))
+            extent[1] = np.maximum(extent[1], values[:, :3].max(axis=0))
+    return sampled / lines, extent
+
+
+def _byte_portions(f, size, bytes_per_line):
+    """Returns the (estimated first point, estimated end point, first byte,
+    end byte) portions of the file, starting at a line"""
+    portion_bytes = int(PORTION_SIZE * bytes_per_line)
+    offsets = sorted(set([_next_line(f, offset) for offset in range(0, size, portion_bytes)] + [size]))
+    return [
+        (round(start / bytes_per_line), round(end / bytes_per_line), start, end)
+        for start, end in zip(offsets[:-1], offsets[1:])]
+
+
+def init(files, color_scale=None, srs_in=None, srs_out=None, fraction=100, estimate_bounds=False):
     aabb = None
     total_point_count = 0
     pointcloud_file_portions = []
+    # the extent of each portion, by portion
+    portion_extents = {}
     avg_min = np.array([0.0, 0.0, 0.0])
 
     for filename in files:
         try:
-            f = open(filename, "r")
+            f = open(filename, "rb")
         except Exception as e:
             print("Error opening {filename}. Skipping.".format(**locals()))
             print(e)
             continue
 
-        count = 0
-        seek_values = []
-        while True:
-            batch = 10000
-            points = np.zeros((batch, 3))
-
-            offset = f.tell()
-            for i in range(batch):
-                line = f.readline()
-                if not line:
-                    points = np.resize(points, (i, 3))
-                    break
-                points[i] = [float(s) for s in line.split(" ")][:3]
-
-            if points.shape[0] == 0:
-                break
+        size = os.path.getsize(filename)
+        # the sample would read most of a small file
+        if estimate_bounds and size > SAMPLE_BLOCKS * SAMPLE_BLOCK_SIZE:
+            bytes_per_line, extent = _estimate(f, size)
+            margin = (extent[1] - extent[0]) * ESTIMATE_MARGIN
+            extent += [-margin, margin]
+            portions = _byte_portions(f, size, bytes_per_line)
+            f.close()
 
-            if not count % 1000000:
-                seek_values += [offset]
+            if aabb is None:
+                aabb = extent
+            else:
+                aabb[0] = np.minimum(aabb[0], extent[0])
+                aabb[1] = np.maximum(aabb[1], extent[1])
+            total_point_count += sum([p[1] - p[0] for p in portions]) * fraction / 100
+            pointcloud_file_portions += [(filename, p) for p in portions]
+            # no extent: the portions can contain any point
+            continue
 
-            count += points.shape[0]
-            batch_aabb = np.array([
-                np.min(points, axis=0), np.max(points, axis=0)
-            ])
+        count = 0
+        seek_values = []
+        file_extents = []
+        for offset, data in blocks(f):
+            values, line_starts = parse(data)
+            xyz = values[:, :3]
+
+            start = 0
+            while start < len(xyz):
+                if not count % PORTION_SIZE:
+                    seek_values += [offset + int(line_starts[start])]
+                    file_extents += [np.array([[np.inf] * 3, [-np.inf] * 3])]
+                end = min(len(xyz), start + PORTION_SIZE - count % PORTION_SIZE)
+                file_extents[-1][0] = np.minimum(file_extents[-1][0], xyz[start:end].min(axis=0))
+                file_extents[-1][1] = np.maximum(file_extents[-1][1], xyz[start:end].max(axis=0))
+                count += end - start
+                start = end
+        f.close()
 
+        for extent in file_extents:
             # Update aabb
             if aabb is None:
-                aabb = batch_aabb
+                aabb = extent.copy()
             else:
-                aabb[0] = np.minimum(aabb[0], batch_aabb[0])
-                aabb[1] = np.maximum(aabb[1], batch_aabb[1])
+                aabb[0] = np.minimum(aabb[0], extent[0])
+                aabb[1] = np.maximum(aabb[1], extent[1])
 
         # We need an exact point count
         total_point_count += count * fraction / 100
 
-        _1M = min(count, 1000000)
+        _1M = min(count, PORTION_SIZE)
         steps = math.ceil(count / _1M)
         assert steps == len(seek_values)
         portions = [
             (i * _1M, min(count, (i + 1) * _1M), seek_values[i]) for i in range(steps)
         ]
-        for p in portions:
+        for p, extent in zip(portions, file_extents):
             pointcloud_file_portions += [(filename, p)]
+            portion_extents[(filename, p)] = extent
 
         if srs_out is not None and srs_in is None:
             raise Exception(
@@ -77,11 +363,12 @@ def init(files, color_scale=None, srs_in=None, srs_out=None, fraction=100):
         "color_scale": color_scale,
         "srs_in": srs_in,
         "point_count": total_point_count,
+        "portion_extents": portion_extents,
         "avg_min": aabb[0],
     }
 
 
-def run(_id, filename, offset_scale, portion, queue, projection, verbose):
+def run(_id, filename, offset_scale, portion, queue, projection, verbose, partition=None):
     """
     Reads points from a xyz file
 
@@ -92,40 +379,43 @@ def run(_id, filename, offset_scale, portion, queue, projection, verbose):
     - 4 features mean XYZI
     - 6 features mean XYZRGB
 
+    The features are separated by spaces, tabs or commas.
+
     (*) See: https://docs.safe.com/fme/html/FME_Desktop_Documentation/FME_ReadersWriters/pointcloudxyz/pointcloudxyz.htm
+
+    The points are sent to the root node, or to the nodes at the partition
+    depth (see Partitioner).
+
+    The portions of estimate_bounds (see init) are byte ranges: the result
+    then holds the exact point count and bounds of the range.
     """
     try:
-        f = open(filename, "r")
+        sender = Partitioner(queue, portion[0], *(partition or ()))
+        f = open(filename, "rb")
 
-        point_count = portion[1] - portion[0]
-
-        step = min(point_count, max((point_count) // 10, 100000))
+        byte_range = len(portion) > 3
+        point_count = -1 if byte_range else portion[1] - portion[0]
+        read = 0
+        aabb = np.array([[np.inf] * 3, [-np.inf] * 3])
 
         f.seek(portion[2])
 
-        feature_nb = 7
-
-        for i in range(0, point_count, step):
-            points = np.zeros((step, feature_nb), dtype=np.float32)
-
-            for j in range(0, step):
-                line = f.readline()
-                if not line:
-                    points = np.resize(points, (j, feature_nb))
-                    break
-                line_features = [float(s) for s in line.split(" ")]
-                if len(line_features) == 3:
-                    line_features += [None] * 4  # Insert intensity and RGB
-                elif len(line_features) == 4:
-                    line_features += [None] * 3  # Insert RGB
-                elif len(line_features) == 6:
-                    line_features.insert(3, None)  # Insert intensity
-                points[j] = line_features
+        for _, data in blocks(f, stop=portion[3] if byte_range else None):
+            values, _ = parse(data)
+            if not byte_range:
+                values = values[:point_count]
+                point_count -= len(values)
+            if len(values) == 0:
+                continue
+            read += len(values)
 
-            x, y, z = [points[:, c] for c in [0, 1, 2]]
+            xyz, rgb = split_columns(values)
+            aabb[0] = np.minimum(aabb[0], xyz.min(axis=0))
+            aabb[1] = np.maximum(aabb[1], xyz.max(axis=0))
+            x, y, z = [xyz[:, c] for c in [0, 1, 2]]
 
             if projection:
-                x, y, z = pyproj.transform(projection[0], projection[1], x, y, z)
+                x, y, z = reproject(projection, x, y, z)
 
             x = (x + offset_scale[0][0]) * offset_scale[1][0]
             y = (y + offset_scale[0][1]) * offset_scale[1][1]
@@ -140,19 +430,17 @@ def run(_id, filename, offset_scale, portion, queue, projection, verbose):
 
             coords = np.ascontiguousarray(coords.astype(np.float32))
 
-            # Read colors: 3 last columns of the point cloud
-            colors = points[:, -3:].astype(np.uint8)
+            colors = rgb.astype(np.uint8)
 
-            queue.send_multipart(
-                [
-                    "".encode("ascii"),
-                    pdumps({"xyz": coords, "rgb": colors}),
-                    struct.pack(">I", len(coords)),
-                ],
-                copy=False,
-            )
+            sender.send(coords, colors)
+            if point_count == 0:
+                break
 
-        queue.send_multipart([pdumps({"name": _id, "total": 0})])
+        sender.flush()
+        result = {"name": _id, "total": 0}
+        if byte_range:
+            result.update(points=read, aabb=aabb)
+        queue.send_multipart([pdumps(result)])
         # notify we're idle
         queue.send_multipart([b""])
 
@@ -0,0 +1,106 @@
+import json
+import os
+import shutil
+import socket
+import time
+from contextlib import contextmanager
+
+# Conversion timelines use the Chrome trace event format, which can be opened
+# in chrome://tracing or https://ui.perfetto.dev.
+#
+# Each process appends its events to its own file of the trace folder, one
+# json event per line (so the events of a crashed process can still be read),
+# and the files are merged in a single trace at the end of the conversion.
+
+# tracks of a process
+TASKS = 0
+QUEUE = 1
+
+
+def _us(seconds):
+    return round(seconds * 1e6)
+
+
+class Trace(object):
+    """Timeline of this process, written in folder (a trace without folder
+    records nothing)"""
+
+    def __init__(self, folder=None, process_name=None):
+        self.file = None
+        if folder is None:
+            return
+
+        os.makedirs(folder, exist_ok=True)
+        self.pid = os.getpid()
+        host = socket.gethostname()
+        self.file = open(os.path.join(folder, '{}-{}.json'.format(host, self.pid)), 'a')
+        self._write({'ph': 'M', 'name': 'process_name', 'pid': self.pid,
+                     'args': {'name': '{} {} ({})'.format(process_name, self.pid, host)}})
+        for tid, name in [(TASKS, 'tasks'), (QUEUE, 'queue')]:
+            self._write({'ph': 'M', 'name': 'thread_name', 'pid': self.pid, 'tid': tid, 'args': {'name': name}})
+
+    def _write(self, event):
+        self.file.write(json.dumps(event))
+        self.file.write('\n')
+
+    def complete(self, name, begin, end, category='task', tid=TASKS, **args):
+        """Record an event from begin to end (time.time() values)"""
+        if self.file is not None:
+            self._write({'ph': 'X', 'name': name, 'cat': category, 'pid': self.pid, 'tid': tid,
+                         'ts': _us(begin), 'dur': _us(end - begin), 'args': args})
+
+    @contextmanager
+    def span(self, name, category='task', **args):
+        """Record the with block as an event. The yielded args can be
+        completed in the block"""
+        begin = time.time()
+        try:
+            yield args
+        finally:
+            self.complete(name, begin, time.time(), category, **args)
+
+    def counter(self, name, **values):
+        if self.file is not None:
+            self._write({'ph': 'C', 'name': name, 'pid': self.pid, 'ts': _us(time.time()), 'args': values})
+
+    def close(self):
+        if self.file is not None:
+            self.file.close()
+            self.file = None
+
+
+# trace used by the tasks run in this process, see enable()
+_current = Trace()
+
+
+def enable(folder, process_name):
+    """Record the tasks run by this process in folder (folder=None disables it)"""
+    global _current
+    _current.close()
+    _current = Trace(folder, process_name)
+
+
+def complete(name, begin, end, category='task', tid=TASKS, **args):
+    _current.complete(name, begin, end, category, tid, **args)
+
+
+def span(name, category='task', **args):
+    return _current.span(name, category, **args)
+
+
+def merge(folder, filename):
+    """Write the events of the processes traced in folder to filename, then
+    remove folder"""
+    events = []
+    for name in sorted(os.listdir(folder)):
+        with open(os.path.join(folder, name), 'r') as f:
+            for line in f:
+                try:
+                    events.append(json.loads(line))
+                except ValueError:
+                    # last event of a process that was killed
+                    pass
+
+    with open(filename, 'w') as f:
+        json.dump({'traceEvents': events, 'displayTimeUnit': 'ms'}, f)
+    shutil.rmtree(folder)
@@ -1,15 +1,15 @@
 # -*- coding: utf-8 -*-
 
 import numpy as np
-import pyproj
 from .pnts import Pnts
 from .b3dm import B3dm
 
 
 def convert_to_ecef(x, y, z, epsg_input):
-    inp = pyproj.Proj(init='epsg:{0}'.format(epsg_input))
-    outp = pyproj.Proj(init='epsg:4978')  # ECEF
-    return pyproj.transform(inp, outp, x, y, z)
+    # pyproj is slow to import, and only needed here
+    from .points.projection import epsg, reproject
+    # to ECEF
+    return reproject((epsg(epsg_input), epsg(4978)), x, y, z)
 
 
 class TileContentReader(object):
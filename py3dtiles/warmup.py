@@ -0,0 +1,32 @@
+import argparse
+from py3dtiles.points import kernels
+
+
+def run():
+    """Compile the numba kernels (or load them from the cache) and print what
+    was compiled, and how long it took"""
+    import_time, report = kernels.compile_all()
+
+    for kernel in report:
+        print('{:<30} {:>8} {}'.format(
+            kernel.name,
+            'import' if kernel.seconds is None else '{:.2f}s'.format(kernel.seconds),
+            'compiled' if kernel.compiled else 'cache hit'))
+
+    lazy = [kernel for kernel in report if kernel.seconds is not None]
+    print('module import (with the explicit signature kernels): {:.2f}s'.format(import_time))
+    print('compiled: {:.2f}s, cache hits: {:.2f}s'.format(
+        sum([kernel.seconds for kernel in lazy if kernel.compiled]),
+        sum([kernel.seconds for kernel in lazy if not kernel.compiled])))
+    return report
+
+
+def init_parser(subparser, str2bool):
+    subparser.add_parser(
+        'warmup',
+        help='Compile the numba kernels used by the conversion in their cache folder (set with the {} environment variable), e.g. when building a container image.'.format(kernels.CACHE_DIR_VARIABLE),
+        formatter_class=argparse.ArgumentDefaultsHelpFormatter)
+
+
+def main(args):
+    run()
@@ -1,7 +1,6 @@
 import numpy as np
 import math
 import struct
-from .earcut import earcut
 
 
 class TriangleSoup:
@@ -190,6 +189,9 @@ def triangulate(polygon, additionalPolygons=[]):
     """
     Triangulates 3D polygons
     """
+    # imported here as it's only needed to build b3dm from geometries
+    from .earcut import earcut
+
     vect1 = polygon[0][1] - polygon[0][0]
     vect2 = polygon[0][2] - polygon[0][0]
     vectProd = np.cross(vect1, vect2)
@@ -0,0 +1,51 @@
+import argparse
+import multiprocessing
+from py3dtiles.convert import zmq_process
+from py3dtiles.points import auth
+
+
+def run(endpoint, jobs, writers=0, key_file=None):
+    """Start jobs worker processes, plus writers processes only writing the
+    .pnts, for the convert master bound to endpoint, and wait until the
+    conversion is done. The key file of a tcp endpoint is the one of the
+    master (see auth)."""
+    key = auth.read_key(key_file) if key_file is not None else None
+    auth.check_endpoint(endpoint, key)
+    processes = [multiprocessing.Process(
+        target=zmq_process,
+        args=(endpoint, None, i >= jobs, key)) for i in range(jobs + writers)]
+
+    for p in processes:
+        p.start()
+    for p in processes:
+        p.join()
+
+
+def init_parser(subparser, str2bool):
+    parser = subparser.add_parser(
+        'worker',
+        help='Start workers for a conversion running on another host (see the --bind option of convert).',
+        formatter_class=argparse.ArgumentDefaultsHelpFormatter)
+    parser.add_argument(
+        '--connect',
+        help='The endpoint of the convert command, e.g. tcp://hostname:5555',
+        required=True,
+        type=str)
+    parser.add_argument(
+        '--key_file',
+        help='The key file of the convert command (see py3dtiles keygen), required with a tcp endpoint',
+        type=str)
+    parser.add_argument(
+        '--jobs',
+        help='The number of worker processes to start. Default to the number of cpu.',
+        default=multiprocessing.cpu_count(),
+        type=int)
+    parser.add_argument(
+        '--writers',
+        help='The number of processes dedicated to writing the .pnts files, in addition to the jobs.',
+        default=0,
+        type=int)
+
+
+def main(args):
+    run(args.connect, args.jobs, args.writers, args.key_file)
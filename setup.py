@@ -12,7 +12,6 @@ requirements = (
     'triangle',
     'psycopg2-binary',
     'liblas',
-    'laspy',
     'numba',
     'pyproj',
     'psutil',
@@ -75,7 +74,8 @@ setup(
     test_suite="tests",
     extras_require={
         'dev': dev_requirements,
-        'doc': doc_requirements
+        'doc': doc_requirements,
+        'laz': ('laspy[lazrs]>=2',)
     },
     entry_points={
         'console_scripts': ['py3dtiles=py3dtiles.command_line:main'],
@@ -0,0 +1,150 @@
+# -*- coding: utf-8 -*-
+"""Scaling benchmark of convert.
+
+Runs convert on synthetic point clouds for every combination of the given
+scenes, formats, point counts, jobs and cache sizes, and appends one json
+line by run to the results file, e.g.:
+
+    python -m tests.benchmarks.convert_scaling --points 1000000 10000000 --jobs 1 4 --cache_size 200 2000
+
+The inputs are generated once in the work folder, and kept for the next runs.
+The peak RSS of the processes is sampled from /proc (Linux only).
+"""
+import argparse
+import itertools
+import json
+import multiprocessing
+import os
+import shutil
+import tempfile
+import time
+
+from tests import utils
+
+# delay between two samples of the memory of the processes, in seconds
+SAMPLE_INTERVAL = 0.1
+
+
+def input_file(folder, scene, count, extension):
+    """Returns the synthetic input file, written if needed"""
+    filename = os.path.join(folder, '{}-{}.{}'.format(scene, count, extension))
+    if not os.path.exists(filename):
+        write = utils.write_las if extension == 'las' else utils.write_xyz
+        write(filename + '.tmp', scene, count)
+        os.replace(filename + '.tmp', filename)
+    return filename
+
+
+def _children(pid):
+    try:
+        with open('/proc/{}/task/{}/children'.format(pid, pid)) as f:
+            children = [int(child) for child in f.read().split()]
+    except OSError:
+        return []
+    return children + [grandchild for child in children for grandchild in _children(child)]
+
+
+def _peak_rss(pid):
+    """Returns the peak resident memory of the process in bytes, or None if
+    it has ended"""
+    try:
+        with open('/proc/{}/status'.format(pid)) as f:
+            for line in f:
+                if line.startswith('VmHWM:'):
+                    return int(line.split()[1]) * 1024
+    except OSError:
+        return None
+
+
+def _convert(queue, files, kwargs):
+    from py3dtiles.convert import convert
+
+    progress = []
+    convert(files, progress_callback=progress.append, verbose=-1, **kwargs)
+    queue.put(progress[-1]._asdict())
+
+
+def tile_statistics(folder):
+    """Returns the .pnts count, size and depth of the tileset in folder"""
+    depths = []
+    size = 0
+    for root, dirs, files in os.walk(folder):
+        # the node names are split in folders of 8 characters
+        prefix = os.path.relpath(root, folder).replace(os.sep, '').replace('.', '')
+        for f in files:
+            if f.endswith('.pnts'):
+                depths += [len(prefix) + len(f) - len('r.pnts')]
+                size += os.path.getsize(os.path.join(root, f))
+
+    return {
+        'pnts_count': len(depths),
+        'pnts_bytes': size,
+        'max_depth': max(depths, default=0),
+        'tiles_by_depth': [depths.count(depth) for depth in range(max(depths, default=-1) + 1)],
+    }
+
+
+def run(files, outfolder, **kwargs):
+    """Converts files in a child process, and returns the measures of the run"""
+    queue = multiprocessing.Queue()
+    process = multiprocessing.Process(
+        target=_convert, args=(queue, files, dict(kwargs, outfolder=outfolder, overwrite=True)))
+
+    begin = time.time()
+    process.start()
+    peaks = {}
+    while process.is_alive():
+        for pid in [process.pid] + _children(process.pid):
+            rss = _peak_rss(pid)
+            if rss is not None:
+                peaks[pid] = rss
+        time.sleep(SAMPLE_INTERVAL)
+    elapsed = time.time() - begin
+    process.join()
+    if process.exitcode != 0:
+        raise RuntimeError('the conversion failed ({})'.format(process.exitcode))
+
+    progress = queue.get()
+    master = peaks.pop(process.pid, None)
+    return {
+        'seconds': elapsed,
+        'points': progress['points_in_pnts'],
+        'points_per_second': progress['points_in_pnts'] / elapsed,
+        'peak_rss_bytes': {'master': master, 'workers': sorted(peaks.values(), reverse=True)},
+        'node_store_spilled_bytes': progress['node_store_spilled_bytes'],
+        'node_store_hits': progress['node_store_hits'],
+        'node_store_misses': progress['node_store_misses'],
+        'tiles': tile_statistics(outfolder),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description='Measure how convert scales with the point count, jobs and cache size',
+        formatter_class=argparse.ArgumentDefaultsHelpFormatter)
+    parser.add_argument('--scene', nargs='+', default=['terrain'], choices=sorted(utils.SCENES))
+    parser.add_argument('--format', nargs='+', default=['xyz'], choices=['las', 'xyz'])
+    parser.add_argument('--points', nargs='+', default=[1000000], type=int)
+    parser.add_argument('--jobs', nargs='+', default=[multiprocessing.cpu_count()], type=int)
+    parser.add_argument('--cache_size', nargs='+', default=[1000], type=int, help='In MB')
+    parser.add_argument('--workdir', default=os.path.join(tempfile.gettempdir(), 'py3dtiles-scaling'),
+                        help='Folder of the inputs, and of the outputs during the runs')
+    parser.add_argument('--results', default='scaling.jsonl', help='The json lines file to append the results to')
+    args = parser.parse_args()
+
+    os.makedirs(args.workdir, exist_ok=True)
+    outfolder = os.path.join(args.workdir, 'out')
+    matrix = itertools.product(args.scene, args.format, args.points, args.jobs, args.cache_size)
+    for scene, extension, count, jobs, cache_size in matrix:
+        files = [input_file(args.workdir, scene, count, extension)]
+        parameters = {'scene': scene, 'format': extension, 'point_count': count, 'jobs': jobs, 'cache_size': cache_size}
+        result = dict(parameters, **run(files, outfolder, jobs=jobs, cache_size=cache_size))
+        shutil.rmtree(outfolder)
+
+        print(json.dumps(result))
+        with open(args.results, 'a') as f:
+            f.write(json.dumps(result) + '\n')
+
+
+if __name__ == '__main__':
+    main()
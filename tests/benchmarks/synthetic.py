@@ -0,0 +1,63 @@
+# -*- coding: utf-8 -*-
+
+import argparse
+
+import numpy as np
+
+from py3dtiles.convert import OctreeMetadata
+from py3dtiles.points.utils import compute_spacing
+from tests.utils import SCENES, write_las, write_xyz
+
+# Seeded synthetic point clouds, in the local coordinates of the octree (as
+# sent by the readers to the workers)
+
+AABB = np.array([[0, 0, 0], [100, 100, 100]], dtype=np.float32)
+OCTREE_METADATA = OctreeMetadata(aabb=AABB, spacing=compute_spacing(AABB), scale=1)
+
+DISTRIBUTIONS = ['uniform', 'planar', 'clustered']
+SIZES = [10000, 100000]
+
+
+def _uniform(random, count):
+    return random.random_sample((count, 3)) * 100
+
+
+def _planar(random, count):
+    # a LiDAR-like ground: a gentle terrain with a few cm of noise
+    xy = random.random_sample((count, 2)) * 100
+    z = 20 + 5 * np.sin(xy[:, 0] / 10) * np.cos(xy[:, 1] / 13) + random.normal(0, 0.05, count)
+    return np.column_stack((xy, z))
+
+
+def _clustered(random, count):
+    centers = 10 + random.random_sample((20, 3)) * 80
+    xyz = centers[random.randint(0, len(centers), count)] + random.normal(0, 2, (count, 3))
+    return np.clip(xyz, 0, 100)
+
+
+def points(distribution, count, seed=0):
+    """Returns the xyz (float32) and rgb (uint8) arrays of count points"""
+    random = np.random.RandomState(seed)
+    xyz = {
+        'uniform': _uniform,
+        'planar': _planar,
+        'clustered': _clustered,
+    }[distribution](random, count)
+    rgb = random.randint(0, 256, (count, 3))
+    return np.ascontiguousarray(xyz, dtype=np.float32), np.ascontiguousarray(rgb, dtype=np.uint8)
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Write a synthetic point cloud file (.las or .xyz)')
+    parser.add_argument('scene', choices=sorted(SCENES))
+    parser.add_argument('count', type=int)
+    parser.add_argument('filename')
+    parser.add_argument('--seed', default=0, type=int)
+    args = parser.parse_args()
+
+    write = write_las if args.filename.endswith('.las') else write_xyz
+    write(args.filename, args.scene, args.count, args.seed)
+
+
+if __name__ == '__main__':
+    main()
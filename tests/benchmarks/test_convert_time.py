@@ -0,0 +1,32 @@
+# -*- coding: utf-8 -*-
+"""Conversions of synthetic point clouds (only run with pytest --benchmark-only,
+see convert_scaling for the scaling harness)"""
+
+import numpy as np
+import pytest
+
+from tests import utils
+from tests.benchmarks import convert_scaling
+
+
+def test_synthetic_las(tmp_path):
+    filename = str(tmp_path / 'urban.las')
+    utils.write_las(filename, 'urban', 25000)
+
+    with open(filename, 'rb') as f:
+        header = utils.LAS_HEADER.unpack(f.read(utils.LAS_HEADER.size))
+        points = np.frombuffer(f.read(), dtype=utils.LAS_POINT)
+    assert header[0] == b'LASF'
+    assert header[15] == len(points) == 25000
+    bounds = np.array(header[-6:]).reshape(3, 2)
+    for i, axis in enumerate('XYZ'):
+        coordinates = utils.ORIGIN[i] + points[axis] * utils.LAS_SCALE
+        assert bounds[i][1] == coordinates.min() and bounds[i][0] == coordinates.max()
+    assert sorted(np.unique(points['classification'])) == [utils.GROUND, utils.BUILDING]
+
+
+@pytest.mark.parametrize('scene', sorted(utils.SCENES))
+def test_convert(benchmark, scene, tmp_path):
+    files = [convert_scaling.input_file(str(tmp_path), scene, 200000, 'xyz')]
+    result = benchmark.pedantic(convert_scaling.run, args=(files, str(tmp_path / 'out')), kwargs={'jobs': 2}, rounds=1)
+    assert result['points'] == 200000
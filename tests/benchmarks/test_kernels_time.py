@@ -0,0 +1,109 @@
+# -*- coding: utf-8 -*-
+
+import numpy as np
+import pytest
+
+from py3dtiles.points.distance import is_point_far_enough, xyz_to_child_index, xyz_to_key
+from py3dtiles.points.node import Node
+from py3dtiles.points.node_catalog import NodeCatalog
+from py3dtiles.points.points_grid import Grid
+
+from tests.benchmarks.synthetic import DISTRIBUTIONS, OCTREE_METADATA, SIZES, points
+
+parametrize = pytest.mark.parametrize
+# the benchmarks modifying the nodes are run on fresh nodes
+ROUNDS = 5
+
+
+def _root():
+    node = Node(b'', OCTREE_METADATA.aabb, OCTREE_METADATA.spacing)
+    node.children = []
+    return node
+
+
+@parametrize('count', SIZES)
+@parametrize('distribution', DISTRIBUTIONS)
+def test_xyz_to_key(benchmark, distribution, count):
+    xyz, _ = points(distribution, count)
+    node = _root()
+    grid = node.grid
+    benchmark(
+        xyz_to_key, xyz, grid.cell_count, node.aabb[0], node.inv_aabb_size,
+        int(grid.cell_count[0] - 1).bit_length())
+
+
+@parametrize('count', SIZES)
+@parametrize('distribution', DISTRIBUTIONS)
+def test_xyz_to_child_index(benchmark, distribution, count):
+    xyz, _ = points(distribution, count)
+    benchmark(xyz_to_child_index, xyz, _root().aabb_center)
+
+
+@parametrize('count', SIZES)
+@parametrize('distribution', DISTRIBUTIONS)
+def test_is_point_far_enough(benchmark, distribution, count):
+    xyz, _ = points(distribution, count)
+    # the worst case: the point is far from every point of the cell
+    far = np.array([1000, 1000, 1000], dtype=np.float32)
+    assert benchmark(is_point_far_enough, xyz, far, np.float32(1))
+
+
+@parametrize('count', SIZES)
+@parametrize('distribution', DISTRIBUTIONS)
+def test_grid_insert(benchmark, distribution, count):
+    xyz, rgb = points(distribution, count)
+    node = _root()
+
+    def setup():
+        return (node.aabb[0], node.inv_aabb_size, xyz, rgb), {}
+
+    def insert(*args):
+        return Grid(node).insert(*args)
+
+    benchmark.pedantic(insert, setup=setup, rounds=ROUNDS)
+
+
+@parametrize('count', SIZES)
+@parametrize('distribution', DISTRIBUTIONS)
+def test_grid_balance(benchmark, distribution, count):
+    xyz, rgb = points(distribution, count)
+    node = _root()
+
+    def setup():
+        grid = Grid(node)
+        grid.insert(node.aabb[0], node.inv_aabb_size, xyz, rgb, True)
+        return (grid,), {}
+
+    def balance(grid):
+        grid.balance(node.aabb_size, node.aabb[0], node.inv_aabb_size)
+
+    benchmark.pedantic(balance, setup=setup, rounds=ROUNDS)
+
+
+@parametrize('count', SIZES)
+@parametrize('distribution', DISTRIBUTIONS)
+def test_node_insert(benchmark, distribution, count):
+    xyz, rgb = points(distribution, count)
+
+    def setup():
+        catalog = NodeCatalog(b'', b'', OCTREE_METADATA)
+        node = catalog.get_node(b'')
+        node.children = []
+        return (catalog, OCTREE_METADATA.scale, xyz, rgb), {}
+
+    def insert(catalog, *args):
+        catalog.get_node(b'').insert(catalog, *args)
+
+    benchmark.pedantic(insert, setup=setup, rounds=ROUNDS)
+
+
+@parametrize('count', SIZES)
+@parametrize('distribution', DISTRIBUTIONS)
+def test_get_pending_points(benchmark, distribution, count):
+    xyz, rgb = points(distribution, count)
+    node = _root()
+    node.pending_xyz = [xyz]
+    node.pending_rgb = [rgb]
+
+    result = benchmark(lambda: list(node._get_pending_points()))
+    assert sum([len(xyz) for _, xyz, _ in result]) == count
@@ -0,0 +1,20 @@
+# -*- coding: utf-8 -*-
+"""Startup time of py3dtiles in a new interpreter (only run with pytest
+--benchmark-only)"""
+
+import subprocess
+import sys
+
+from tests.test_startup import ROOT
+
+
+def _run(*args):
+    subprocess.check_call([sys.executable] + list(args), cwd=ROOT, stdout=subprocess.DEVNULL)
+
+
+def test_import_time(benchmark):
+    benchmark.pedantic(_run, args=('-c', 'import py3dtiles'), rounds=5)
+
+
+def test_info_startup_time(benchmark):
+    benchmark.pedantic(_run, args=('-m', 'py3dtiles.command_line', 'info', '--help'), rounds=5)
@@ -0,0 +1,109 @@
+# -*- coding: utf-8 -*-
+
+import os
+
+import lz4.frame as gzip
+import pytest
+
+from py3dtiles.points.node import Node
+from py3dtiles.points.node_catalog import NodeCatalog
+from py3dtiles.points.shared_node_store import SharedNodeStore
+from py3dtiles.points.task.pnts_writer import points_to_pnts
+
+from tests.benchmarks.synthetic import DISTRIBUTIONS, OCTREE_METADATA, SIZES, points
+
+parametrize = pytest.mark.parametrize
+ROUNDS = 5
+
+
+def _catalog(distribution, count):
+    """A catalog of the root and its children, as built by a node job"""
+    xyz, rgb = points(distribution, count)
+    catalog = NodeCatalog(b'', b'', OCTREE_METADATA)
+    root = catalog.get_node(b'')
+    root.children = []
+    root.insert(catalog, OCTREE_METADATA.scale, xyz, rgb)
+    root.flush_pending_points(catalog, OCTREE_METADATA.scale)
+    return catalog
+
+
+def _nodes(distribution, count):
+    """The serialized nodes of a catalog, as put in the node store"""
+    catalog = _catalog(distribution, count)
+    return [(name, node.save_to_bytes()) for name, node in catalog.nodes.items()]
+
+
+@parametrize('count', SIZES)
+@parametrize('distribution', DISTRIBUTIONS)
+def test_catalog_dump(benchmark, distribution, count):
+    catalog = _catalog(distribution, count)
+    benchmark(lambda: gzip.compress(catalog.dump(b'', 1)))
+
+
+@parametrize('count', SIZES)
+@parametrize('distribution', DISTRIBUTIONS)
+def test_catalog_load(benchmark, distribution, count):
+    data = gzip.compress(_catalog(distribution, count).dump(b'', 1))
+    catalog = benchmark(NodeCatalog, data, b'', OCTREE_METADATA)
+    assert len(catalog.nodes) > 1
+
+
+@parametrize('count', SIZES)
+@parametrize('distribution', DISTRIBUTIONS)
+def test_store_put(benchmark, distribution, count, tmp_path):
+    nodes = _nodes(distribution, count)
+
+    def setup():
+        return (SharedNodeStore(str(tmp_path)),), {}
+
+    def put(store):
+        for name, data in nodes:
+            store.put(name, data)
+
+    benchmark.pedantic(put, setup=setup, rounds=ROUNDS)
+
+
+@parametrize('count', SIZES)
+@parametrize('distribution', DISTRIBUTIONS)
+def test_store_get(benchmark, distribution, count, tmp_path):
+    nodes = _nodes(distribution, count)
+    store = SharedNodeStore(str(tmp_path))
+    for name, data in nodes:
+        store.put(name, data)
+
+    benchmark(lambda: [store.get(name) for name, _ in nodes])
+
+
+@parametrize('count', SIZES)
+@parametrize('distribution', DISTRIBUTIONS)
+def test_store_evict(benchmark, distribution, count, tmp_path):
+    nodes = _nodes(distribution, count)
+
+    def setup():
+        store = SharedNodeStore(str(tmp_path))
+        for name, data in nodes:
+            store.put(name, data)
+        return (store,), {}
+
+    def evict(store):
+        return store.remove_oldest_nodes(1)
+
+    evicted = benchmark.pedantic(evict, setup=setup, rounds=ROUNDS)
+    assert evicted[0] == len(nodes)
+
+
+@parametrize('count', SIZES)
+@parametrize('distribution', DISTRIBUTIONS)
+def test_points_to_pnts(benchmark, distribution, count, tmp_path):
+    catalog = _catalog(distribution, count)
+    data = Node.get_points(catalog.get_node(b''), True)
+    folders = iter(range(ROUNDS + 1))
+
+    def setup():
+        # the .pnts can't be overwritten
+        folder = tmp_path / str(next(folders))
+        folder.mkdir()
+        return (b'', data, str(folder), True), {}
+
+    _, filename = benchmark.pedantic(points_to_pnts, setup=setup, rounds=ROUNDS)
+    assert os.path.exists(filename)
@@ -0,0 +1,62 @@
+# -*- coding: utf-8 -*-
+
+import os
+import shutil
+import tempfile
+import unittest
+
+from py3dtiles.points import checkpoint
+from py3dtiles.points.shared_node_store import SharedNodeStore
+from py3dtiles.points.utils import name_to_filename
+
+
+class TestCheckpoint(unittest.TestCase):
+
+    def setUp(self):
+        self.folder = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.folder)
+
+    def test_write_load(self):
+        store = SharedNodeStore(os.path.join(self.folder, 'tmp'))
+        store.put(b'0', b'flushed')
+        store.remove_oldest_nodes(1)
+        store.put(b'1', b'cached')
+
+        checkpoint.write(self.folder, {'answer': 42}, store)
+        # the snapshot isn't modified by the later changes of the store
+        store.put(b'0', b'more recent')
+        store.remove_oldest_nodes(1)
+        checkpoint.write(self.folder, {'answer': 43}, store)
+
+        state, nodes = checkpoint.load(self.folder)
+        self.assertEqual(state['answer'], 43)
+
+        os.rename(os.path.join(self.folder, 'checkpoint'), os.path.join(self.folder, 'checkpoint.old'))
+        state, nodes = checkpoint.load(self.folder)
+        self.assertEqual(state['answer'], 43)
+
+        restored = SharedNodeStore(os.path.join(self.folder, 'tmp'))
+        restored.restore(nodes)
+        self.assertEqual(len(restored.get(b'0')), len(store.get(b'0')))
+        self.assertEqual(len(restored.get(b'1')), len(store.get(b'1')))
+
+        checkpoint.remove(self.folder)
+        with self.assertRaises(FileNotFoundError):
+            checkpoint.load(self.folder)
+
+    def test_remove_unlisted_pnts(self):
+        os.makedirs(os.path.join(self.folder, 'tmp'))
+        names = [b'0', b'01', b'0123456701']
+        for name in names:
+            open(name_to_filename(self.folder, name, '.pnts'), 'w').close()
+        open(os.path.join(self.folder, 'tmp', 'r0.pnts'), 'w').close()
+
+        written = os.path.relpath(name_to_filename(self.folder, b'01', '.pnts'), self.folder)
+        checkpoint.remove_unlisted_pnts(self.folder, [written], ['tmp'])
+
+        self.assertEqual(
+            [os.path.exists(name_to_filename(self.folder, name, '.pnts')) for name in names],
+            [False, True, False])
+        self.assertTrue(os.path.exists(os.path.join(self.folder, 'tmp', 'r0.pnts')))
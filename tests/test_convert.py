@@ -0,0 +1,58 @@
+# -*- coding: utf-8 -*-
+
+import os
+import shutil
+import tempfile
+import unittest
+from unittest import mock
+
+import numpy as np
+
+from py3dtiles import convert as convert_module
+from py3dtiles.convert import convert
+
+from tests import utils
+
+
+class TestConvert(unittest.TestCase):
+
+    def setUp(self):
+        self.folder = tempfile.mkdtemp()
+        self.bind = 'ipc://{}/convert'.format(self.folder)
+        self.xyz = os.path.join(self.folder, 'points.xyz')
+        random = np.random.RandomState(0)
+        np.savetxt(self.xyz, random.random_sample((50000, 3)) * [1000, 1000, 50], fmt='%.3f')
+
+    def tearDown(self):
+        shutil.rmtree(self.folder)
+
+    def test_progress_callback(self):
+        events = []
+        # an event after every loop iteration
+        with mock.patch.object(convert_module, 'PROGRESS_INTERVAL', 0):
+            convert(self.xyz, outfolder=os.path.join(self.folder, 'out'), jobs=1, bind=self.bind,
+                    progress_callback=events.append)
+
+        self.assertGreater(len(events), 1)
+        for previous, event in zip(events, events[1:]):
+            for counter in ['elapsed', 'points_read', 'points_processed', 'points_in_pnts']:
+                self.assertLessEqual(getattr(previous, counter), getattr(event, counter), counter)
+
+        self.assertEqual([event.done for event in events], [False] * (len(events) - 1) + [True])
+        self.assertEqual(events[-1].point_count, 50000)
+        self.assertEqual(events[-1].points_read, 50000)
+        self.assertEqual(events[-1].points_in_pnts, events[-1].point_count)
+        self.assertEqual(events[-1].pending_pnts, 0)
+
+    def test_partition_without_points(self):
+        # a las file without points
+        las = os.path.join(self.folder, 'empty.las')
+        with open(las, 'wb') as f:
+            f.write(utils.LAS_HEADER.pack(
+                b'LASF', 0, 0, bytes(16), 1, 2, b'py3dtiles', b'py3dtiles tests', 1, 2020,
+                utils.LAS_HEADER.size, utils.LAS_HEADER.size, 0, 2, utils.LAS_POINT.itemsize, 0,
+                0, 0, 0, 0, 0, *[utils.LAS_SCALE] * 3, 0., 0., 0., 1., 0., 1., 0., 1., 0.))
+
+        outfolder = os.path.join(self.folder, 'out')
+        convert(las, outfolder=outfolder, jobs=1, bind=self.bind, partition_depth=2)
+        self.assertTrue(os.path.exists(os.path.join(outfolder, 'tileset.json')))
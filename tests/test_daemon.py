@@ -0,0 +1,157 @@
+# -*- coding: utf-8 -*-
+
+import json
+import multiprocessing
+import os
+import shutil
+import tempfile
+import threading
+import unittest
+
+import numpy as np
+
+from py3dtiles import daemon
+from py3dtiles.daemon import WorkerPool
+
+
+class TestWorkerPool(unittest.TestCase):
+
+    def test_assign(self):
+        pool = WorkerPool()
+        for worker_id in [b'1', b'2', b'3', b'4']:
+            pool.worker_ready(worker_id)
+        self.assertEqual(pool.assign(), [])
+
+        # each conversion gets its share of the pool
+        pool.add_conversion(1, 'ipc://a')
+        pool.add_conversion(2, 'ipc://b')
+        endpoints = [endpoint for _, endpoint in pool.assign()]
+        self.assertEqual(sorted(endpoints), ['ipc://a', 'ipc://a', 'ipc://b', 'ipc://b'])
+        self.assertEqual(pool.idle, [])
+
+        # a worker back from a conversion means it is shutting down
+        a_workers = [w for w, c in pool.assigned.items() if c == 1]
+        pool.worker_ready(a_workers[0])
+        self.assertEqual(pool.assign(), [(a_workers[0], 'ipc://b')])
+
+        self.assertEqual(pool.remove_conversion(1), [a_workers[1]])
+        pool.worker_ready(a_workers[1])
+        pool.add_conversion(3, 'ipc://c')
+        self.assertEqual(pool.assign(), [(a_workers[1], 'ipc://c')])
+
+        pool.forget(a_workers[1])
+        self.assertEqual(pool.remove_conversion(3), [])
+
+    def test_rebalance(self):
+        pool = WorkerPool()
+        for worker_id in [b'1', b'2', b'3']:
+            pool.worker_ready(worker_id)
+        pool.add_conversion(1, 'ipc://a')
+        self.assertEqual(len(pool.assign()), 3)
+        self.assertEqual(pool.rebalance(), {})
+
+        # the first conversion releases the workers above its share
+        pool.add_conversion(2, 'ipc://b')
+        self.assertEqual(pool.assign(), [])
+        self.assertEqual(pool.rebalance(), {1: 2})
+        self.assertEqual(pool.rebalance(), {})
+
+        # the released workers join the new conversion, and the first one
+        # isn't closing
+        for worker_id in list(pool.assigned)[:2]:
+            pool.worker_ready(worker_id)
+        self.assertEqual([endpoint for _, endpoint in pool.assign()], ['ipc://b'])
+        self.assertEqual(pool.closing, set())
+        self.assertEqual(len(pool.idle), 1)
+
+        # the idle worker goes to the first conversion to end
+        pool.remove_conversion(2)
+        self.assertEqual([endpoint for _, endpoint in pool.assign()], ['ipc://a'])
+
+
+def _write_xyz(filename, count, seed):
+    random = np.random.RandomState(seed)
+    xyz = random.random_sample((count, 3)) * [1000, 1000, 50]
+    np.savetxt(filename, xyz, fmt='%.3f')
+
+
+def _pnts_count(outfolder):
+    # the tileset of a successful conversion, and its .pnts
+    with open(os.path.join(outfolder, 'tileset.json')) as f:
+        json.load(f)
+    return sum(1 for _, _, files in os.walk(outfolder) for f in files if f.endswith('.pnts'))
+
+
+class TestDaemon(unittest.TestCase):
+
+    def setUp(self):
+        self.folder = tempfile.mkdtemp()
+        self.endpoint = 'ipc://{}/daemon'.format(self.folder)
+        self.daemon = multiprocessing.Process(target=daemon.run, args=(self.endpoint, 2, -1))
+        self.daemon.start()
+
+    def tearDown(self):
+        self.daemon.terminate()
+        self.daemon.join()
+        shutil.rmtree(self.folder)
+
+    def test_error(self):
+        xyz = os.path.join(self.folder, 'points.xyz')
+        with open(xyz, 'w') as f:
+            f.write('0 0 0\n1 1 1\n')
+        outfolder = os.path.join(self.folder, 'out')
+        os.makedirs(outfolder)
+
+        # exceptions of the conversion are raised by submit()
+        with self.assertRaises(SystemExit):
+            daemon.submit(self.endpoint, xyz, outfolder=outfolder, overwrite=False)
+        with self.assertRaises(SystemExit):
+            daemon.submit(self.endpoint, xyz, outfolder=outfolder, overwrite=False)
+
+    def test_convert(self):
+        xyz = os.path.join(self.folder, 'points.xyz')
+        _write_xyz(xyz, 20000, 0)
+        outfolder = os.path.join(self.folder, 'out')
+
+        events = []
+        daemon.submit(self.endpoint, xyz, outfolder=outfolder, progress_callback=events.append)
+        self.assertTrue(events[-1].done)
+        self.assertEqual(events[-1].points_in_pnts, 20000)
+        self.assertGreater(_pnts_count(outfolder), 0)
+
+    def test_concurrent_conversions(self):
+        files = []
+        for i, count in enumerate([400000, 20000]):
+            files.append(os.path.join(self.folder, '{}.xyz'.format(i)))
+            _write_xyz(files[-1], count, i)
+
+        events = {0: [], 1: []}
+        started = threading.Event()
+        ended = []
+
+        def on_progress(conversion, event):
+            events[conversion].append((len(ended), event))
+            if event.workers == 2:
+                started.set()
+
+        def submit(conversion):
+            daemon.submit(
+                self.endpoint, files[conversion], outfolder=os.path.join(self.folder, 'out{}'.format(conversion)),
+                progress_callback=lambda event: on_progress(conversion, event))
+            ended.append(conversion)
+
+        first = threading.Thread(target=submit, args=(0,))
+        first.start()
+        # the first conversion gets all the workers...
+        self.assertTrue(started.wait(60))
+        # ...and gives one to the second one
+        submit(1)
+        first.join()
+
+        self.assertEqual(events[1][-1][1].points_in_pnts, 20000)
+        self.assertEqual(events[0][-1][1].points_in_pnts, 400000)
+        # the second conversion had a worker while the first one was running
+        self.assertTrue(any(ended_count == 0 and event.workers == 1 for ended_count, event in events[1]))
+        self.assertEqual(ended, [1, 0])
+        for conversion in [0, 1]:
+            self.assertGreater(_pnts_count(os.path.join(self.folder, 'out{}'.format(conversion))), 0)
@@ -0,0 +1,37 @@
+# -*- coding: utf-8 -*-
+
+import unittest
+import numpy as np
+
+from py3dtiles.convert import OctreeMetadata
+from py3dtiles.points import kernels, point_batch
+from py3dtiles.points.task import node_process
+from py3dtiles.points.utils import compute_spacing
+
+
+class _Queue(object):
+    def send_multipart(self, frames, copy=True, block=True):
+        pass
+
+
+class TestKernels(unittest.TestCase):
+
+    def test_compile_all(self):
+        _, report = kernels.compile_all()
+        self.assertEqual(
+            sorted(set([kernel.name for kernel in report])),
+            ['distance.is_point_far_enough', 'distance.xyz_to_child_index',
+             'distance.xyz_to_key', 'points_grid._insert', 'xyz_reader._parse'])
+        signatures = {kernel.name: kernel.signature for kernel in report}
+
+        # the conversion doesn't compile other signatures than the compiled ones
+        aabb = np.array([[0, 0, 0], [100, 100, 100]], dtype=np.float32)
+        octree_metadata = OctreeMetadata(aabb=aabb, spacing=compute_spacing(aabb), scale=1)
+        xyz = np.random.RandomState(0).random_sample((30000, 3)) * 50
+        batch = point_batch.encode(xyz, np.zeros((30000, 3)))
+        for name in [b'', b'0', b'000']:
+            node_process._process(b'', octree_metadata, name, [batch], _Queue(), 0, None)
+
+        from py3dtiles.points import distance, points_grid
+        for kernel in [distance.xyz_to_child_index, points_grid._insert]:
+            self.assertEqual(kernel.signatures, [signatures[kernels._name(kernel)]])
@@ -0,0 +1,122 @@
+# -*- coding: utf-8 -*-
+
+import os
+import shutil
+import struct
+import tempfile
+import unittest
+
+import numpy as np
+
+from py3dtiles.points import point_batch
+from py3dtiles.points.task import las_reader
+
+from tests import utils
+
+
+def _laz_available():
+    try:
+        las_reader._laz_backend()
+    except Exception:
+        return False
+    return True
+
+
+def _write_laz_header(filename, count, chunk_size):
+    vlr = struct.pack('<H16sHH32s', 0, b'laszip encoder', 22204, 34, b'')
+    laszip = bytes(12) + struct.pack('<I', chunk_size) + bytes(18)
+    with open(filename, 'wb') as f:
+        f.write(utils.LAS_HEADER.pack(
+            b'LASF', 0, 0, bytes(16), 1, 2, b'', b'', 1, 2020, utils.LAS_HEADER.size,
+            utils.LAS_HEADER.size + len(vlr) + len(laszip), 1, 2 | 0x80, 26, count, count, 0, 0, 0, 0,
+            0.01, 0.01, 0.01, 0, 0, 0, 100, 0, 100, 0, 10, 0))
+        f.write(vlr + laszip)
+
+
+class _Queue(object):
+    def __init__(self):
+        self.xyz = []
+        self.rgb = []
+
+    def send_multipart(self, frames, copy=True, block=True):
+        if len(frames) > 1:
+            xyz, rgb = point_batch.decode(frames[1:])
+            self.xyz.append(xyz.copy())
+            self.rgb.append(rgb.copy())
+
+
+class TestLasReader(unittest.TestCase):
+
+    def setUp(self):
+        self.folder = tempfile.mkdtemp()
+        self.filename = os.path.join(self.folder, 'terrain.las')
+        utils.write_las(self.filename, 'terrain', 50000)
+        with open(self.filename, 'rb') as f:
+            f.seek(utils.LAS_HEADER.size)
+            self.points = np.frombuffer(f.read(), dtype=utils.LAS_POINT)
+
+    def tearDown(self):
+        shutil.rmtree(self.folder)
+
+    def test_init(self):
+        infos = las_reader.init([self.filename])
+        self.assertEqual(infos['point_count'], 50000)
+        self.assertEqual(infos['portions'], [(self.filename, (0, 50000))])
+        # 16 bits colors
+        self.assertEqual(infos['color_scale'], 1.0 / 255)
+        xyz = utils.ORIGIN + np.column_stack([self.points[axis] for axis in 'XYZ']) * utils.LAS_SCALE
+        np.testing.assert_array_equal(infos['aabb'], [xyz.min(axis=0), xyz.max(axis=0)])
+
+    def test_read_points(self):
+        header = las_reader.read_header(self.filename)
+        self.assertEqual((header.point_format, header.record_length), (2, 26))
+
+        points = las_reader.read_points(self.filename, header, 1000, 3000)
+        self.assertEqual(len(points), 2000)
+        for field in ['X', 'Y', 'Z', 'intensity', 'red', 'green', 'blue']:
+            np.testing.assert_array_equal(points[field], self.points[field][1000:3000])
+
+    def test_point_dtype(self):
+        # rgb after the gps time, and extra bytes
+        dtype = las_reader.point_dtype(3, 40)
+        self.assertEqual(dtype.itemsize, 40)
+        self.assertEqual(dtype.fields['red'][1], 28)
+        self.assertNotIn('red', las_reader.point_dtype(6, 30).names)
+
+    def test_run(self):
+        queue = _Queue()
+        offset_scale = (-utils.ORIGIN, np.array([1, 1, 1]), None, 1.0 / 255)
+        las_reader.run(b'0', self.filename, offset_scale, (10000, 25000), queue, None, 0)
+
+        xyz = np.concatenate(queue.xyz)
+        self.assertEqual(len(xyz), 15000)
+        expected = np.column_stack([self.points[axis][10000:25000] for axis in 'XYZ']) * utils.LAS_SCALE
+        np.testing.assert_allclose(xyz, expected, atol=1e-3)
+        np.testing.assert_array_equal(
+            np.concatenate(queue.rgb)[:, 0], (self.points['red'][10000:25000] / 255).astype(np.uint8))
+
+    def test_laz_portions(self):
+        filename = os.path.join(self.folder, 'chunks.laz')
+        for chunk_size, portion_size in [(50000, 1000000), (300000, 900000), (2000000, 2000000), (0xffffffff, 1000000)]:
+            _write_laz_header(filename, 2500000, chunk_size)
+            header = las_reader.read_header(filename)
+            self.assertTrue(header.compressed)
+            self.assertEqual(header.point_format, 2)
+
+            infos = las_reader.init([filename], color_scale=1)
+            self.assertEqual(infos['portions'][0], (filename, (0, min(portion_size, 2500000))))
+            self.assertEqual(infos['portions'][-1][1][1], 2500000)
+
+    @unittest.skipUnless(_laz_available(), 'no laz backend (lazrs or laszip) installed')
+    def test_run_laz(self):
+        import laspy
+        las = laspy.read(self.filename)
+        filename = os.path.join(self.folder, 'terrain.laz')
+        las.write(filename)
+
+        queue = _Queue()
+        offset_scale = (-utils.ORIGIN, np.array([1, 1, 1]), None, 1.0 / 255)
+        las_reader.run(b'0', filename, offset_scale, (10000, 25000), queue, None, 0)
+
+        expected = np.column_stack([self.points[axis][10000:25000] for axis in 'XYZ']) * utils.LAS_SCALE
+        np.testing.assert_allclose(np.concatenate(queue.xyz), expected, atol=1e-3)
@@ -0,0 +1,66 @@
+# -*- coding: utf-8 -*-
+
+import unittest
+import lz4.frame as gzip
+import numpy as np
+
+from py3dtiles.convert import OctreeMetadata
+from py3dtiles.points import point_batch
+from py3dtiles.points.node_catalog import NodeCatalog
+from py3dtiles.points.task import node_process
+from py3dtiles.points.utils import compute_spacing
+
+
+class _Queue(object):
+    def __init__(self):
+        self.point_count = 0
+
+    def send_multipart(self, frames, copy=True, block=True):
+        self.point_count += point_batch.point_count(frames[1])
+
+
+def _batch(count, seed):
+    # points of the node '0' (the first octant of the root)
+    xyz = np.random.RandomState(seed).random_sample((count, 3)) * 50
+    return point_batch.encode(xyz, np.zeros((count, 3)))
+
+
+class TestSplitNode(unittest.TestCase):
+
+    def setUp(self):
+        aabb = np.array([[0, 0, 0], [100, 100, 100]], dtype=np.float32)
+        self.octree_metadata = OctreeMetadata(aabb=aabb, spacing=compute_spacing(aabb), scale=1)
+
+    def _grid(self, data):
+        return NodeCatalog(gzip.compress(data), b'0', self.octree_metadata).get_node(b'0').grid
+
+    def test_partial_and_merge(self):
+        queue = _Queue()
+        total, data, splittable = node_process._process(
+            b'', self.octree_metadata, b'0', [_batch(30000, 0)], queue, 0, None)
+        self.assertTrue(splittable)
+        base = gzip.compress(data)
+        base_count = sum([cell.shape[0] for cell in self._grid(data).cells_xyz])
+
+        batches = [_batch(10000, seed) for seed in [1, 2, 3]]
+        queue = _Queue()
+        partials = []
+        total = 0
+        for part in [batches[0::2], batches[1::2]]:
+            partial_total, partial = node_process._process_partial(base, self.octree_metadata, b'0', part, queue)
+            partials.append(partial)
+            total += partial_total
+        merge_total, data = node_process._merge(base, self.octree_metadata, b'0', partials, queue)
+        total += merge_total
+
+        # every point is either kept by the node or forwarded to its children
+        grid = self._grid(data)
+        count = sum([cell.shape[0] for cell in grid.cells_xyz])
+        self.assertEqual(count - base_count, total)
+        self.assertEqual(total + queue.point_count, 30000)
+
+        # points accepted by different partial jobs were checked against each other
+        for cell in grid.cells_xyz:
+            distances = np.sum((cell[:, np.newaxis, :] - cell[np.newaxis, :, :]) ** 2, axis=2)
+            np.fill_diagonal(distances, np.inf)
+            self.assertTrue(np.all(distances >= grid.spacing))
@@ -0,0 +1,60 @@
+# -*- coding: utf-8 -*-
+
+import unittest
+import numpy as np
+
+from py3dtiles.points import point_batch
+from py3dtiles.points.node import Node
+from py3dtiles.points.partition import partition, Partitioner
+from py3dtiles.points.utils import split_aabb
+
+
+class _Queue(object):
+    def __init__(self):
+        self.counts = {}
+
+    def send_multipart(self, frames, copy=True):
+        self.counts[frames[0]] = self.counts.get(frames[0], 0) + point_batch.point_count(frames[1])
+
+
+def _node_partition(xyz, aabb, depth, name=b''):
+    # routing of the points by the nodes themselves
+    if depth == 0:
+        return {name: len(xyz)}
+    node = Node(name, aabb, 1)
+    node.children = []
+    node.pending_xyz, node.pending_rgb = [xyz], [np.zeros(xyz.shape, dtype=np.uint8)]
+    result = {}
+    for child_name, child_xyz, _ in node.dump_pending_points():
+        child_aabb = split_aabb(aabb, int(child_name[-1:]))
+        result.update(_node_partition(child_xyz, child_aabb, depth - 1, child_name))
+    return result
+
+
+class TestPartition(unittest.TestCase):
+
+    def test_same_nodes_as_node_routing(self):
+        # a cube, and a flat aabb subdivided as a quadtree
+        for size in [[100, 100, 100], [100, 100, 5]]:
+            aabb = np.array([[0, 0, 0], size], dtype=np.float64)
+            xyz = (np.random.RandomState(0).random_sample((5000, 3)) * size).astype(np.float32)
+            rgb = np.zeros(xyz.shape, dtype=np.uint8)
+            for depth in [1, 2, 3]:
+                names = {name: len(part) for name, part, _ in partition(xyz, rgb, aabb, depth)}
+                self.assertEqual(names, _node_partition(xyz, aabb, depth))
+                self.assertTrue(all([len(name) == depth for name in names]))
+
+    def test_partitioner(self):
+        aabb = np.array([[0, 0, 0], [100, 100, 100]], dtype=np.float64)
+        xyz = (np.random.RandomState(0).random_sample((50000, 3)) * 100).astype(np.float32)
+        rgb = np.zeros(xyz.shape, dtype=np.uint8)
+
+        queue = _Queue()
+        sender = Partitioner(queue, 0, aabb, 2, 0.1)
+        for i in range(0, len(xyz), 10000):
+            sender.send(xyz[i:i + 10000], rgb[i:i + 10000])
+        sender.flush()
+
+        self.assertEqual(sum(queue.counts.values()), len(xyz))
+        self.assertAlmostEqual(queue.counts[b''] / len(xyz), 0.1, delta=0.01)
+        self.assertTrue(all([len(name) == 2 for name in queue.counts if name != b'']))
@@ -0,0 +1,82 @@
+# -*- coding: utf-8 -*-
+
+import shutil
+import tempfile
+import unittest
+
+import numpy as np
+
+from py3dtiles import TileContentReader
+from py3dtiles.feature_table import Feature, FeatureTable, SemanticPoint
+from py3dtiles.points.task.pnts_writer import points_to_pnts
+
+
+class TestTileContentReader(unittest.TestCase):
+
+    def test_read(self):
+        tile = TileContentReader().read_file('tests/pointCloudRGB.pnts')
+
+        self.assertEqual(tile.header.version, 1.0)
+        self.assertEqual(tile.header.tile_byte_length, 15176)
+        self.assertEqual(tile.header.ft_json_byte_length, 148)
+        self.assertEqual(tile.header.ft_bin_byte_length, 15000)
+
+        fth = tile.body.feature_table.header
+        self.assertEqual(fth.points_length, 1000)
+        self.assertEqual(fth.positions, SemanticPoint.POSITION)
+        self.assertEqual(fth.colors, SemanticPoint.RGB)
+        self.assertEqual(fth.colors_offset, 12000)
+        self.assertEqual(fth.rtc, [1215012.8828876738, -4736313.051199594, 4081605.22126042])
+
+        feature = tile.body.feature_table.feature(0)
+        self.assertAlmostEqual(feature.positions['X'], 2.19396, places=5)
+        self.assertDictEqual(feature.colors, {'Red': 44, 'Green': 243, 'Blue': 209})
+
+
+class TestTileContentBuilder(unittest.TestCase):
+
+    def setUp(self):
+        self.folder = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.folder)
+
+    def test_from_features(self):
+        pdt = np.dtype([('X', '<f4'), ('Y', '<f4'), ('Z', '<f4')])
+        cdt = np.dtype([('Red', 'u1'), ('Green', 'u1'), ('Blue', 'u1')])
+        features = [Feature.from_values(i, 2 * i, 0.5, i, 10, 20) for i in range(10)]
+
+        ft = FeatureTable.from_features(pdt, cdt, features)
+        self.assertEqual(ft.npoints(), 10)
+        self.assertEqual(ft.header.colors_offset, 120)
+        # 8-byte aligned after the 28 bytes tile header
+        self.assertEqual((28 + len(ft.header.to_array())) % 8, 0)
+        self.assertEqual(len(ft.body.to_array()), 150)
+        self.assertDictEqual(ft.feature(3).positions, {'X': 3, 'Y': 6, 'Z': 0.5})
+        self.assertDictEqual(ft.feature(3).colors, {'Red': 3, 'Green': 10, 'Blue': 20})
+
+    def test_points_to_pnts(self):
+        xyz = np.arange(30, dtype=np.float32).reshape((10, 3))
+        rgb = np.arange(30, dtype=np.uint8).reshape((10, 3))
+        points = np.concatenate((xyz.view(np.uint8).ravel(), rgb.ravel()))
+
+        count, filename = points_to_pnts(b'1', points, self.folder, True)
+        self.assertEqual(count, 10)
+
+        tile = TileContentReader().read_file(filename)
+        ft = tile.body.feature_table
+        self.assertEqual(ft.header.points_length, 10)
+        np.testing.assert_array_equal(ft.body.positions_arr.view(np.float32).reshape((10, 3)), xyz)
+        np.testing.assert_array_equal(ft.body.colors_arr.reshape((10, 3)), rgb)
+
+        # without colors
+        count, filename = points_to_pnts(b'2', xyz.view(np.uint8).ravel(), self.folder, False)
+        ft = TileContentReader().read_file(filename).body.feature_table
+        self.assertEqual(ft.header.colors, SemanticPoint.NONE)
+        np.testing.assert_array_equal(ft.body.positions_arr.view(np.float32).reshape((10, 3)), xyz)
+
+    def test_properties_only(self):
+        # the feature table of the .b3dm: only a json header
+        ft = FeatureTable()
+        ft.add_property_from_value('BATCH_LENGTH', 3)
+        self.assertEqual(ft.to_array().tobytes(), b'{"BATCH_LENGTH":3}  ')
@@ -0,0 +1,62 @@
+# -*- coding: utf-8 -*-
+
+import unittest
+import numpy as np
+
+from py3dtiles.points import point_batch
+
+
+class TestPointBatch(unittest.TestCase):
+
+    def test_roundtrip(self):
+        xyz = np.arange(30, dtype=np.float64).reshape((10, 3))
+        rgb = np.arange(30, dtype=np.uint16).reshape((3, 10)).transpose()
+
+        frames = point_batch.encode(xyz, rgb)
+        self.assertEqual(len(frames), point_batch.FRAME_COUNT)
+        self.assertEqual(point_batch.point_count(frames[0]), 10)
+        self.assertEqual(point_batch.byte_size(frames), point_batch.HEADER.size + 10 * 15)
+
+        out_xyz, out_rgb = point_batch.decode([bytes(f) for f in frames])
+        self.assertEqual(out_xyz.dtype, np.float32)
+        self.assertEqual(out_rgb.dtype, np.uint8)
+        self.assertTrue(out_xyz.flags.writeable)
+        np.testing.assert_array_equal(out_xyz, xyz)
+        np.testing.assert_array_equal(out_rgb, rgb)
+
+    def test_empty(self):
+        frames = point_batch.encode(np.zeros((0, 3)), np.zeros((0, 3)))
+        xyz, rgb = point_batch.decode(frames)
+        self.assertEqual(xyz.shape, (0, 3))
+        self.assertEqual(rgb.shape, (0, 3))
+
+    def test_shared_memory(self):
+        xyz = np.arange(300, dtype=np.float32).reshape((100, 3))
+        rgb = np.ones((100, 3), dtype=np.uint8)
+
+        point_batch.enable_shared_memory(100 * point_batch.POINT_BYTES)
+        try:
+            frames = point_batch.encode(xyz, rgb)
+            small_frames = point_batch.encode(xyz[:10], rgb[:10])
+        finally:
+            point_batch.enable_shared_memory(None)
+
+        self.assertIsNone(point_batch.shared_memory_segment(small_frames))
+        segment = point_batch.shared_memory_segment(frames)
+        self.assertIsNotNone(segment)
+        self.assertEqual(point_batch.byte_size(frames), 100 * point_batch.POINT_BYTES)
+
+        tracker = point_batch.SharedMemoryTracker()
+        tracker.add(b'1', frames)
+        tracker.dispatched(b'1')
+        self.assertEqual(len(tracker), 1)
+
+        out_xyz, out_rgb = point_batch.decode(frames)
+        np.testing.assert_array_equal(out_xyz, xyz)
+        np.testing.assert_array_equal(out_rgb, rgb)
+        del out_xyz, out_rgb
+        point_batch.release_attached()
+
+        tracker.done(b'1')
+        self.assertEqual(len(tracker), 0)
+        tracker.unlink_all()
@@ -0,0 +1,56 @@
+# -*- coding: utf-8 -*-
+
+import os
+import pstats
+import shutil
+import tempfile
+import unittest
+
+from py3dtiles.points import profiling
+
+
+def _work(n):
+    return sum([i * i for i in range(n)])
+
+
+class TestProfiling(unittest.TestCase):
+
+    def setUp(self):
+        self.folder = tempfile.mkdtemp()
+
+    def tearDown(self):
+        profiling.enable(None, None)
+        shutil.rmtree(self.folder)
+
+    def test_merge(self):
+        profiling.enable(self.folder, 'worker')
+        with profiling.profile('read'):
+            _work(1000)
+        with profiling.profile('process'):
+            _work(1000)
+        profiling.enable(None, None)
+
+        master = profiling.Profiler(self.folder, 'convert')
+        with master.profile('process'):
+            _work(1000)
+        master.close()
+
+        report = profiling.merge(self.folder)
+        self.assertEqual(report, os.path.join(self.folder, profiling.REPORT))
+        with open(report) as f:
+            content = f.read()
+        self.assertIn('process\n=======\n2 processes', content)
+        self.assertIn('read\n====\n1 processes', content)
+        self.assertIn('_work', content)
+
+        stats = pstats.Stats(os.path.join(self.folder, 'process.pstats'))
+        calls = [stat[0] for function, stat in stats.stats.items() if function[2] == '_work']
+        self.assertEqual(calls, [2])
+
+    def test_no_folder(self):
+        with profiling.profile('read'):
+            _work(10)
+        profiling.enable(None, None)
+        with profiling.profile_command(None, 'merge'):
+            _work(10)
+        self.assertEqual(os.listdir(self.folder), [])
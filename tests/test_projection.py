@@ -0,0 +1,43 @@
+# -*- coding: utf-8 -*-
+
+import threading
+import unittest
+
+import numpy as np
+import pyproj
+
+from py3dtiles import convert_to_ecef
+from py3dtiles.points import projection
+
+LAMBERT_93_TO_ECEF = (projection.epsg(2154), projection.epsg(4978))
+
+
+class TestProjection(unittest.TestCase):
+
+    def setUp(self):
+        random = np.random.RandomState(0)
+        count = 3 * projection.THREADED_MIN_POINTS
+        self.xyz = [650000 + random.random_sample(count) * 1000, 6860000 + random.random_sample(count) * 1000,
+                    random.random_sample(count) * 50]
+        self.transformer = pyproj.Transformer.from_crs(*LAMBERT_93_TO_ECEF, always_xy=True)
+        self.expected = self.transformer.transform(*self.xyz)
+
+    def test_reproject(self):
+        # by the calling thread, then split between the threads
+        for count in [10, len(self.xyz[0])]:
+            x, y, z = projection.reproject(LAMBERT_93_TO_ECEF, *[axis[:count] for axis in self.xyz])
+            np.testing.assert_array_equal(np.array([x, y, z]), np.array(self.expected)[:, :count])
+
+        point = projection.reproject(list(LAMBERT_93_TO_ECEF), 650000.0, 6860000.0, 0.0)
+        self.assertEqual(point, self.transformer.transform(650000.0, 6860000.0, 0.0))
+        np.testing.assert_array_equal(convert_to_ecef(650000.0, 6860000.0, 0.0, 2154), point)
+
+    def test_transformer_by_thread(self):
+        transformer = projection.transformer(LAMBERT_93_TO_ECEF)
+        self.assertIs(projection.transformer(LAMBERT_93_TO_ECEF), transformer)
+
+        other = []
+        thread = threading.Thread(target=lambda: other.append(projection.transformer(LAMBERT_93_TO_ECEF)))
+        thread.start()
+        thread.join()
+        self.assertIsNot(other[0], transformer)
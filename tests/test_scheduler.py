@@ -0,0 +1,225 @@
+# -*- coding: utf-8 -*-
+
+import os
+import unittest
+import numpy as np
+
+from py3dtiles.points import point_batch
+from py3dtiles.points.scheduler import NodeNameTrie, NodeTaskQueue, JobSizer, MemoryBudget, PortionExtents
+
+
+class TestNodeNameTrie(unittest.TestCase):
+
+    def test_inactive(self):
+        trie = NodeNameTrie()
+        trie.add_inactive(b'01')
+        trie.add_inactive(b'01')
+        trie.add_inactive(b'0')
+
+        self.assertEqual(len(trie), 2)
+        self.assertIn(b'01', trie)
+        self.assertNotIn(b'010', trie)
+        self.assertEqual(sorted(trie), [b'0', b'01'])
+
+        self.assertTrue(trie.remove_inactive(b'01'))
+        self.assertFalse(trie.remove_inactive(b'01'))
+        self.assertEqual(len(trie), 1)
+
+    def test_is_blocked(self):
+        trie = NodeNameTrie()
+        trie.add_pending(b'12')
+
+        self.assertTrue(trie.is_blocked(b'12'))
+        self.assertTrue(trie.is_blocked(b'1234'))
+        self.assertFalse(trie.is_blocked(b'1'))
+        self.assertFalse(trie.is_blocked(b'13'))
+
+        trie.add_pending(b'')
+        self.assertTrue(trie.is_blocked(b'7'))
+
+        trie.remove_pending(b'')
+        trie.remove_pending(b'12')
+        self.assertFalse(trie.is_blocked(b'1234'))
+
+    def test_pop_writable(self):
+        trie = NodeNameTrie()
+        for name in [b'1', b'10', b'11', b'110', b'2']:
+            trie.add_inactive(name)
+        trie.add_pending(b'11')
+
+        self.assertEqual(sorted(trie.pop_writable(b'1')), [b'1', b'10'])
+        self.assertEqual(trie.pop_writable(b'11'), [])
+        self.assertEqual(sorted(trie), [b'11', b'110', b'2'])
+
+        trie.remove_pending(b'11')
+        self.assertEqual(sorted(trie.pop_writable(b'11')), [b'11', b'110'])
+        self.assertEqual(trie.pop_all(), [b'2'])
+        self.assertEqual(len(trie), 0)
+        self.assertEqual(trie.root.children, {})
+
+    def test_pop_writable_filtered(self):
+        trie = NodeNameTrie()
+        for name in [b'0', b'00', b'01']:
+            trie.add_inactive(name)
+
+        self.assertEqual(trie.pop_writable(b'0', lambda name: name == b'01'), [b'01'])
+        self.assertEqual(sorted(trie), [b'0', b'00'])
+
+
+class TestPortionExtents(unittest.TestCase):
+
+    def test_is_outside(self):
+        root_aabb = np.array([[0, 0, 0], [100, 100, 100]], dtype=np.float64)
+        extents = PortionExtents(root_aabb, {
+            ('a', (0, 10)): np.array([[0, 0, 0], [20, 20, 20]]),
+            ('b', (0, 10)): np.array([[60, 60, 60], [100, 100, 100]]),
+        })
+        extents.update([('a', (0, 10))])
+        # '0' is the first octant, '7' the last one
+        self.assertFalse(extents.is_outside(b''))
+        self.assertFalse(extents.is_outside(b'0'))
+        self.assertTrue(extents.is_outside(b'7'))
+        self.assertTrue(extents.is_outside(b'07'))
+        self.assertFalse(extents.is_outside(b'00'))
+
+        # a portion without extent can reach any node
+        extents.update([('a', (0, 10)), ('c', (0, 10))])
+        self.assertFalse(extents.is_outside(b'7'))
+
+        extents.update([])
+        self.assertTrue(extents.is_outside(b''))
+
+    def test_separates(self):
+        root_aabb = np.array([[0, 0, 0], [100, 100, 100]], dtype=np.float64)
+        extents = PortionExtents(root_aabb, {
+            ('a', (0, 10)): np.array([[0, 0, 0], [20, 20, 20]]),
+            ('b', (0, 10)): root_aabb,
+        })
+        extents.update([('a', (0, 10))])
+        self.assertTrue(extents.separates())
+
+        # a portion spanning the whole octree reaches every node
+        extents.update([('a', (0, 10)), ('b', (0, 10))])
+        self.assertFalse(extents.separates())
+        extents.update([('a', (0, 10)), ('c', (0, 10))])
+        self.assertFalse(extents.separates())
+
+    def test_pop_outside(self):
+        root_aabb = np.array([[0, 0, 0], [100, 100, 100]], dtype=np.float64)
+        random = np.random.RandomState(0)
+        portions = {}
+        for i in range(20):
+            start = random.random_sample(3) * 90
+            portions[('a', (i, i + 1))] = np.array([start, start + random.random_sample(3) * 10])
+        extents = PortionExtents(root_aabb, portions)
+        extents.update(list(portions)[10:])
+
+        names = {b''.join(str(c).encode('ascii') for c in random.randint(0, 8, depth))
+                 for depth in random.randint(1, 6, 500)}
+        tries = [NodeNameTrie(), NodeNameTrie()]
+        for trie in tries:
+            for name in names:
+                trie.add_inactive(name)
+            trie.add_pending(b'3')
+
+        # below a given node, then all of them
+        for name in [b'1', b'']:
+            expected = tries[0].pop_writable(name, extents.is_outside)
+            self.assertGreater(len(expected), 0)
+            self.assertEqual(sorted(tries[1].pop_outside(name, extents)), sorted(expected))
+            self.assertEqual(sorted(tries[1]), sorted(tries[0]))
+
+
+def _task(point_count):
+    return point_batch.encode(
+        np.zeros((point_count, 3), dtype=np.float32),
+        np.zeros((point_count, 3), dtype=np.uint8))
+
+
+class TestNodeTaskQueue(unittest.TestCase):
+
+    def test_order(self):
+        queue = NodeTaskQueue()
+        self.assertTrue(queue.add(b'12', _task(10), 10))
+        self.assertTrue(queue.add(b'3', _task(5), 5))
+        self.assertTrue(queue.add(b'4', _task(20), 20))
+        self.assertFalse(queue.add(b'3', _task(50), 50))
+        self.assertEqual(queue.point_count, 85)
+        self.assertEqual(queue.byte_size, 85 * point_batch.POINT_BYTES + 4 * point_batch.HEADER.size)
+
+        names = []
+        while True:
+            name = queue.pop_next({})
+            if name is None:
+                break
+            names.append(name)
+            queue.pop(name)
+        self.assertEqual(names, [b'3', b'4', b'12'])
+        self.assertEqual(len(queue), 0)
+        self.assertEqual(queue.point_count, 0)
+        self.assertEqual(queue.byte_size, 0)
+
+    def test_active(self):
+        queue = NodeTaskQueue()
+        queue.add(b'1', _task(10), 10)
+        queue.add(b'2', _task(10), 10)
+        active = {b'1': None}
+
+        self.assertEqual(queue.pop_next(active), b'2')
+        tasks, count = queue.pop(b'2')
+        self.assertEqual((len(tasks), count), (1, 10))
+        self.assertIsNone(queue.pop_next(active))
+
+        del active[b'1']
+        queue.reschedule(b'1')
+        self.assertEqual(queue.pop_next(active), b'1')
+
+
+class TestJobSizer(unittest.TestCase):
+
+    def test_target_count(self):
+        sizer = JobSizer(2.0, initial_count=100000, min_count=1000, max_count=1000000)
+        self.assertEqual(sizer.target_count(10000000, 4), 100000)
+
+        sizer.job_started(b'a', 100000, 10.0)
+        sizer.job_ended(b'a', 10.5)
+        self.assertEqual(sizer.target_count(10000000, 4), 400000)
+
+        # the remaining points are spread over the workers
+        self.assertEqual(sizer.target_count(200000, 4), 50000)
+        self.assertEqual(sizer.target_count(100, 4), 1000)
+
+        # unknown jobs (readers, pnts writers) are ignored
+        sizer.job_ended(b'b', 11.0)
+        self.assertEqual(sizer.target_count(1e12, 4), 400000)
+
+
+class TestMemoryBudget(unittest.TestCase):
+
+    def test_allows(self):
+        budget = MemoryBudget(1000000, [])
+        self.assertTrue(budget.allows(1000, 0, 0.0))
+        rss = budget.rss
+        self.assertGreater(rss, 0)
+
+        # estimate is updated between 2 samples
+        budget.reserve(100)
+        self.assertEqual(budget.estimate(50), rss + 150)
+        self.assertFalse(budget.allows(budget.max_size - rss, 0, 0.1))
+
+        # a new sample resets the estimate
+        self.assertTrue(budget.allows(budget.max_size - 2 * rss, 50, 1.0))
+        self.assertEqual(budget.reserved_bytes, 0)
+
+    def test_add_process(self):
+        budget = MemoryBudget(1000000, [])
+        budget.sample(0.0, 0)
+        rss = budget.rss
+
+        # e.g. a worker of the daemon pool joining the conversion
+        budget.add_process(os.getppid())
+        budget.sample(1.0, 0)
+        self.assertGreater(budget.rss, rss)
+
+        budget.remove_process(os.getppid())
+        self.assertEqual(len(budget.processes), 1)
@@ -0,0 +1,39 @@
+# -*- coding: utf-8 -*-
+
+import os
+import subprocess
+import sys
+import unittest
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# slow to import, and not needed to read tiles
+HEAVY_MODULES = [
+    'zmq', 'pyproj', 'psutil', 'numba', 'laspy', 'liblas', 'psycopg2', 'lz4',
+    'py3dtiles.earcut', 'py3dtiles.convert']
+
+
+def loaded_modules(code):
+    """Returns the modules imported by code, run in a new interpreter"""
+    code += '\nimport sys\nprint(" ".join(sys.modules))'
+    output = subprocess.check_output([sys.executable, '-c', code], cwd=ROOT)
+    return output.decode().splitlines()[-1].split()
+
+
+class TestStartup(unittest.TestCase):
+
+    def test_import(self):
+        modules = loaded_modules('import py3dtiles')
+        self.assertEqual([m for m in HEAVY_MODULES if m in modules], [])
+
+    def test_info_command(self):
+        modules = loaded_modules('\n'.join([
+            'import sys',
+            'sys.argv = ["py3dtiles", "info", "--help"]',
+            'from py3dtiles.command_line import main',
+            'try:',
+            '    main()',
+            'except SystemExit:',
+            '    pass']))
+        self.assertIn('py3dtiles.info', modules)
+        self.assertEqual([m for m in HEAVY_MODULES if m in modules], [])
@@ -0,0 +1,56 @@
+# -*- coding: utf-8 -*-
+
+import json
+import os
+import shutil
+import tempfile
+import unittest
+
+from py3dtiles.points import trace
+
+
+class TestTrace(unittest.TestCase):
+
+    def setUp(self):
+        self.folder = tempfile.mkdtemp()
+        self.trace_folder = os.path.join(self.folder, 'trace')
+
+    def tearDown(self):
+        trace.enable(None, None)
+        shutil.rmtree(self.folder)
+
+    def test_merge(self):
+        trace.enable(self.trace_folder, 'worker')
+        with trace.span('process', node='01', points=10) as args:
+            args['bytes'] = 150
+        trace.complete('queued', 1.0, 1.5, 'queue', trace.QUEUE)
+        trace.enable(None, None)
+
+        master = trace.Trace(self.trace_folder, 'convert')
+        master.counter('queues', pnts=3)
+        master.close()
+        # a process killed while writing an event
+        with open(os.path.join(self.trace_folder, 'killed.json'), 'w') as f:
+            f.write('{"ph": "X", "na')
+
+        filename = os.path.join(self.folder, 'trace.json')
+        trace.merge(self.trace_folder, filename)
+        self.assertFalse(os.path.exists(self.trace_folder))
+
+        with open(filename) as f:
+            events = json.load(f)['traceEvents']
+        spans = [e for e in events if e['ph'] == 'X']
+        self.assertEqual(len(spans), 2)
+        process = [e for e in spans if e['name'] == 'process'][0]
+        self.assertEqual(process['args'], {'node': '01', 'points': 10, 'bytes': 150})
+        self.assertEqual(process['pid'], os.getpid())
+        queued = [e for e in spans if e['name'] == 'queued'][0]
+        self.assertEqual((queued['ts'], queued['dur'], queued['tid']), (1000000, 500000, trace.QUEUE))
+        counters = [e for e in events if e['ph'] == 'C']
+        self.assertEqual(counters[0]['args'], {'pnts': 3})
+
+    def test_disabled(self):
+        with trace.span('process') as args:
+            args['points'] = 1
+        trace.Trace().counter('queues', pnts=1)
+        self.assertFalse(os.path.exists(self.trace_folder))
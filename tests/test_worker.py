@@ -0,0 +1,170 @@
+# -*- coding: utf-8 -*-
+
+import multiprocessing
+import os
+import pickle
+import shutil
+import socket
+import struct
+import tempfile
+import time
+import unittest
+import numpy as np
+import psutil
+import zmq
+
+from py3dtiles import worker
+from py3dtiles.convert import WorkerConfig, OctreeMetadata, connect_endpoint
+from py3dtiles.points import auth, point_batch
+
+
+def _free_port():
+    with socket.socket() as s:
+        s.bind(('127.0.0.1', 0))
+        return s.getsockname()[1]
+
+
+class TestWorker(unittest.TestCase):
+
+    def setUp(self):
+        self.folder = tempfile.mkdtemp()
+        self.key_file = os.path.join(self.folder, 'py3dtiles.key')
+        auth.generate_key(self.key_file)
+        self.key = auth.read_key(self.key_file)
+        self.endpoint = 'tcp://127.0.0.1:{}'.format(_free_port())
+
+    def tearDown(self):
+        shutil.rmtree(self.folder)
+
+    def test_connect_endpoint(self):
+        self.assertEqual(connect_endpoint('tcp://*:5555'), 'tcp://127.0.0.1:5555')
+        self.assertEqual(connect_endpoint('tcp://0.0.0.0:5555'), 'tcp://127.0.0.1:5555')
+        self.assertEqual(connect_endpoint('tcp://host:5555'), 'tcp://host:5555')
+        self.assertEqual(connect_endpoint('ipc:///tmp/py3dtiles1'), 'ipc:///tmp/py3dtiles1')
+
+    def test_key_file(self):
+        self.assertEqual(os.stat(self.key_file).st_mode & 0o777, 0o600)
+        # no overwrite
+        with self.assertRaises(FileExistsError):
+            auth.generate_key(self.key_file)
+        with self.assertRaises(ValueError):
+            worker.run(self.endpoint, 1)
+        # ipc endpoints are protected by the filesystem permissions
+        auth.check_endpoint('ipc:///tmp/py3dtiles1', None)
+
+    def test_refuse_unauthenticated_peers(self):
+        context = zmq.Context()
+        try:
+            master = context.socket(zmq.ROUTER)
+            authenticator = auth.server(context, master, self.key)
+            master.bind(self.endpoint)
+
+            other_key = zmq.curve_keypair()
+            other_key = (zmq.curve_public(other_key[1]), other_key[1])
+            for key in [None, other_key]:
+                peer = context.socket(zmq.DEALER)
+                if key is not None:
+                    # a peer with another key, pretending to know the master
+                    peer.curve_publickey, peer.curve_secretkey = key
+                    peer.curve_serverkey = self.key[0]
+                peer.connect(self.endpoint)
+                peer.send_multipart([b'init'])
+                self.assertEqual(master.poll(500), 0)
+                peer.close(linger=0)
+
+            # a rogue master, without the key, gets nothing from the workers
+            rogue = context.socket(zmq.ROUTER)
+            rogue.curve_publickey, rogue.curve_secretkey = other_key
+            rogue.curve_server = True
+            rogue_endpoint = 'tcp://127.0.0.1:{}'.format(_free_port())
+            rogue.bind(rogue_endpoint)
+            client = context.socket(zmq.DEALER)
+            auth.client(client, self.key)
+            client.connect(rogue_endpoint)
+            client.send_multipart([b'init'])
+            self.assertEqual(rogue.poll(500), 0)
+            client.close(linger=0)
+            rogue.close(linger=0)
+
+            # while the peers with the key are accepted
+            client = context.socket(zmq.DEALER)
+            auth.client(client, self.key)
+            client.connect(self.endpoint)
+            client.send_multipart([b'init'])
+            self.assertEqual(master.recv_multipart()[1], b'init')
+            authenticator.stop()
+        finally:
+            context.destroy(linger=0)
+
+    def test_remote_workers(self):
+        endpoint = self.endpoint
+        config = WorkerConfig(
+            trace_folder=None,
+            profile_folder=None,
+            projection=None,
+            octree_metadata=OctreeMetadata(aabb=np.array([[0, 0, 0], [1, 1, 1]]), spacing=0.01, scale=1),
+            folder=self.folder,
+            write_rgb=True,
+            shared_memory=False,
+            verbosity=-1)
+
+        context = zmq.Context()
+        skt = context.socket(zmq.ROUTER)
+        authenticator = auth.server(context, skt, self.key)
+        skt.bind(endpoint)
+        workers = multiprocessing.Process(target=worker.run, args=(endpoint, 2, 1, self.key_file))
+        workers.start()
+
+        try:
+            # workers request the config, then notify they're ready
+            initialized, ready = set(), {}
+            while len(ready) < 3:
+                client_id, message, *pid = skt.recv_multipart()
+                if message == b'init':
+                    initialized.add(client_id)
+                    skt.send_multipart([client_id, pickle.dumps(time.time()), pickle.dumps(config)])
+                else:
+                    self.assertIn(client_id, initialized)
+                    ready[client_id] = message
+            self.assertEqual(initialized, set(ready))
+            # the writer tells it only processes .pnts jobs
+            self.assertEqual(sorted(ready.values()), [b'', b'', b'writer'])
+
+            # a job processing the root: its points are either kept, or
+            # forwarded to its children
+            xyz = np.random.RandomState(0).random_sample((20000, 3))
+            client_id = next(c for c, message in ready.items() if message == b'')
+            skt.send_multipart(
+                [client_id, pickle.dumps(time.time()), b'', b'', struct.pack('>I', 1)]
+                + point_batch.encode(xyz, np.zeros((20000, 3))))
+            forwarded = 0
+            while True:
+                sender, *message = skt.recv_multipart()
+                self.assertEqual(sender, client_id)
+                if len(message) > 1:
+                    self.assertEqual(len(message[0]), 1)
+                    forwarded += point_batch.point_count(message[1])
+                else:
+                    break
+            result = pickle.loads(message[0])
+            self.assertEqual(result['name'], b'')
+            self.assertGreater(forwarded, 0)
+            self.assertEqual(result['total'] + forwarded, 20000)
+            # then the worker is idle again
+            self.assertEqual(skt.recv_multipart(), [client_id, b''])
+
+            for client_id in ready:
+                skt.send_multipart([client_id, pickle.dumps(time.time()), pickle.dumps(b'shutdown')])
+            for i in range(3):
+                _, message = skt.recv_multipart()
+                self.assertEqual(message, b'halted')
+
+            workers.join(10)
+            self.assertEqual(workers.exitcode, 0)
+        finally:
+            if workers.is_alive():
+                for p in psutil.Process(workers.pid).children():
+                    p.kill()
+                workers.terminate()
+            authenticator.stop()
+            context.destroy()
@@ -0,0 +1,172 @@
+# -*- coding: utf-8 -*-
+
+import io
+import os
+import pickle
+import shutil
+import tempfile
+import unittest
+
+import numpy as np
+
+from py3dtiles.points import point_batch
+from py3dtiles.points.task import xyz_reader
+
+
+class _Queue(object):
+    def __init__(self):
+        self.xyz = []
+        self.rgb = []
+        self.results = []
+
+    def send_multipart(self, frames, copy=True, block=True):
+        if len(frames) > 1:
+            xyz, rgb = point_batch.decode(frames[1:])
+            self.xyz.append(xyz.copy())
+            self.rgb.append(rgb.copy())
+        elif frames[0]:
+            self.results.append(pickle.loads(frames[0]))
+
+
+def _parse(text):
+    return xyz_reader.parse(np.frombuffer(text, dtype=np.uint8))
+
+
+class TestXyzReader(unittest.TestCase):
+
+    def setUp(self):
+        self.folder = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.folder)
+
+    def _write(self, text, name='points.xyz'):
+        filename = os.path.join(self.folder, name)
+        with open(filename, 'wb') as f:
+            f.write(text)
+        return filename
+
+    def test_parse(self):
+        values, line_starts = _parse(b'1 2.5 -3\n\n4,-5.25e2\t+6e-1\r\n.5 7. 1E3')
+        np.testing.assert_array_equal(values, [[1, 2.5, -3], [4, -525, 0.6], [0.5, 7, 1000]])
+        np.testing.assert_array_equal(line_starts, [0, 10, 27])
+
+        # same values as python
+        xyz = np.random.RandomState(0).random_sample((100, 3)) * 1e6
+        text = '\n'.join(['{:.3f} {:.3f} {:.3f}'.format(*v) for v in xyz])
+        np.testing.assert_array_equal(_parse(text.encode())[0].ravel(), [float(v) for v in text.split()])
+        for scale in [1e-30, 1e-5, 1, 1e6, 1e30, 1e300]:
+            text = '\n'.join(['{!r} {!r} {!r}'.format(*v) for v in xyz * scale])
+            np.testing.assert_array_equal(_parse(text.encode())[0], xyz * scale)
+        text = b'0.000000000000000000000000123456 1234567890123456789012345 12345678901234567890e-40'
+        np.testing.assert_array_equal(_parse(text)[0].ravel(), [float(v) for v in text.split()])
+
+    def test_parse_special_values(self):
+        # as float()
+        values, _ = _parse(b'nan -inf +Infinity\nNaN INF -1e-400\n0e400 1.5e308 -1e308\n1e-320 -5e-324 2.2250738585072014e-308')
+        np.testing.assert_array_equal(
+            values, [[np.nan, -np.inf, np.inf], [np.nan, np.inf, -0.0], [0, 1.5e308, -1e308],
+                     [1e-320, -5e-324, 2.2250738585072014e-308]])
+        self.assertEqual(np.copysign(1, values[1, 2]), -1)
+
+    def test_parse_errors(self):
+        for text in [b'X Y Z\n1 2 3', b'1 2 3\n1 2', b'1 2 3a', b'1 2 - 3', b'1 2 3e', b'1 2 nana', b'1 2 in']:
+            with self.assertRaises(ValueError):
+                _parse(text)
+
+        # unlike float(), the finite values out of range aren't read as inf
+        for text in [b'1 2 1.5e400', b'1 2 -1e309', b'1e999999999 2 3']:
+            with self.assertRaisesRegex(ValueError, 'out of the float64 range'):
+                _parse(text)
+
+    def test_blocks(self):
+        text = b''.join([b'%d %d %d\n' % (i, i, i) for i in range(1000)]) + b'1 2 3'
+        parsed = [(offset, xyz_reader.parse(data)[0]) for offset, data in xyz_reader.blocks(io.BytesIO(text), 100)]
+        self.assertTrue(all([text[offset - 1:offset] == b'\n' for offset, _ in parsed[1:]]))
+        values = np.concatenate([values for _, values in parsed])
+        np.testing.assert_array_equal(values[:1000, 0], np.arange(1000))
+        np.testing.assert_array_equal(values[-1], [1, 2, 3])
+
+    def test_init(self):
+        lines = [b'%d %d %d' % (i, -i, i % 7) for i in range(2500)]
+        filename = self._write(b'\n'.join(lines))
+
+        portion_size, xyz_reader.PORTION_SIZE = xyz_reader.PORTION_SIZE, 1000
+        try:
+            infos = xyz_reader.init([filename])
+        finally:
+            xyz_reader.PORTION_SIZE = portion_size
+
+        self.assertEqual(infos['point_count'], 2500)
+        np.testing.assert_array_equal(infos['aabb'], [[0, -2499, 0], [2499, 0, 6]])
+        offsets = [len(b'\n'.join(lines[:i])) + 1 for i in [1000, 2000]]
+        self.assertEqual(
+            infos['portions'],
+            [(filename, (0, 1000, 0)), (filename, (1000, 2000, offsets[0])), (filename, (2000, 2500, offsets[1]))])
+        np.testing.assert_array_equal(
+            infos['portion_extents'][(filename, (1000, 2000, offsets[0]))], [[1000, -1999, 0], [1999, -1000, 6]])
+
+    def test_init_estimate_bounds(self):
+        lines = [b'%d %d %d' % (i, -i, i % 7) for i in range(25000)]
+        filename = self._write(b'\n'.join(lines))
+
+        sizes = xyz_reader.PORTION_SIZE, xyz_reader.SAMPLE_BLOCK_SIZE
+        xyz_reader.PORTION_SIZE, xyz_reader.SAMPLE_BLOCK_SIZE = 10000, 1000
+        try:
+            infos = xyz_reader.init([filename], estimate_bounds=True)
+        finally:
+            xyz_reader.PORTION_SIZE, xyz_reader.SAMPLE_BLOCK_SIZE = sizes
+
+        self.assertAlmostEqual(infos['point_count'], 25000, delta=2500)
+        np.testing.assert_allclose(infos['aabb'], [[0, -24999, 0], [24999, 0, 6]], atol=2500)
+        self.assertEqual(infos['portion_extents'], {})
+
+        # the byte ranges start at a line, and cover the file
+        portions = [portion for _, portion in infos['portions']]
+        self.assertEqual(len(portions), 3)
+        self.assertEqual((portions[0][2], portions[-1][3]), (0, os.path.getsize(filename)))
+        with open(filename, 'rb') as f:
+            text = f.read()
+        for previous, portion in zip(portions[:-1], portions[1:]):
+            self.assertEqual(previous[3], portion[2])
+            self.assertEqual(text[portion[2] - 1:portion[2]], b'\n')
+
+        # the readers return the exact count and bounds of their range
+        queue = _Queue()
+        offset_scale = (np.array([0, 0, 0]), np.array([1, 1, 1]), None, None)
+        for portion in portions:
+            xyz_reader.run(b'0', filename, offset_scale, portion, queue, None, 0)
+
+        xyz = np.concatenate(queue.xyz)
+        np.testing.assert_array_equal(np.sort(xyz[:, 0]), np.arange(25000))
+        self.assertEqual(sum([result['points'] for result in queue.results]), 25000)
+        first = queue.results[0]
+        np.testing.assert_array_equal(first['aabb'][0], xyz[:first['points']].min(axis=0))
+
+    def test_init_estimate_bounds_small_file(self):
+        big = self._write(b'\n'.join([b'%d %d %d' % (i, -i, i % 7) for i in range(25000)]), 'big.xyz')
+        # too small to be sampled: its extent is exact
+        small = self._write(b'1 2 3\n4 5 6\n', 'small.xyz')
+
+        sizes = xyz_reader.PORTION_SIZE, xyz_reader.SAMPLE_BLOCK_SIZE
+        xyz_reader.PORTION_SIZE, xyz_reader.SAMPLE_BLOCK_SIZE = 10000, 1000
+        try:
+            infos = xyz_reader.init([big, small], estimate_bounds=True)
+        finally:
+            xyz_reader.PORTION_SIZE, xyz_reader.SAMPLE_BLOCK_SIZE = sizes
+
+        self.assertEqual([filename for filename, _ in infos['portions']], [big] * 3 + [small])
+        self.assertEqual(list(infos['portion_extents']), [infos['portions'][-1]])
+        np.testing.assert_array_equal(infos['portion_extents'][infos['portions'][-1]], [[1, 2, 3], [4, 5, 6]])
+
+    def test_run_columns(self):
+        for line, rgb in [(b'1 2 3', [0, 0, 0]), (b'1 2 3 50', [0, 0, 0]),
+                          (b'1 2 3 10 20 30', [10, 20, 30]), (b'1,2,3,50,10,20,30', [10, 20, 30])]:
+            filename = self._write(b'\n'.join([line] * 300))
+            queue = _Queue()
+            offset_scale = (np.array([-1, -2, -3]), np.array([1, 1, 1]), None, None)
+            # a portion in the middle of the file
+            xyz_reader.run(b'0', filename, offset_scale, (100, 250, 100 * (len(line) + 1)), queue, None, 0)
+
+            np.testing.assert_array_equal(np.concatenate(queue.xyz), np.zeros((150, 3)))
+            np.testing.assert_array_equal(np.concatenate(queue.rgb), [rgb] * 150)
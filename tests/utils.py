@@ -0,0 +1,150 @@
+# -*- coding: utf-8 -*-
+
+import math
+import struct
+
+import numpy as np
+
+# Scenes of synthetic input files, in projected coordinates (meters). A scene
+# is generated chunk by chunk, each chunk covering a square cell of the scene
+# with its own seed, so that files of any size can be streamed in constant
+# memory.
+
+ORIGIN = np.array([650000, 6860000, 0])
+CHUNK_SIZE = 1000000
+# las classifications
+GROUND, VEGETATION, BUILDING = 2, 5, 6
+
+
+def _ground(x, y):
+    return 50 + 20 * np.sin(x / 150) * np.cos(y / 230) + 3 * np.sin(x / 17 + y / 23)
+
+
+def _terrain(random, x0, y0, side, count):
+    x = x0 + random.random_sample(count) * side
+    y = y0 + random.random_sample(count) * side
+    z = _ground(x, y) + random.normal(0, 0.05, count)
+    # from green lowlands to brown highlands
+    t = np.clip((z - 30) / 45, 0, 1)[:, np.newaxis]
+    rgb = (1 - t) * [70, 130, 50] + t * [140, 110, 70] + random.normal(0, 8, (count, 3))
+    return np.column_stack((x, y, z)), rgb, np.full(count, GROUND)
+
+
+def _urban(random, x0, y0, side, count):
+    buildings = max(1, int(side * side / 900))
+    size = 8 + random.random_sample((buildings, 2)) * 20
+    corner = random.random_sample((buildings, 2)) * (side - size)
+    height = 4 + random.gamma(2, 6, buildings)
+
+    ground_count, roof_count = int(count * 0.5), int(count * 0.35)
+    xyz, rgb, classification = _terrain(random, x0, y0, side, ground_count)
+    xyz[:, 2] = 40 + (xyz[:, 2] - 40) * 0.1
+    rgb[:] = [110, 110, 105] + random.normal(0, 10, (ground_count, 1))
+
+    # roofs, then walls
+    b = random.randint(0, buildings, count - ground_count)
+    local = random.random_sample((len(b), 2)) * size[b]
+    walls = np.arange(len(b)) >= roof_count
+    side_index = random.randint(0, 4, len(b))
+    local[walls & (side_index == 0), 0] = 0
+    local[walls & (side_index == 1), 0] = size[b][walls & (side_index == 1), 0]
+    local[walls & (side_index == 2), 1] = 0
+    local[walls & (side_index == 3), 1] = size[b][walls & (side_index == 3), 1]
+    xy = [x0, y0] + corner[b] + local
+    base = 40 + (_ground(xy[:, 0], xy[:, 1]) - 40) * 0.1
+    z = base + np.where(walls, random.random_sample(len(b)), 1) * height[b]
+    building_rgb = np.where(walls[:, np.newaxis], [200, 190, 170], [160, 70, 50]) + random.normal(0, 10, (len(b), 3))
+
+    return (
+        np.concatenate((xyz, np.column_stack((xy, z)))),
+        np.concatenate((rgb, building_rgb)),
+        np.concatenate((classification, np.full(len(b), BUILDING))))
+
+
+def _forest(random, x0, y0, side, count):
+    trees = max(1, int(side * side / 30))
+    trunk = [x0, y0] + random.random_sample((trees, 2)) * side
+    height = 8 + random.gamma(3, 3, trees)
+
+    ground_count = int(count * 0.3)
+    xyz, rgb, classification = _terrain(random, x0, y0, side, ground_count)
+
+    # crowns, in the upper third of the trees
+    t = random.randint(0, trees, count - ground_count)
+    radius = height[t] / 5
+    xy = trunk[t] + random.normal(0, 1, (len(t), 2)) * radius[:, np.newaxis]
+    z = _ground(trunk[t, 0], trunk[t, 1]) + height[t] * (1 - np.abs(random.normal(0, 0.15, len(t))))
+    crown_rgb = [40, 100, 35] + random.normal(0, 15, (len(t), 3))
+
+    return (
+        np.concatenate((xyz, np.column_stack((xy, z)))),
+        np.concatenate((rgb, crown_rgb)),
+        np.concatenate((classification, np.full(len(t), VEGETATION))))
+
+
+SCENES = {
+    # points per square meter
+    'terrain': (_terrain, 10),
+    'urban': (_urban, 20),
+    'forest': (_forest, 30),
+}
+
+
+def chunks(scene, count, seed=0):
+    """Yields the xyz (float64), rgb (uint8) and classification arrays of
+    the count points of the scene, by chunks of CHUNK_SIZE points"""
+    generate, density = SCENES[scene]
+    side = math.sqrt(CHUNK_SIZE / density)
+    columns = math.ceil(math.sqrt(math.ceil(count / CHUNK_SIZE)))
+
+    for i, start in enumerate(range(0, count, CHUNK_SIZE)):
+        random = np.random.RandomState((seed, i))
+        x0, y0 = ORIGIN[:2] + side * np.array([i % columns, i // columns])
+        xyz, rgb, classification = generate(random, x0, y0, side, min(CHUNK_SIZE, count - start))
+        yield xyz, np.clip(rgb, 0, 255).astype(np.uint8), classification.astype(np.uint8)
+
+
+def write_xyz(filename, scene, count, seed=0):
+    """Writes the points of the scene in a 'x y z r g b' text file"""
+    with open(filename, 'w') as f:
+        for xyz, rgb, _ in chunks(scene, count, seed):
+            np.savetxt(f, np.column_stack((xyz, rgb)), fmt='%.3f %.3f %.3f %d %d %d')
+
+
+# las 1.2 header, and point data record format 2 (with rgb)
+LAS_HEADER = struct.Struct('<4sHH16sBB32s32sHHHIIBHI5I3d3d6d')
+LAS_POINT = np.dtype([
+    ('X', '<i4'), ('Y', '<i4'), ('Z', '<i4'), ('intensity', '<u2'), ('return', 'u1'),
+    ('classification', 'u1'), ('scan_angle', 'i1'), ('user_data', 'u1'),
+    ('point_source_id', '<u2'), ('red', '<u2'), ('green', '<u2'), ('blue', '<u2')])
+LAS_SCALE = 0.001
+
+
+def write_las(filename, scene, count, seed=0):
+    """Writes the points of the scene in a las file, with 16 bits colors"""
+    assert count < 2 ** 32, 'too many points for a las 1.2 file'
+    aabb = np.array([[np.inf] * 3, [-np.inf] * 3])
+
+    with open(filename, 'wb') as f:
+        f.seek(LAS_HEADER.size)
+        for xyz, rgb, classification in chunks(scene, count, seed):
+            points = np.zeros(len(xyz), dtype=LAS_POINT)
+            for i, axis in enumerate('XYZ'):
+                points[axis] = np.round((xyz[:, i] - ORIGIN[i]) / LAS_SCALE)
+                aabb[:, i] = [
+                    min(aabb[0, i], ORIGIN[i] + points[axis].min() * LAS_SCALE),
+                    max(aabb[1, i], ORIGIN[i] + points[axis].max() * LAS_SCALE)]
+            for i, channel in enumerate(['red', 'green', 'blue']):
+                points[channel] = rgb[:, i] * 257
+            # first return of one
+            points['return'] = 0b001001
+            points['classification'] = classification
+            f.write(points.tobytes())
+
+        f.seek(0)
+        f.write(LAS_HEADER.pack(
+            b'LASF', 0, 0, bytes(16), 1, 2, b'py3dtiles', b'py3dtiles tests',
+            1, 2020, LAS_HEADER.size, LAS_HEADER.size, 0, 2, LAS_POINT.itemsize, count,
+            count, 0, 0, 0, 0,
+            LAS_SCALE, LAS_SCALE, LAS_SCALE, *ORIGIN.astype(float),
+            aabb[1][0], aabb[0][0], aabb[1][1], aabb[0][1], aabb[1][2], aabb[0][2]))